@@ -2,8 +2,9 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .api_views import (
     student_register_api, student_login_api, teacher_login_api, logout_api,
+    token_obtain_api, token_revoke_api,
     QuizViewSet, QuestionViewSet, QuizAttemptViewSet, QuizResultViewSet,
-    student_dashboard_api, teacher_dashboard_api
+    student_dashboard_api, teacher_dashboard_api, sync_api, batch_api
 )
 
 # Create router for ViewSets
@@ -21,11 +22,19 @@ urlpatterns = [
     path('auth/student/login/', student_login_api, name='student_login'),
     path('auth/teacher/login/', teacher_login_api, name='teacher_login'),
     path('auth/logout/', logout_api, name='logout'),
+    path('auth/token/', token_obtain_api, name='token_obtain'),
+    path('auth/token/revoke/', token_revoke_api, name='token_revoke'),
     
     # Dashboard APIs
     path('dashboard/student/', student_dashboard_api, name='student_dashboard'),
     path('dashboard/teacher/', teacher_dashboard_api, name='teacher_dashboard'),
     
+    # Several read-only calls in one round trip
+    path('batch/', batch_api, name='batch'),
+    
+    # Delta-sync feeds
+    path('sync/<str:feed>/', sync_api, name='sync'),
+    
     # ViewSet URLs
     path('', include(router.urls)),
 ]
@@ -1,16 +1,72 @@
 """
 API Views for Accounts App
-Provides REST API endpoints for authentication
+Provides REST API endpoints for authentication, dashboards and
+read-only access to quizzes, questions, attempts and results
 """
 
-from rest_framework import status
+import copy
+import json
+import logging
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
+
+from rest_framework import status, viewsets
 from rest_framework.response import Response
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.models import User
+from django.db.models import Count, Q
+from django.http import QueryDict
+from django.urls import resolve, Resolver404
 from django.views.decorators.csrf import csrf_exempt
-from quiz.models import UserProfile
+from quiz.archive import rollup_totals
+from quiz.models import AttemptRollup, UserProfile, Quiz, Question, QuizAttempt, Student, Teacher
+from quiz.roles import resolve_role, remember_role
+from quiz.views import (
+    validate_signup_data, create_user_with_profile, calculate_average_score,
+    calculate_grade_distribution, calculate_student_grade_distribution,
+    calculate_student_performance_stats,
+)
+from .pagination import (
+    QuizCursorPagination, QuestionCursorPagination,
+    AttemptCursorPagination, ResultCursorPagination,
+)
+from .serializers import (
+    QuizSerializer, QuestionSerializer, TeacherQuestionSerializer,
+    QuizAttemptSerializer, QuizResultSerializer,
+)
+from .authentication import issue_token, revocation_list
+from .fast_serializers import FastQuizSerializer, FastQuizAttemptSerializer, FastQuizResultSerializer
+from .renderers import FAST_RENDERER_CLASSES
+from .sync import read_feed, InvalidSyncToken, DEFAULT_LIMIT
+
+logger = logging.getLogger('quiz')
+
+BATCH_MAX_REQUESTS = 20
+
+
+def _get_user_role(user):
+    """Return 'teacher', 'student' or None for an authenticated user"""
+    # Set from the bearer token or the session cache (quiz.roles)
+    if getattr(user, 'resolved_role', None):
+        return user.resolved_role
+    if hasattr(user, 'teacher'):
+        return 'teacher'
+    if hasattr(user, 'student'):
+        return 'student'
+    return None
+
+
+def _user_payload(user, role):
+    return {
+        'id': user.id,
+        'username': user.username,
+        'email': user.email,
+        'first_name': user.first_name,
+        'last_name': user.last_name,
+        'user_type': role,
+    }
 
 
 @api_view(['POST'])
@@ -320,3 +376,448 @@ def api_update_profile(request):
             'success': False,
             'message': f'Error updating profile: {str(e)}'
         }, status=status.HTTP_400_BAD_REQUEST)
+
+
+# ==========================================
+# ROLE-BASED AUTHENTICATION APIs
+# ==========================================
+
+def _role_login(request, role):
+    username = (request.data.get('username') or '').strip()
+    password = request.data.get('password') or ''
+    if not username or not password:
+        return Response({
+            'success': False,
+            'message': 'Username and password are required'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    user = authenticate(request, username=username, password=password)
+    if user is None:
+        return Response({
+            'success': False,
+            'message': 'Invalid username or password'
+        }, status=status.HTTP_401_UNAUTHORIZED)
+    if not resolve_role(user)[f'{role}_id']:
+        return Response({
+            'success': False,
+            'message': f'You do not have {role} access'
+        }, status=status.HTTP_403_FORBIDDEN)
+
+    login(request, user)
+    remember_role(request._request, user)
+    return Response({
+        'success': True,
+        'user': _user_payload(user, role),
+        'message': f'Welcome back, {user.get_full_name() or user.username}!'
+    }, status=status.HTTP_200_OK)
+
+
+@api_view(['POST'])
+@permission_classes([AllowAny])
+def student_register_api(request):
+    """
+    POST /api/auth/student/register/
+    Body: {"username", "email", "password", "password2", "first_name", "last_name"}
+    """
+    username = (request.data.get('username') or '').strip()
+    email = (request.data.get('email') or '').strip()
+    password = request.data.get('password') or ''
+    password2 = request.data.get('password2') or ''
+    first_name = (request.data.get('first_name') or '').strip()
+    last_name = (request.data.get('last_name') or '').strip()
+
+    is_valid, error_message = validate_signup_data(username, email, password, password2)
+    if not is_valid:
+        return Response({'success': False, 'message': error_message}, status=status.HTTP_400_BAD_REQUEST)
+
+    success, error = create_user_with_profile(username, email, password, first_name, last_name, Student)
+    if not success:
+        return Response({'success': False, 'message': f'Error creating account: {error}'}, status=status.HTTP_400_BAD_REQUEST)
+
+    return Response({
+        'success': True,
+        'message': 'Account created successfully! Please login.',
+        'username': username,
+    }, status=status.HTTP_201_CREATED)
+
+
+@api_view(['POST'])
+@permission_classes([AllowAny])
+def student_login_api(request):
+    """POST /api/auth/student/login/  Body: {"username", "password"}"""
+    return _role_login(request, 'student')
+
+
+@api_view(['POST'])
+@permission_classes([AllowAny])
+def teacher_login_api(request):
+    """POST /api/auth/teacher/login/  Body: {"username", "password"}"""
+    return _role_login(request, 'teacher')
+
+
+@api_view(['POST'])
+@permission_classes([AllowAny])
+def token_obtain_api(request):
+    """
+    POST /api/auth/token/  Body: {"username", "password"}
+    Returns a signed bearer token for "Authorization: Bearer <token>".
+    """
+    username = (request.data.get('username') or '').strip()
+    password = request.data.get('password') or ''
+    if not username or not password:
+        return Response({
+            'success': False,
+            'message': 'Username and password are required'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    user = authenticate(request, username=username, password=password)
+    if user is None:
+        return Response({
+            'success': False,
+            'message': 'Invalid username or password'
+        }, status=status.HTTP_401_UNAUTHORIZED)
+    role = _get_user_role(user)
+    if role is None:
+        return Response({
+            'success': False,
+            'message': 'No teacher or student profile found'
+        }, status=status.HTTP_403_FORBIDDEN)
+
+    token, payload = issue_token(user, role)
+    return Response({
+        'success': True,
+        'token': token,
+        'token_type': 'Bearer',
+        'expires_at': datetime.fromtimestamp(payload['exp'], tz=timezone.utc).isoformat(),
+        'user': _user_payload(user, role),
+    }, status=status.HTTP_200_OK)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def token_revoke_api(request):
+    """
+    POST /api/auth/token/revoke/  Body: {"all": false}
+    Revokes the token used for this request, or with "all": true every
+    token issued to the user so far.
+    """
+    if request.data.get('all'):
+        revocation_list.revoke_user(request.user.id)
+    elif isinstance(request.auth, dict) and 'jti' in request.auth:
+        revocation_list.revoke(request.auth)
+    else:
+        return Response({
+            'success': False,
+            'message': 'This request was not made with a token'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    return Response({'success': True, 'message': 'Token revoked'}, status=status.HTTP_200_OK)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def logout_api(request):
+    """POST /api/auth/logout/"""
+    if isinstance(request.auth, dict) and 'jti' in request.auth:
+        revocation_list.revoke(request.auth)
+    logout(request)
+    return Response({'success': True, 'message': 'Logged out successfully'}, status=status.HTTP_200_OK)
+
+
+# ==========================================
+# DASHBOARD APIs
+# ==========================================
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def student_dashboard_api(request):
+    """GET /api/dashboard/student/ - summary numbers behind the student dashboard"""
+    if _get_user_role(request.user) != 'student':
+        return Response({'success': False, 'message': 'Student profile not found'}, status=status.HTTP_403_FORBIDDEN)
+
+    attempts = QuizAttempt.objects.filter(student=request.user)
+    completed_attempts = attempts.filter(status='completed')
+    # Archived attempts are all completed ones, counted through their rollups
+    archived = rollup_totals(AttemptRollup.objects.filter(student=request.user))
+    recent_attempts = attempts.select_related('quiz', 'student').order_by('-start_time')[:10]
+    return Response({
+        'success': True,
+        'total_attempts': attempts.count() + archived['attempts'],
+        'completed_attempts': completed_attempts.count() + archived['attempts'],
+        'avg_score': calculate_average_score(completed_attempts, archived),
+        'grade_distribution': calculate_student_grade_distribution(request.user),
+        'performance_stats': calculate_student_performance_stats(request.user),
+        'recent_attempts': QuizAttemptSerializer(recent_attempts, many=True).data,
+    }, status=status.HTTP_200_OK)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def teacher_dashboard_api(request):
+    """GET /api/dashboard/teacher/ - summary numbers behind the teacher dashboard"""
+    if _get_user_role(request.user) != 'teacher':
+        return Response({'success': False, 'message': 'Teacher profile not found'}, status=status.HTTP_403_FORBIDDEN)
+
+    teacher = request.user.teacher
+    quizzes = Quiz.objects.filter(created_by=teacher)
+    attempts = QuizAttempt.objects.filter(quiz__created_by=teacher)
+    rollups = AttemptRollup.objects.filter(quiz__created_by=teacher)
+    recent_quizzes = (
+        quizzes.select_related('created_by__user')
+        .annotate(num_questions=Count('questions'))
+        .order_by('-created_at')[:5]
+    )
+    return Response({
+        'success': True,
+        'total_quizzes': quizzes.count(),
+        'active_quizzes': quizzes.filter(status='active').count(),
+        'total_students': User.objects.filter(Q(id__in=attempts.values('student')) | Q(id__in=rollups.values('student'))).count(),
+        'total_attempts': attempts.count() + rollup_totals(rollups)['attempts'],
+        'grade_distribution': calculate_grade_distribution(teacher),
+        'recent_quizzes': QuizSerializer(recent_quizzes, many=True).data,
+    }, status=status.HTTP_200_OK)
+
+
+# ==========================================
+# VIEWSETS
+# ==========================================
+
+class SparseFieldsetViewMixin:
+    """Pass ?fields=a,b,c through to the serializer as a sparse fieldset"""
+
+    def requested_fields(self):
+        fields = self.request.query_params.get('fields')
+        if fields:
+            return [name.strip() for name in fields.split(',') if name.strip()]
+        return None
+
+    def get_serializer(self, *args, **kwargs):
+        fields = self.requested_fields()
+        if fields:
+            kwargs['fields'] = fields
+        return super().get_serializer(*args, **kwargs)
+
+    @property
+    def user_role(self):
+        if not hasattr(self, '_user_role'):
+            self._user_role = _get_user_role(self.request.user)
+        return self._user_role
+
+
+class FastListMixin:
+    """
+    Serve list pages straight from values_list() rows through a
+    FastSerializer; retrieve still uses the ModelSerializer.
+    """
+    fast_serializer_class = None
+    renderer_classes = FAST_RENDERER_CLASSES
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset()).prefetch_related(None)
+        # The cursor paginator reads its position from the ordering column
+        ordering_column = self.pagination_class.ordering.lstrip('-')
+        serializer = self.fast_serializer_class(self.requested_fields(), required=(ordering_column,))
+        page = self.paginate_queryset(serializer.rows(queryset))
+        return self.get_paginated_response(serializer.to_dicts(page))
+
+
+class QuizViewSet(FastListMixin, SparseFieldsetViewMixin, viewsets.ReadOnlyModelViewSet):
+    """
+    GET /api/quizzes/        teachers: their own quizzes, students: active quizzes
+    GET /api/quizzes/<id>/
+    """
+    serializer_class = QuizSerializer
+    fast_serializer_class = FastQuizSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = QuizCursorPagination
+
+    def get_queryset(self):
+        queryset = Quiz.objects.select_related('created_by__user').annotate(num_questions=Count('questions'))
+        if self.user_role == 'teacher':
+            return queryset.filter(created_by__user=self.request.user)
+        return queryset.filter(status='active')
+
+
+class QuestionViewSet(SparseFieldsetViewMixin, viewsets.ReadOnlyModelViewSet):
+    """
+    GET /api/questions/?quiz=<id>
+    The answer key is only included for the teacher who owns the quiz.
+    Students only get questions of active quizzes whose window is open.
+    """
+    permission_classes = [IsAuthenticated]
+    pagination_class = QuestionCursorPagination
+
+    def get_serializer_class(self):
+        return TeacherQuestionSerializer if self.user_role == 'teacher' else QuestionSerializer
+
+    def get_queryset(self):
+        queryset = Question.objects.prefetch_related('option_set')
+        if self.user_role == 'teacher':
+            queryset = queryset.filter(quiz__created_by__user=self.request.user)
+        else:
+            # Same rule as take_quiz: exam questions stay hidden outside the window
+            queryset = queryset.filter(Quiz.open_window_q(prefix='quiz__'), quiz__status='active')
+        quiz_id = self.request.query_params.get('quiz')
+        if quiz_id and quiz_id.isdigit():
+            queryset = queryset.filter(quiz_id=quiz_id)
+        return queryset
+
+
+class QuizAttemptViewSet(FastListMixin, SparseFieldsetViewMixin, viewsets.ReadOnlyModelViewSet):
+    """
+    GET /api/attempts/?quiz=<id>&status=<status>
+    Students see their own attempts, teachers see attempts on their quizzes.
+    """
+    serializer_class = QuizAttemptSerializer
+    fast_serializer_class = FastQuizAttemptSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = AttemptCursorPagination
+
+    def base_queryset(self):
+        queryset = QuizAttempt.objects.select_related('quiz', 'student')
+        if self.user_role == 'teacher':
+            queryset = queryset.filter(quiz__created_by__user=self.request.user)
+        else:
+            queryset = queryset.filter(student=self.request.user)
+        quiz_id = self.request.query_params.get('quiz')
+        if quiz_id and quiz_id.isdigit():
+            queryset = queryset.filter(quiz_id=quiz_id)
+        return queryset
+
+    def get_queryset(self):
+        queryset = self.base_queryset()
+        attempt_status = self.request.query_params.get('status')
+        if attempt_status:
+            queryset = queryset.filter(status=attempt_status)
+        return queryset
+
+
+class QuizResultViewSet(QuizAttemptViewSet):
+    """
+    GET /api/results/?quiz=<id>
+    Completed attempts with their answers.
+    """
+    serializer_class = QuizResultSerializer
+    fast_serializer_class = FastQuizResultSerializer
+    pagination_class = ResultCursorPagination
+
+    def get_queryset(self):
+        return self.base_queryset().filter(status='completed').prefetch_related('answers')
+
+
+# ==========================================
+# DELTA SYNC API
+# ==========================================
+
+SYNC_SERIALIZERS = {
+    'quizzes': QuizSerializer,
+    'questions': QuestionSerializer,
+    'attempts': QuizAttemptSerializer,
+    'results': QuizResultSerializer,
+}
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def sync_api(request, feed):
+    """
+    GET /api/sync/<quizzes|questions|attempts|results>/?since=<token>&limit=<n>
+
+    Returns {"changed": [...], "deleted": [ids], "next": token, "has_more": bool}.
+    Store "next" and send it as "since" on the following call; keep calling
+    while has_more is true.
+    """
+    if feed not in SYNC_SERIALIZERS:
+        return Response({'success': False, 'message': 'Unknown feed'}, status=status.HTTP_404_NOT_FOUND)
+    role = _get_user_role(request.user)
+    try:
+        limit = int(request.query_params.get('limit', DEFAULT_LIMIT))
+        changed, deleted, next_token, has_more = read_feed(
+            feed, request.user, role, since=request.query_params.get('since'), limit=limit
+        )
+    except (InvalidSyncToken, ValueError):
+        return Response({'success': False, 'message': 'Invalid sync token or limit'}, status=status.HTTP_400_BAD_REQUEST)
+
+    serializer_class = SYNC_SERIALIZERS[feed]
+    if feed == 'questions' and role == 'teacher':
+        serializer_class = TeacherQuestionSerializer
+    return Response({
+        'changed': serializer_class(changed, many=True).data,
+        'deleted': deleted,
+        'next': next_token,
+        'has_more': has_more,
+    }, status=status.HTTP_200_OK)
+
+
+# ==========================================
+# BATCH API
+# ==========================================
+
+def _run_sub_request(request, path):
+    """
+    Resolve one GET sub-request in-process. It reuses the outer request's
+    authenticated user object, so the session, user and teacher/student
+    profile lookups happen once for the whole batch.
+    """
+    url = urlsplit(path)
+    if not url.path.startswith('/api/') or url.netloc:
+        return status.HTTP_400_BAD_REQUEST, {'success': False, 'message': 'Only /api/ paths can be batched'}
+    try:
+        match = resolve(url.path)
+    except Resolver404:
+        return status.HTTP_404_NOT_FOUND, {'success': False, 'message': 'Not found'}
+    if match.func is batch_api:
+        return status.HTTP_400_BAD_REQUEST, {'success': False, 'message': 'Batches cannot be nested'}
+
+    outer = request._request
+    sub_request = copy.copy(outer)
+    sub_request.META = {**outer.META, 'REQUEST_METHOD': 'GET', 'PATH_INFO': url.path, 'QUERY_STRING': url.query}
+    sub_request.method = 'GET'
+    sub_request.path = sub_request.path_info = url.path
+    sub_request.GET = QueryDict(url.query)
+    sub_request.resolver_match = match
+    # DRF skips its authenticators and uses this user directly
+    sub_request._force_auth_user = request.user
+    sub_request._force_auth_token = request.auth
+
+    try:
+        response = match.func(sub_request, *match.args, **match.kwargs)
+    except Exception:
+        logger.exception("Batch sub-request failed: %s", path)
+        return status.HTTP_500_INTERNAL_SERVER_ERROR, {'success': False, 'message': 'Internal server error'}
+    if hasattr(response, 'data'):
+        return response.status_code, response.data
+    try:
+        return response.status_code, json.loads(response.content)
+    except ValueError:
+        return response.status_code, None
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def batch_api(request):
+    """
+    POST /api/batch/
+    {"requests": [{"id": "stats", "path": "/api/dashboard/teacher/"},
+                  {"id": "quizzes", "path": "/api/quizzes/?page_size=5"}]}
+
+    Resolves up to BATCH_MAX_REQUESTS read-only API calls in one round trip
+    and returns {"responses": [{"id", "status", "body"}, ...]} in order.
+    """
+    sub_requests = request.data.get('requests') if isinstance(request.data, dict) else None
+    if not isinstance(sub_requests, list) or not sub_requests:
+        return Response({'success': False, 'message': 'Expected a non-empty "requests" list'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(sub_requests) > BATCH_MAX_REQUESTS:
+        return Response({'success': False, 'message': f'At most {BATCH_MAX_REQUESTS} requests per batch'}, status=status.HTTP_400_BAD_REQUEST)
+
+    responses = []
+    for index, sub in enumerate(sub_requests):
+        sub = sub if isinstance(sub, dict) else {}
+        sub_id = sub.get('id', index)
+        if str(sub.get('method', 'GET')).upper() != 'GET':
+            sub_status, body = status.HTTP_405_METHOD_NOT_ALLOWED, {'success': False, 'message': 'Only GET requests can be batched'}
+        elif not isinstance(sub.get('path'), str):
+            sub_status, body = status.HTTP_400_BAD_REQUEST, {'success': False, 'message': 'Missing "path"'}
+        else:
+            sub_status, body = _run_sub_request(request, sub['path'])
+        responses.append({'id': sub_id, 'status': sub_status, 'body': body})
+    return Response({'responses': responses}, status=status.HTTP_200_OK)
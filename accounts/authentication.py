@@ -0,0 +1,165 @@
+"""
+Signed bearer-token authentication for API clients
+
+A token is a timestamped, HMAC-signed payload carrying the user id, username
+and role, so verifying it needs no session or user lookup:
+
+    Authorization: Bearer <token>
+
+Tokens expire after API_TOKEN_SETTINGS['TTL_SECONDS']. Revoked token ids
+(and per-user "revoke everything issued before" marks) are stored in the
+RevokedToken table until the tokens they cover expire, and mirrored in
+process memory, refreshed every API_TOKEN_SETTINGS['REVOCATION_REFRESH_SECONDS'].
+Deactivating a user revokes all of their tokens (accounts.signals).
+"""
+
+import threading
+import time
+import uuid
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import signing
+from django.utils import timezone
+from rest_framework.authentication import BaseAuthentication, get_authorization_header
+from rest_framework.exceptions import AuthenticationFailed
+
+from quiz.models import RevokedToken
+
+TOKEN_SALT = 'accounts.api-token'
+
+DEFAULT_API_TOKEN_SETTINGS = {
+    'TTL_SECONDS': 60 * 60,
+    'REVOCATION_REFRESH_SECONDS': 30,
+}
+
+
+def token_settings():
+    return {**DEFAULT_API_TOKEN_SETTINGS, **getattr(settings, 'API_TOKEN_SETTINGS', {})}
+
+
+def issue_token(user, role):
+    """Return (token, payload) for a user; payload['exp'] is the expiry timestamp."""
+    now = int(time.time())
+    payload = {
+        'uid': user.id,
+        'usr': user.username,
+        'role': role,
+        'jti': uuid.uuid4().hex,
+        'iat': now,
+        'exp': now + token_settings()['TTL_SECONDS'],
+    }
+    return signing.dumps(payload, salt=TOKEN_SALT, compress=True), payload
+
+
+def verify_token(token):
+    """Return the payload of a valid token; raises signing.BadSignature otherwise."""
+    payload = signing.loads(token, salt=TOKEN_SALT, max_age=token_settings()['TTL_SECONDS'])
+    if payload.get('exp', 0) < time.time():
+        raise signing.SignatureExpired('Token expired')
+    return payload
+
+
+class RevocationList:
+    """
+    In-memory mirror of the unexpired RevokedToken rows: {jti: exp} for
+    single tokens and {uid: (revoked_before, expires)} for users. The table
+    is the source of truth, so revocations survive cache culls and restarts
+    and concurrent revokes are plain inserts. Rows only live until the
+    tokens they cover expire, so reloading them all stays cheap.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tokens = {}
+        self._users = {}
+        self._loaded_at = 0
+
+    def _load(self):
+        tokens, users = {}, {}
+        rows = RevokedToken.objects.filter(expires_at__gt=timezone.now()).values_list(
+            'jti', 'user_id', 'revoked_before', 'expires_at',
+        )
+        for jti, user_id, revoked_before, expires_at in rows:
+            if jti:
+                tokens[jti] = expires_at.timestamp()
+            elif revoked_before is not None and revoked_before > users.get(user_id, (0, 0))[0]:
+                users[user_id] = (revoked_before, expires_at.timestamp())
+        return tokens, users
+
+    def _current(self):
+        if time.time() - self._loaded_at > token_settings()['REVOCATION_REFRESH_SECONDS']:
+            tokens, users = self._load()
+            with self._lock:
+                self._tokens, self._users, self._loaded_at = tokens, users, time.time()
+        return self._tokens, self._users
+
+    def is_revoked(self, payload):
+        tokens, users = self._current()
+        if payload['jti'] in tokens:
+            return True
+        revoked_before, _ = users.get(payload['uid'], (None, None))
+        return revoked_before is not None and payload['iat'] <= revoked_before
+
+    def _prune(self):
+        RevokedToken.objects.filter(expires_at__lte=timezone.now()).delete()
+
+    def revoke(self, payload):
+        RevokedToken.objects.get_or_create(
+            jti=payload['jti'],
+            defaults={'user_id': payload['uid'], 'expires_at': datetime.fromtimestamp(payload['exp'], tz=dt_timezone.utc)},
+        )
+        with self._lock:
+            self._tokens = {**self._tokens, payload['jti']: payload['exp']}
+        self._prune()
+
+    def revoke_user(self, user_id):
+        """Revoke every token issued to a user up to now."""
+        now = int(time.time())
+        # Any token issued up to now has expired by then
+        expires = now + token_settings()['TTL_SECONDS']
+        RevokedToken.objects.create(
+            user_id=user_id, revoked_before=now, expires_at=datetime.fromtimestamp(expires, tz=dt_timezone.utc),
+        )
+        with self._lock:
+            self._users = {**self._users, user_id: (now, expires)}
+        self._prune()
+
+
+revocation_list = RevocationList()
+
+
+class SignedTokenAuthentication(BaseAuthentication):
+    """
+    Authenticates ``Authorization: Bearer <token>`` without touching the
+    database. request.user is a User built from the token, carrying the id,
+    username and ``resolved_role``; request.auth is the token payload.
+    """
+    keyword = b'bearer'
+
+    def authenticate(self, request):
+        header = get_authorization_header(request).split()
+        if not header or header[0].lower() != self.keyword:
+            return None
+        if len(header) != 2:
+            raise AuthenticationFailed('Invalid token header')
+        try:
+            payload = verify_token(header[1].decode())
+        except signing.SignatureExpired:
+            raise AuthenticationFailed('Token expired')
+        except (signing.BadSignature, UnicodeDecodeError):
+            raise AuthenticationFailed('Invalid token')
+        if revocation_list.is_revoked(payload):
+            raise AuthenticationFailed('Token revoked')
+
+        # Deactivation revokes the user's tokens, so a token that got this far
+        # belongs to an active account
+        user = User(id=payload['uid'], username=payload['usr'], is_active=True)
+        user._state.adding = False
+        user._state.db = 'default'
+        user.resolved_role = payload['role']
+        return user, payload
+
+    def authenticate_header(self, request):
+        return 'Bearer'
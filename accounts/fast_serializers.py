@@ -0,0 +1,222 @@
+"""
+Fast serializers for the hot list endpoints
+
+``ModelSerializer`` builds a model instance per row and then walks a field
+object per attribute, which dominates CPU time on long lists of quizzes and
+attempts. These serializers read ``values_list()`` tuples and turn them into
+dicts with a converter that is built once per (serializer, fieldset) from
+``operator.itemgetter`` and a few closures, and shared between requests. The output is identical to the matching
+serializer in ``serializers.py``, including sparse ``fields``.
+"""
+
+from functools import lru_cache
+from operator import itemgetter
+
+from django.utils import timezone
+
+from quiz.models import StudentAnswer
+
+
+def datetime_to_iso(value, tz):
+    """Same representation as DRF's DateTimeField with the default ISO 8601 format."""
+    if value is None:
+        return None
+    value = value.astimezone(tz).isoformat()
+    if value.endswith('+00:00'):
+        value = value[:-6] + 'Z'
+    return value
+
+
+def display_name(first_name, last_name, username):
+    """Same as User.get_full_name() or User.username."""
+    full_name = f'{first_name} {last_name}'.strip()
+    return full_name or username
+
+
+def _tuple_getter(indexes):
+    """itemgetter that returns a tuple for any number of indexes, one or none included."""
+    if len(indexes) > 1:
+        return itemgetter(*indexes)
+    if indexes:
+        index = indexes[0]
+        return lambda row: (row[index],)
+    return lambda row: ()
+
+
+def _datetime_column(index):
+    def conversion(row, tz):
+        return datetime_to_iso(row[index], tz)
+    return conversion
+
+
+def _function_of_columns(function, indexes):
+    get_columns = _tuple_getter(indexes)
+
+    def conversion(row, tz):
+        return function(*get_columns(row))
+    return conversion
+
+
+class FastSerializer:
+    """
+    ``fields`` maps each output name to either a ``values_list`` lookup or a
+    ``(lookups, function)`` pair whose function receives those columns.
+    Names listed in ``datetime_fields`` are rendered as ISO 8601 strings.
+
+    ``required`` lookups are fetched even when no requested field uses them,
+    e.g. the column a cursor paginator reads its position from.
+    """
+    fields = {}
+    datetime_fields = ()
+
+    def __init__(self, fields=None, required=()):
+        self.lookups, self.convert = self.compile(tuple(fields) if fields else None, tuple(required))
+
+    @classmethod
+    @lru_cache(maxsize=64)
+    def compile(cls, fields=None, required=()):
+        """
+        Return the lookups to fetch and a ``convert(row, tz)`` that builds
+        the output dict for one row. One itemgetter picks every field's
+        column in output order; only the fields that need converting (dates
+        and computed fields) run a small closure per row.
+        """
+        lookups = list(dict.fromkeys(required))
+
+        def column(lookup):
+            if lookup not in lookups:
+                lookups.append(lookup)
+            return lookups.index(lookup)
+
+        names, indexes, conversions = [], [], []
+        for name, spec in cls.fields.items():
+            if fields is not None and name not in fields:
+                continue
+            if isinstance(spec, str):
+                index = column(spec)
+                if name in cls.datetime_fields:
+                    conversions.append((len(names), _datetime_column(index)))
+            else:
+                lookup_names, function = spec
+                columns = [column(lookup) for lookup in lookup_names]
+                # Picked as a placeholder, then replaced by the function's result
+                index = columns[0]
+                conversions.append((len(names), _function_of_columns(function, columns)))
+            names.append(name)
+            indexes.append(index)
+
+        names, pick = tuple(names), _tuple_getter(indexes)
+        if not conversions:
+            def convert(row, tz):
+                return dict(zip(names, pick(row)))
+        else:
+            def convert(row, tz):
+                values = list(pick(row))
+                for position, conversion in conversions:
+                    values[position] = conversion(row, tz)
+                return dict(zip(names, values))
+        return tuple(lookups), convert
+
+    def rows(self, queryset):
+        """
+        Named tuples for this fieldset (one query). Attribute access by lookup
+        name is what CursorPagination uses to read the page position.
+        """
+        return queryset.values_list(*self.lookups, named=True)
+
+    def to_dicts(self, rows):
+        tz = timezone.get_current_timezone()
+        convert = self.convert
+        return [convert(row, tz) for row in rows]
+
+    def serialize(self, queryset):
+        return self.to_dicts(self.rows(queryset))
+
+
+class FastQuizSerializer(FastSerializer):
+    """Matches QuizSerializer; the queryset must be annotated with num_questions."""
+    fields = {
+        'id': 'id',
+        'title': 'title',
+        'category': 'category',
+        'description': 'description',
+        'difficulty': 'difficulty',
+        'time_limit': 'time_limit',
+        'total_marks': 'total_marks',
+        'passing_marks': 'passing_marks',
+        'status': 'status',
+        'allow_retake': 'allow_retake',
+        'max_attempts': 'max_attempts',
+        'shuffle_questions': 'shuffle_questions',
+        'shuffle_options': 'shuffle_options',
+        'show_correct_answers': 'show_correct_answers',
+        'opens_at': 'opens_at',
+        'closes_at': 'closes_at',
+        'teacher': (('created_by__user__first_name', 'created_by__user__last_name', 'created_by__user__username'), display_name),
+        'question_count': 'num_questions',
+        'created_at': 'created_at',
+        'updated_at': 'updated_at',
+    }
+    datetime_fields = ('opens_at', 'closes_at', 'created_at', 'updated_at')
+
+
+class FastQuizAttemptSerializer(FastSerializer):
+    """Matches QuizAttemptSerializer."""
+    fields = {
+        'id': 'id',
+        'quiz': 'quiz_id',
+        'quiz_title': 'quiz__title',
+        'student': 'student_id',
+        'student_username': 'student__username',
+        'status': 'status',
+        'start_time': 'start_time',
+        'end_time': 'end_time',
+        'time_spent': 'time_spent',
+        'score': 'score',
+        'max_score': 'max_score',
+        'percentage': 'percentage',
+        'passed': 'passed',
+        'correct_answers': 'correct_answers',
+        'incorrect_answers': 'incorrect_answers',
+        'unanswered': 'unanswered',
+        'updated_at': 'updated_at',
+    }
+    datetime_fields = ('start_time', 'end_time', 'updated_at')
+
+
+class FastStudentAnswerSerializer(FastSerializer):
+    """Matches StudentAnswerSerializer."""
+    fields = {
+        'question': 'question_id',
+        'selected_option': 'selected_option_id',
+        'is_correct': 'is_correct',
+        'is_flagged': 'is_flagged',
+        'time_taken': 'time_taken',
+    }
+
+
+class FastQuizResultSerializer(FastQuizAttemptSerializer):
+    """Matches QuizResultSerializer; answers are loaded with one extra query per page."""
+
+    def __init__(self, fields=None, required=()):
+        self.with_answers = not fields or 'answers' in fields
+        # The id links each attempt to its answers
+        super().__init__(fields, required=('id',) + tuple(required))
+
+    def to_dicts(self, rows):
+        rows = list(rows)
+        data = super().to_dicts(rows)
+        if self.with_answers:
+            answers = self.answers_by_attempt([row[0] for row in rows])
+            for row, item in zip(rows, data):
+                item['answers'] = answers[row[0]]
+        return data
+
+    def answers_by_attempt(self, attempt_ids):
+        answers = {attempt_id: [] for attempt_id in attempt_ids}
+        serializer = FastStudentAnswerSerializer(required=('attempt_id',))
+        queryset = StudentAnswer.objects.filter(attempt_id__in=attempt_ids).order_by('attempt_id', 'id')
+        rows = queryset.values_list(*serializer.lookups)
+        for row, item in zip(rows, serializer.to_dicts(rows)):
+            answers[row[0]].append(item)
+        return answers
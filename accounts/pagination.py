@@ -0,0 +1,31 @@
+"""
+Cursor pagination for the REST API
+
+Cursor pagination seeks on an indexed column instead of running the
+COUNT(*) + OFFSET that PageNumberPagination needs, so the cost of a page
+does not grow with the table or with how deep the client has paged.
+"""
+
+from rest_framework.pagination import CursorPagination
+
+
+class BaseCursorPagination(CursorPagination):
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+class QuizCursorPagination(BaseCursorPagination):
+    ordering = '-created_at'  # quiz_quiz_created_f537cb_idx
+
+
+class QuestionCursorPagination(BaseCursorPagination):
+    ordering = 'id'
+
+
+class AttemptCursorPagination(BaseCursorPagination):
+    ordering = '-start_time'  # quiz_quizat_start_t_dcc9be_idx
+
+
+class ResultCursorPagination(BaseCursorPagination):
+    ordering = '-id'
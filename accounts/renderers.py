@@ -0,0 +1,54 @@
+"""
+Faster renderers for the hot API endpoints
+
+``ORJSONRenderer`` produces the same bytes as DRF's ``JSONRenderer`` but
+encodes with orjson when it is installed, and falls back to the stock
+renderer otherwise. ``MessagePackRenderer`` is offered to clients that send
+``Accept: application/x-msgpack`` when msgpack is installed.
+"""
+
+from rest_framework.renderers import BaseRenderer, BrowsableAPIRenderer, JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+class ORJSONRenderer(JSONRenderer):
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None or self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        # Datetimes, Decimals and lazy strings go through DRF's encoder so
+        # the output matches JSONRenderer exactly
+        ret = orjson.dumps(
+            data,
+            default=self.encoder_class().default,
+            option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS,
+        )
+        # JSONRenderer escapes these so the output is also valid JavaScript
+        return ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
+
+
+class MessagePackRenderer(BaseRenderer):
+    media_type = 'application/x-msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=JSONRenderer.encoder_class().default, use_bin_type=True)
+
+
+FAST_RENDERER_CLASSES = [ORJSONRenderer]
+if msgpack is not None:
+    FAST_RENDERER_CLASSES.append(MessagePackRenderer)
+FAST_RENDERER_CLASSES.append(BrowsableAPIRenderer)
@@ -0,0 +1,92 @@
+"""
+Serializers for the REST API
+
+Every serializer accepts a ``fields`` argument (wired to the ``?fields=``
+query parameter by the viewsets) so clients can request a sparse fieldset.
+"""
+
+from rest_framework import serializers
+from quiz.models import Quiz, Question, Option, QuizAttempt, StudentAnswer
+
+
+class SparseFieldsetMixin:
+    """Drop every field not listed in the ``fields`` keyword argument."""
+
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+        if fields:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+class QuizSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    teacher = serializers.SerializerMethodField()
+    question_count = serializers.IntegerField(source='num_questions', read_only=True)
+
+    class Meta:
+        model = Quiz
+        fields = [
+            'id', 'title', 'category', 'description', 'difficulty', 'time_limit',
+            'total_marks', 'passing_marks', 'status', 'allow_retake', 'max_attempts',
+            'shuffle_questions', 'shuffle_options', 'show_correct_answers',
+            'opens_at', 'closes_at', 'teacher', 'question_count', 'created_at', 'updated_at',
+        ]
+
+    def get_teacher(self, obj):
+        user = obj.created_by.user
+        return user.get_full_name() or user.username
+
+
+class OptionSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Option
+        fields = ['id', 'option_text', 'order']
+
+
+class OptionWithAnswerSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Option
+        fields = ['id', 'option_text', 'order', 'is_correct']
+
+
+class QuestionSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    options = OptionSerializer(source='option_set', many=True, read_only=True)
+
+    class Meta:
+        model = Question
+        fields = ['id', 'quiz', 'question_text', 'question_type', 'marks', 'order', 'options', 'created_at', 'updated_at']
+
+
+class TeacherQuestionSerializer(QuestionSerializer):
+    """Question with the answer key, for the quiz owner only."""
+    options = OptionWithAnswerSerializer(source='option_set', many=True, read_only=True)
+
+    class Meta(QuestionSerializer.Meta):
+        fields = QuestionSerializer.Meta.fields + ['explanation']
+
+
+class QuizAttemptSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    quiz_title = serializers.CharField(source='quiz.title', read_only=True)
+    student_username = serializers.CharField(source='student.username', read_only=True)
+
+    class Meta:
+        model = QuizAttempt
+        fields = [
+            'id', 'quiz', 'quiz_title', 'student', 'student_username', 'status',
+            'start_time', 'end_time', 'time_spent', 'score', 'max_score', 'percentage',
+            'passed', 'correct_answers', 'incorrect_answers', 'unanswered', 'updated_at',
+        ]
+
+
+class StudentAnswerSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = StudentAnswer
+        fields = ['question', 'selected_option', 'is_correct', 'is_flagged', 'time_taken']
+
+
+class QuizResultSerializer(QuizAttemptSerializer):
+    answers = StudentAnswerSerializer(many=True, read_only=True)
+
+    class Meta(QuizAttemptSerializer.Meta):
+        fields = QuizAttemptSerializer.Meta.fields + ['answers']
@@ -0,0 +1,26 @@
+"""
+Signal handlers for the accounts app
+
+Deactivating a user revokes every API token issued to them, since
+SignedTokenAuthentication does not look the user up on each request.
+"""
+
+from django.contrib.auth.models import User
+from django.db.models.signals import post_save, pre_save
+from django.dispatch import receiver
+
+from .authentication import revocation_list
+
+
+@receiver(pre_save, sender=User)
+def remember_user_active(sender, instance, update_fields=None, **kwargs):
+    if instance.pk is None or (update_fields is not None and 'is_active' not in update_fields):
+        instance._was_active = None
+        return
+    instance._was_active = User.objects.filter(pk=instance.pk).values_list('is_active', flat=True).first()
+
+
+@receiver(post_save, sender=User)
+def revoke_tokens_of_deactivated_user(sender, instance, created, **kwargs):
+    if not created and getattr(instance, '_was_active', None) and not instance.is_active:
+        revocation_list.revoke_user(instance.pk)
@@ -0,0 +1,164 @@
+"""
+Delta-sync feeds for mobile and LMS clients
+
+A client keeps an opaque ``since`` token per feed. Each call returns the
+rows created or updated after the token (ordered by the (updated_at, id)
+index), tombstones for rows deleted after it, and the token to send next.
+A first call without a token returns everything; later calls return only
+the changes.
+
+Students only get the questions of active quizzes whose exam window is
+open. Their question rows are stamped with the latest of the question's
+and the quiz's updated_at and the quiz's opens_at, so questions arrive
+when the window opens and again when the quiz comes back to 'active'.
+When a quiz leaves 'active', students-only tombstones (quiz.signals) tell
+student clients to drop it; teachers keep their copies. Closed windows
+write nothing: the token also carries the time of the previous call, and
+the questions of quizzes whose window closed since then (or that were
+edited since, and are closed) are listed as deleted. Students are only
+sent tombstones of quizzes and questions they could see when they were
+deleted (Tombstone.teachers_only).
+"""
+
+import base64
+import json
+from datetime import timedelta
+
+from django.db.models import Count, F, Q
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from quiz.models import Quiz, Question, QuizAttempt, Tombstone
+
+DEFAULT_LIMIT = 200
+MAX_LIMIT = 1000
+
+# Rows whose transaction commits slightly after a later timestamp was read
+# would be skipped by a cursor at "now"; stay this far behind the clock.
+SETTLE_WINDOW = timedelta(seconds=2)
+
+FEED_TOMBSTONES = {
+    'quizzes': 'quiz',
+    'questions': 'question',
+    'attempts': 'attempt',
+    'results': 'attempt',
+}
+
+
+class InvalidSyncToken(ValueError):
+    pass
+
+
+def encode_token(updated_at, last_id, tombstone_id, closed_after):
+    raw = json.dumps({
+        't': updated_at.isoformat() if updated_at else None, 'i': last_id, 'd': tombstone_id,
+        'c': closed_after.isoformat(),
+    })
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_token(token):
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        data = json.loads(raw)
+        updated_at = parse_datetime(data['t']) if data['t'] else None
+        # Tokens from before closed windows were derived carry no 'c'
+        closed_after = parse_datetime(data['c']) if data.get('c') else updated_at
+        return updated_at, int(data['i']), int(data['d']), closed_after
+    except (ValueError, KeyError, TypeError) as e:
+        raise InvalidSyncToken('Invalid sync token') from e
+
+
+def feed_queryset(feed, user, role, now=None):
+    """
+    Rows of a feed visible to this user, before any cursor filtering, with
+    the sync_at timestamp the cursor follows.
+    """
+    if feed == 'questions' and role != 'teacher':
+        return (
+            Question.objects.prefetch_related('option_set')
+            .filter(Quiz.open_window_q(now, prefix='quiz__'), quiz__status='active', quiz__deleted_at__isnull=True)
+            .annotate(sync_at=Greatest('updated_at', 'quiz__updated_at', Coalesce('quiz__opens_at', 'updated_at')))
+        )
+    return _feed_rows(feed, user, role).annotate(sync_at=F('updated_at'))
+
+
+def _feed_rows(feed, user, role):
+    if feed == 'quizzes':
+        queryset = Quiz.objects.select_related('created_by__user').annotate(num_questions=Count('questions'))
+        if role == 'teacher':
+            return queryset.filter(created_by__user=user)
+        return queryset.filter(status='active')
+    if feed == 'questions':
+        return Question.objects.prefetch_related('option_set').filter(quiz__created_by__user=user, quiz__deleted_at__isnull=True)
+    queryset = QuizAttempt.objects.select_related('quiz', 'student')
+    if role == 'teacher':
+        queryset = queryset.filter(quiz__created_by__user=user)
+    else:
+        queryset = queryset.filter(student=user)
+    if feed == 'results':
+        queryset = queryset.filter(status='completed').prefetch_related('answers')
+    return queryset
+
+
+def tombstone_queryset(feed, user, role):
+    tombstones = Tombstone.objects.filter(model_name=FEED_TOMBSTONES[feed])
+    if feed in ('attempts', 'results'):
+        if role == 'teacher':
+            return tombstones.filter(quiz_id__in=Quiz.objects.filter(created_by__user=user).values('id'))
+        return tombstones.filter(owner_id=user.id)
+    if role == 'teacher':
+        return tombstones.filter(owner_id=user.teacher.id, students_only=False)
+    # Students see the public catalogue, but not drafts or closed windows
+    return tombstones.filter(teachers_only=False)
+
+
+def closed_window_questions(closed_after, horizon):
+    """
+    Ids of the questions of active quizzes that are closed at ``horizon``
+    and closed, or were edited, after ``closed_after``.
+    """
+    quizzes = Quiz.objects.filter(status='active', closes_at__lte=horizon)
+    if closed_after is not None:
+        quizzes = quizzes.filter(Q(closes_at__gt=closed_after) | Q(updated_at__gt=closed_after))
+    return list(Question.objects.filter(quiz__in=quizzes).order_by('id').values_list('id', flat=True))
+
+
+def read_feed(feed, user, role, since=None, limit=DEFAULT_LIMIT):
+    """
+    Return (changed rows, deleted ids, next token, has_more) for one page of
+    a feed. Raises InvalidSyncToken for a malformed token.
+    """
+    limit = max(1, min(limit, MAX_LIMIT))
+    now = timezone.now()
+    horizon = now - SETTLE_WINDOW
+    if since:
+        updated_after, last_id, tombstone_id, closed_after = decode_token(since)
+    else:
+        # A full download already excludes everything deleted or closed so far
+        updated_after, last_id = None, 0
+        tombstone_id = Tombstone.objects.order_by('-id').values_list('id', flat=True).first() or 0
+        closed_after = horizon
+
+    changed = feed_queryset(feed, user, role, now).filter(sync_at__lte=horizon)
+    if updated_after is not None:
+        changed = changed.filter(Q(sync_at__gt=updated_after) | Q(sync_at=updated_after, id__gt=last_id))
+    changed = list(changed.order_by('sync_at', 'id')[:limit + 1])
+
+    deleted = list(
+        tombstone_queryset(feed, user, role).filter(id__gt=tombstone_id)
+        .order_by('id').values_list('id', 'object_id')[:limit + 1]
+    )
+
+    has_more = len(changed) > limit or len(deleted) > limit
+    changed, deleted = changed[:limit], deleted[:limit]
+    if changed:
+        updated_after, last_id = changed[-1].sync_at, changed[-1].id
+    if deleted:
+        tombstone_id = deleted[-1][0]
+    deleted = [object_id for _, object_id in deleted]
+    if since and feed == 'questions' and role != 'teacher':
+        deleted += closed_window_questions(closed_after, horizon)
+    next_token = encode_token(updated_after, last_id, tombstone_id, horizon)
+    return changed, deleted, next_token, has_more
@@ -1,3 +1,419 @@
-from django.test import TestCase
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.core import signing
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.api_views import BATCH_MAX_REQUESTS
+from accounts.authentication import RevocationList, issue_token, revocation_list, verify_token
+from accounts.fast_serializers import FastQuizSerializer
+from accounts.serializers import QuizSerializer
+from accounts.sync import DEFAULT_LIMIT, read_feed
+from quiz.models import Question, Quiz, RevokedToken, Tombstone
+from quiz.tests.base import PASSWORD, QuizTestCase, make_attempt, make_quiz, make_student, make_teacher
+
+
+class APITestCase(QuizTestCase):
+    client_class = APIClient
+
+    def setUp(self):
+        super().setUp()
+        # The process-wide mirror outlives each test's rolled-back rows
+        revocation_list._tokens, revocation_list._users, revocation_list._loaded_at = {}, {}, 0
+
+    def bearer(self, token):
+        return {'HTTP_AUTHORIZATION': f'Bearer {token}'}
+
+    def assertRejected(self, response, detail):
+        # SessionAuthentication comes first, so DRF answers 403 rather than 401
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(str(response.data['detail']), detail)
+
+
+class SignedTokenTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = make_student()
+
+    def obtain(self):
+        response = self.client.post(reverse('api:token_obtain'), {'username': self.user.username, 'password': PASSWORD})
+        self.assertEqual(response.status_code, 200)
+        return response.data['token']
+
+    def dashboard(self, token):
+        return self.client.get(reverse('api:student_dashboard'), **self.bearer(token))
+
+    def test_token_authenticates_api_requests(self):
+        token = self.obtain()
+        payload = verify_token(token)
+        self.assertEqual((payload['uid'], payload['role']), (self.user.id, 'student'))
+        self.assertEqual(self.dashboard(token).status_code, 200)
+
+    def test_wrong_password_gets_no_token(self):
+        response = self.client.post(reverse('api:token_obtain'), {'username': self.user.username, 'password': 'wrong'})
+        self.assertEqual(response.status_code, 401)
+
+    def test_tampered_token_is_rejected(self):
+        token = self.obtain()
+        self.assertRejected(self.dashboard(token[:-2] + 'xx'), 'Invalid token')
+
+    def test_expired_token_is_rejected(self):
+        with override_settings(API_TOKEN_SETTINGS={'TTL_SECONDS': -1}):
+            token, _ = issue_token(self.user, 'student')
+        with self.assertRaises(signing.SignatureExpired):
+            verify_token(token)
+        self.assertRejected(self.dashboard(token), 'Token expired')
+
+    def test_revoke_only_the_token_used(self):
+        token, other = self.obtain(), self.obtain()
+        response = self.client.post(reverse('api:token_revoke'), **self.bearer(token))
+        self.assertEqual(response.status_code, 200)
+        self.assertRejected(self.dashboard(token), 'Token revoked')
+        self.assertEqual(self.dashboard(other).status_code, 200)
+
+    def test_revoke_all(self):
+        token, other = self.obtain(), self.obtain()
+        response = self.client.post(reverse('api:token_revoke'), {'all': True}, format='json', **self.bearer(token))
+        self.assertEqual(response.status_code, 200)
+        self.assertRejected(self.dashboard(token), 'Token revoked')
+        self.assertRejected(self.dashboard(other), 'Token revoked')
+
+    def test_revocations_survive_a_cache_clear_and_a_new_process(self):
+        token, other = self.obtain(), self.obtain()
+        revocation_list.revoke(verify_token(token))
+        cache.clear()
+        fresh = RevocationList()
+        self.assertTrue(fresh.is_revoked(verify_token(token)))
+        self.assertFalse(fresh.is_revoked(verify_token(other)))
+
+    def test_deactivation_revokes_every_token(self):
+        token = self.obtain()
+        self.user.is_active = False
+        self.user.save()
+        self.assertRejected(self.dashboard(token), 'Token revoked')
+        self.assertTrue(RevocationList().is_revoked(verify_token(token)))
+
+    def test_saving_an_active_user_revokes_nothing(self):
+        token = self.obtain()
+        self.user.first_name = 'Renamed'
+        self.user.save()
+        self.assertEqual(self.dashboard(token).status_code, 200)
+        self.assertFalse(RevokedToken.objects.exists())
+
+    def test_token_carries_the_teacher_role(self):
+        teacher = make_teacher('teacher2')
+        response = self.client.post(reverse('api:token_obtain'), {'username': teacher.user.username, 'password': PASSWORD})
+        token = response.data['token']
+        self.assertEqual(verify_token(token)['role'], 'teacher')
+        self.assertEqual(self.client.get(reverse('api:teacher_dashboard'), **self.bearer(token)).status_code, 200)
+        self.assertEqual(self.client.get(reverse('api:student_dashboard'), **self.bearer(token)).status_code, 403)
+
+    def test_tokens_issued_after_revoke_all_still_work(self):
+        token = self.obtain()
+        self.client.post(reverse('api:token_revoke'), {'all': True}, format='json', **self.bearer(token))
+        revoked_before = RevokedToken.objects.get(user_id=self.user.id).revoked_before
+        with mock.patch('accounts.authentication.time.time', return_value=revoked_before + 1):
+            later, _ = issue_token(self.user, 'student')
+        self.assertEqual(self.dashboard(later).status_code, 200)
+
+    def test_other_processes_see_a_revocation_after_their_refresh(self):
+        token = self.obtain()
+        other_process = RevocationList()
+        self.assertFalse(other_process.is_revoked(verify_token(token)))
+        revocation_list.revoke(verify_token(token))
+        # Still inside its refresh interval, it trusts its own mirror
+        self.assertFalse(other_process.is_revoked(verify_token(token)))
+        other_process._loaded_at = 0
+        self.assertTrue(other_process.is_revoked(verify_token(token)))
+
+    def test_logout_revokes_the_bearer_token(self):
+        token = self.obtain()
+        self.assertEqual(self.client.post(reverse('api:logout'), **self.bearer(token)).status_code, 200)
+        self.assertRejected(self.dashboard(token), 'Token revoked')
+
+    def test_revoke_without_a_token_is_a_bad_request(self):
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.post(reverse('api:token_revoke')).status_code, 400)
+
+    def test_expired_revocations_are_pruned(self):
+        RevokedToken.objects.create(jti='stale', user_id=self.user.id, expires_at=timezone.now() - timedelta(seconds=1))
+        revocation_list.revoke(verify_token(self.obtain()))
+        self.assertFalse(RevokedToken.objects.filter(jti='stale').exists())
+        self.assertEqual(RevokedToken.objects.count(), 1)
+
+
+class ViewSetTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.teacher = make_teacher()
+        self.quizzes = [make_quiz(self.teacher, questions=2, title=f'Quiz {index}') for index in range(5)]
+        make_quiz(self.teacher, title='Draft', status='draft')
+        make_quiz(make_teacher('other'), title='Someone else')
+        self.student = make_student()
+        make_attempt(self.student, self.quizzes[0], correct=1)
+        make_attempt(make_student('other_student'), self.quizzes[0], correct=2)
+
+    def walk(self, url):
+        """Follow the cursor through every page, returning all results."""
+        results = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            page = response.json()
+            self.assertNotIn('count', page)
+            results.extend(page['results'])
+            url = page['next']
+        return results
+
+    def test_cursor_pages_through_every_quiz_once(self):
+        self.client.force_login(self.teacher.user)
+        results = self.walk(reverse('api:api_quiz-list') + '?page_size=2')
+        expected = Quiz.objects.filter(created_by=self.teacher).order_by('-created_at').values_list('id', flat=True)
+        self.assertEqual([quiz['id'] for quiz in results], list(expected))
+
+    def test_students_only_list_active_quizzes(self):
+        self.client.force_login(self.student)
+        titles = {quiz['title'] for quiz in self.walk(reverse('api:api_quiz-list'))}
+        self.assertNotIn('Draft', titles)
+        self.assertIn('Someone else', titles)
+
+    def test_sparse_fieldset(self):
+        self.client.force_login(self.teacher.user)
+        results = self.walk(reverse('api:api_quiz-list') + '?fields=id,title')
+        self.assertTrue(results)
+        for quiz in results:
+            self.assertEqual(set(quiz), {'id', 'title'})
+
+    def test_list_rows_match_the_detail_serializer(self):
+        self.client.force_login(self.teacher.user)
+        for name in ('api_quiz', 'api_attempt', 'api_result'):
+            with self.subTest(endpoint=name):
+                listed = self.walk(reverse(f'api:{name}-list'))
+                self.assertTrue(listed)
+                for row in listed:
+                    self.assertEqual(row, self.client.get(reverse(f'api:{name}-detail', args=[row['id']])).json())
+
+    def test_answer_key_is_only_sent_to_the_owner(self):
+        url = reverse('api:api_question-list') + f'?quiz={self.quizzes[0].id}'
+        self.client.force_login(self.teacher.user)
+        self.assertTrue(all('is_correct' in option for question in self.walk(url) for option in question['options']))
+        self.client.force_login(self.student)
+        questions = self.walk(url)
+        self.assertEqual(len(questions), 2)
+        self.assertFalse(any('is_correct' in option for question in questions for option in question['options']))
+
+    def test_students_only_see_their_own_attempts(self):
+        self.client.force_login(self.student)
+        attempts = self.walk(reverse('api:api_attempt-list'))
+        self.assertEqual({attempt['student'] for attempt in attempts}, {self.student.id})
+        self.client.force_login(self.teacher.user)
+        self.assertEqual(len(self.walk(reverse('api:api_attempt-list'))), 2)
+
+
+class BatchTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.teacher = make_teacher()
+        self.quizzes = [make_quiz(self.teacher, questions=2, title=f'Quiz {index}') for index in range(3)]
+        self.paths = [
+            reverse('api:teacher_dashboard'),
+            reverse('api:api_quiz-list') + '?page_size=2',
+            reverse('api:api_question-list') + f'?quiz={self.quizzes[0].id}',
+        ]
+
+    def batch(self, requests, **extra):
+        return self.client.post(reverse('api:batch'), {'requests': requests}, format='json', **extra)
+
+    def test_responses_match_the_separate_calls_in_order(self):
+        self.client.force_login(self.teacher.user)
+        with CaptureQueriesContext(connection) as separate:
+            expected = [self.client.get(path) for path in self.paths]
+        with CaptureQueriesContext(connection) as batched:
+            response = self.batch([{'id': f'call{index}', 'path': path} for index, path in enumerate(self.paths)])
+
+        self.assertEqual(response.status_code, 200)
+        responses = response.json()['responses']
+        self.assertEqual([item['id'] for item in responses], ['call0', 'call1', 'call2'])
+        for item, single in zip(responses, expected):
+            self.assertEqual((item['status'], item['body']), (single.status_code, single.json()))
+        # The session, user and profile are loaded once for the whole batch
+        self.assertLess(len(batched), len(separate))
+
+    def test_bearer_token_reaches_the_sub_requests(self):
+        token, _ = issue_token(self.teacher.user, 'teacher')
+        response = self.batch([{'path': self.paths[0]}], **self.bearer(token))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['responses'][0]['status'], 200)
+
+    def test_sub_requests_that_cannot_be_batched(self):
+        self.client.force_login(self.teacher.user)
+        response = self.batch([
+            {'id': 'write', 'method': 'POST', 'path': self.paths[0]},
+            {'id': 'outside', 'path': '/teacher/dashboard/'},
+            {'id': 'remote', 'path': 'https://example.com/api/quizzes/'},
+            {'id': 'nested', 'path': reverse('api:batch')},
+            {'id': 'unknown', 'path': '/api/nothing-here/'},
+            {'id': 'no-path'},
+        ])
+        self.assertEqual(response.status_code, 200)
+        statuses = {item['id']: item['status'] for item in response.json()['responses']}
+        self.assertEqual(statuses, {'write': 405, 'outside': 400, 'remote': 400, 'nested': 400, 'unknown': 404, 'no-path': 400})
+
+    def test_malformed_batches_are_rejected(self):
+        self.client.force_login(self.teacher.user)
+        self.assertEqual(self.batch([]).status_code, 400)
+        self.assertEqual(self.batch([{'path': self.paths[0]}] * (BATCH_MAX_REQUESTS + 1)).status_code, 400)
+        self.assertEqual(self.client.post(reverse('api:batch'), {'requests': 'all'}, format='json').status_code, 400)
+
+    def test_anonymous_batch_is_rejected(self):
+        self.assertEqual(self.batch([{'path': self.paths[0]}]).status_code, 403)
+
+
+class FastSerializerTests(QuizTestCase):
+    def setUp(self):
+        super().setUp()
+        make_quiz(make_teacher(), title='Windowed', opens_at=timezone.now(), closes_at=timezone.now() + timedelta(days=1))
+        make_quiz(make_teacher('other'), title='Open')
+        self.quizzes = Quiz.objects.select_related('created_by__user').annotate(num_questions=Count('questions')).order_by('id')
+
+    def assertSameAsSerializer(self, fields=None):
+        expected = [dict(QuizSerializer(quiz, fields=fields).data) for quiz in self.quizzes]
+        actual = FastQuizSerializer(fields).serialize(self.quizzes)
+        self.assertEqual(actual, expected)
+        # Field order too, so the JSON is byte for byte the same
+        self.assertEqual([list(row) for row in actual], [list(row) for row in expected])
+
+    def test_every_field(self):
+        self.assertSameAsSerializer()
+
+    def test_sparse_fieldsets(self):
+        for fields in (['id'], ['teacher'], ['closes_at'], ['title', 'teacher', 'opens_at', 'question_count']):
+            with self.subTest(fields=fields):
+                self.assertSameAsSerializer(fields)
+
+
+class DeltaSyncTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        # Rows written by the test are read back at once, so skip the settle window
+        patcher = mock.patch('accounts.sync.SETTLE_WINDOW', timedelta(0))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.teacher = make_teacher()
+        self.quizzes = [make_quiz(self.teacher, questions=2, title=f'Quiz {index}') for index in range(3)]
+        self.student = make_student()
+
+    def sync(self, feed, user, since=None, limit=DEFAULT_LIMIT):
+        role = 'teacher' if hasattr(user, 'teacher') else 'student'
+        changed, deleted, next_token, has_more = read_feed(feed, user, role, since=since, limit=limit)
+        return [row.id for row in changed], deleted, next_token, has_more
+
+    def test_first_call_returns_everything_then_only_changes(self):
+        changed, deleted, token, has_more = self.sync('quizzes', self.teacher.user)
+        self.assertEqual(changed, [quiz.id for quiz in self.quizzes])
+        self.assertEqual((deleted, has_more), ([], False))
+        self.assertEqual(self.sync('quizzes', self.teacher.user, token)[:2], ([], []))
+
+        self.quizzes[1].title = 'Renamed'
+        self.quizzes[1].save()
+        changed, _, token, _ = self.sync('quizzes', self.teacher.user, token)
+        self.assertEqual(changed, [self.quizzes[1].id])
+        self.assertEqual(self.sync('quizzes', self.teacher.user, token)[0], [])
+
+    def test_pages_cover_every_row_once(self):
+        seen, token, has_more = [], None, True
+        while has_more:
+            changed, _, token, has_more = self.sync('questions', self.teacher.user, token, limit=4)
+            self.assertLessEqual(len(changed), 4)
+            seen.extend(changed)
+        self.assertCountEqual(seen, Question.objects.filter(quiz__created_by=self.teacher).values_list('id', flat=True))
+        self.assertEqual(len(seen), len(set(seen)))
+
+    def test_deleted_rows_arrive_as_tombstones(self):
+        _, _, token, _ = self.sync('questions', self.teacher.user)
+        question = self.quizzes[0].questions.first()
+        question_id = question.id
+        question.delete()
+        _, deleted, token, _ = self.sync('questions', self.teacher.user, token)
+        self.assertEqual(deleted, [question_id])
+        self.assertEqual(self.sync('questions', self.teacher.user, token)[1], [])
+
+    def test_first_call_skips_earlier_deletions(self):
+        self.quizzes[0].questions.first().delete()
+        self.assertEqual(self.sync('questions', self.teacher.user)[1], [])
+
+    def test_quiz_leaving_active_is_dropped_by_students_only(self):
+        _, _, student_token, _ = self.sync('quizzes', self.student)
+        _, _, teacher_token, _ = self.sync('quizzes', self.teacher.user)
+        self.quizzes[2].status = 'draft'
+        self.quizzes[2].save()
+        self.assertEqual(self.sync('quizzes', self.student, student_token)[1], [self.quizzes[2].id])
+        changed, deleted, _, _ = self.sync('quizzes', self.teacher.user, teacher_token)
+        self.assertEqual((changed, deleted), ([self.quizzes[2].id], []))
+
+    def test_closed_window_drops_its_questions_for_students(self):
+        quiz = self.quizzes[0]
+        closes_at = timezone.now() + timedelta(minutes=5)
+        Quiz.objects.filter(id=quiz.id).update(closes_at=closes_at)
+        _, _, token, _ = self.sync('questions', self.student)
+        with mock.patch('django.utils.timezone.now', return_value=closes_at + timedelta(seconds=1)):
+            _, deleted, token, _ = self.sync('questions', self.student, token)
+            self.assertCountEqual(deleted, quiz.questions.values_list('id', flat=True))
+            self.assertEqual(self.sync('questions', self.student, token)[1], [])
+        # Reading the feed writes nothing
+        self.assertFalse(Tombstone.objects.exists())
+
+    def test_window_moved_into_the_past_is_closed_for_students(self):
+        _, _, token, _ = self.sync('questions', self.student)
+        quiz = self.quizzes[1]
+        quiz.closes_at = timezone.now() - timedelta(days=1)
+        quiz.save()
+        self.assertCountEqual(self.sync('questions', self.student, token)[1], quiz.questions.values_list('id', flat=True))
+
+    def test_students_only_get_tombstones_of_what_they_could_see(self):
+        _, _, student_token, _ = self.sync('questions', self.student)
+        _, _, teacher_token, _ = self.sync('questions', self.teacher.user)
+        draft = make_quiz(self.teacher, questions=1, status='draft')
+        hidden = draft.questions.get()
+        seen = self.quizzes[0].questions.first()
+        hidden_id, seen_id = hidden.id, seen.id
+        hidden.delete()
+        seen.delete()
+        self.assertEqual(self.sync('questions', self.student, student_token)[1], [seen_id])
+        self.assertEqual(self.sync('questions', self.teacher.user, teacher_token)[1], [hidden_id, seen_id])
+
+        _, _, student_token, _ = self.sync('quizzes', self.student)
+        draft_id = draft.id
+        draft.delete()
+        self.assertEqual(self.sync('quizzes', self.student, student_token)[1], [])
+
+    def test_students_only_get_their_own_attempt_tombstones(self):
+        _, _, token, _ = self.sync('attempts', self.student)
+        _, _, teacher_token, _ = self.sync('attempts', self.teacher.user)
+        mine = make_attempt(self.student, self.quizzes[0], correct=1)
+        theirs = make_attempt(make_student('other_student'), self.quizzes[0], correct=1)
+        mine_id, theirs_id = mine.id, theirs.id
+        mine.delete()
+        theirs.delete()
+        self.assertEqual(self.sync('attempts', self.student, token)[1], [mine_id])
+        self.assertCountEqual(self.sync('attempts', self.teacher.user, teacher_token)[1], [mine_id, theirs_id])
+
+    def test_rows_inside_the_settle_window_wait_for_the_next_call(self):
+        with mock.patch('accounts.sync.SETTLE_WINDOW', timedelta(minutes=5)):
+            self.assertEqual(self.sync('quizzes', self.teacher.user)[0], [])
+
+    def test_sync_endpoint(self):
+        self.client.force_login(self.student)
+        url = reverse('api:sync', args=['quizzes'])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['changed']), 3)
+        self.assertEqual(self.client.get(url, {'since': 'not-a-token'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('api:sync', args=['nothing'])).status_code, 404)
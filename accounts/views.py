@@ -8,6 +8,8 @@ from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.models import User
 from django.contrib import messages
 from quiz.models import UserProfile
+from quiz.page_cache import anonymous_page_cache
+from quiz.roles import remember_role
 
 
 # Constants to avoid string duplication (fixes SonarLint S1192)
@@ -17,16 +19,12 @@ LOGIN_URL = 'login'
 SIGNUP_URL = 'signup'
 
 
-def _get_user_dashboard_url(user):
+def _get_user_dashboard_url(request):
     """
     Helper function to get dashboard URL based on user role
-    Reduces cognitive complexity (fixes SonarLint S3776)
+    Uses the role RoleMiddleware cached in the session
     """
-    try:
-        profile = UserProfile.objects.get(user=user)
-        return TEACHER_DASHBOARD_URL if profile.role == 'teacher' else STUDENT_DASHBOARD_URL
-    except UserProfile.DoesNotExist:
-        return STUDENT_DASHBOARD_URL
+    return TEACHER_DASHBOARD_URL if request.role == 'teacher' else STUDENT_DASHBOARD_URL
 
 
 def _validate_signup_data(username, email, password, password2):
@@ -106,7 +104,7 @@ def user_login(request):
     """
     # Redirect if already logged in
     if request.user.is_authenticated:
-        return redirect(_get_user_dashboard_url(request.user))
+        return redirect(_get_user_dashboard_url(request))
     
     if request.method == 'POST':
         username = request.POST.get('username')
@@ -128,9 +126,10 @@ def user_login(request):
                 user=user,
                 defaults={'role': 'student'}
             )
+            remember_role(request, user)
             
             messages.success(request, f'Welcome back, {user.username}!')
-            return redirect(_get_user_dashboard_url(user))
+            return redirect(_get_user_dashboard_url(request))
         else:
             messages.error(request, 'Invalid username or password!')
             return redirect(LOGIN_URL)
@@ -149,12 +148,13 @@ def user_logout(request):
     return redirect(LOGIN_URL)
 
 
+@anonymous_page_cache
 def home(request):
     """
     Home page view
     Redirects authenticated users to their dashboard
     """
     if request.user.is_authenticated:
-        return redirect(_get_user_dashboard_url(request.user))
+        return redirect(_get_user_dashboard_url(request))
     
     return render(request, 'home.html')
@@ -1,18 +1,99 @@
+import os
+
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.http import FileResponse, Http404
+from django.urls import path, reverse
+from django.utils import timezone
+from django.utils.functional import cached_property
+from django.utils.html import format_html
 from .models import (
     UserProfile, Teacher, Student, Quiz, Question, 
-    QuizAttempt, StudentAnswer, Option
+    QuizAttempt, StudentAnswer, Option, BackgroundJob, ArchivedAttempt, AttemptRollup
 )
+from .deletion import soft_delete_quiz
+from .jobs import OPERATIONS, cancel_jobs, enqueue, export_path, operations_for
+
+# Unfiltered changelists of tables estimated above this many rows show the
+# estimate instead of running COUNT(*). The estimate comes from the
+# planner's statistics (pg_class.reltuples on PostgreSQL, table_rows on
+# MySQL), so it is only approximate: it trails inserts and deletes until
+# the next ANALYZE or autovacuum, and InnoDB's can be off by a wide margin.
+ESTIMATED_COUNT_THRESHOLD = 100_000
+# Every other changelist (filtered, smaller, or on SQLite, which keeps no
+# statistics) counts at most this many rows; past it the count, and the
+# page links, stop at the cap
+COUNT_CAP = 10_000
+
+
+def estimated_row_count(model, using):
+    """Row-count estimate for a whole table from the planner's statistics, or None if unavailable"""
+    connection = connections[using]
+    table = model._meta.db_table
+    if connection.vendor not in ('postgresql', 'mysql'):
+        return None
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [table])
+        else:
+            cursor.execute('SELECT table_rows FROM information_schema.tables WHERE table_schema = DATABASE() AND table_name = %s', [table])
+        row = cursor.fetchone()
+    return row[0] if row and row[0] is not None and row[0] >= 0 else None
+
+
+def capped_count(queryset, cap):
+    """COUNT(*) that stops after ``cap`` rows: SELECT COUNT(*) FROM (... LIMIT cap + 1)"""
+    return min(queryset[:cap + 1].count(), cap)
+
+
+def job_action(name):
+    """Admin action that queues the bulk operation ``name`` as a background job"""
+    op = OPERATIONS[name]
+
+    def action(modeladmin, request, queryset):
+        job = enqueue(name, queryset, user=request.user)
+        url = reverse('admin:quiz_backgroundjob_change', args=[job.id])
+        modeladmin.message_user(request, format_html(
+            'Queued "{}" for {} rows as <a href="{}">job #{}</a>.', op.label, job.total, url, job.id,
+        ))
+
+    action.__name__ = f'job_{name}'
+    return admin.action(description=f'{op.label} (background job)')(action)
+
+
+def job_actions(model):
+    return [job_action(op.name) for op in operations_for(model)]
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Admin paginator that never runs an unbounded COUNT(*): unfiltered
+    changelists of large tables show the planner's estimate, everything
+    else a count capped at COUNT_CAP. Use with show_full_result_count =
+    False, or the changelist counts the whole table again.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimated_row_count(queryset.model, queryset.db)
+            if estimate is not None and estimate > ESTIMATED_COUNT_THRESHOLD:
+                return estimate
+        return capped_count(queryset, COUNT_CAP)
 
 @admin.register(UserProfile)
 class UserProfileAdmin(admin.ModelAdmin):
     list_display = ['user', 'role', 'phone', 'department']
+    list_select_related = ['user']
     list_filter = ['role']
     search_fields = ['user__username', 'user__email', 'phone']
 
 @admin.register(Teacher)
 class TeacherAdmin(admin.ModelAdmin):
     list_display = ['user', 'phone', 'qualification', 'years_experience', 'is_approved', 'created_at']
+    list_select_related = ['user']
     list_filter = ['is_approved', 'created_at']
     search_fields = ['user__username', 'user__email', 'phone', 'qualification']
     readonly_fields = ['created_at', 'updated_at']
@@ -20,6 +101,7 @@ class TeacherAdmin(admin.ModelAdmin):
 @admin.register(Student)
 class StudentAdmin(admin.ModelAdmin):
     list_display = ['user', 'phone', 'grade', 'school', 'created_at']
+    list_select_related = ['user']
     list_filter = ['grade', 'is_active', 'created_at']
     search_fields = ['user__username', 'user__email', 'phone', 'school']
     readonly_fields = ['created_at', 'updated_at']
@@ -28,10 +110,21 @@ class StudentAdmin(admin.ModelAdmin):
 class QuizAdmin(admin.ModelAdmin):
     # FIXED: Changed 'teacher' to 'created_by', 'subject' to 'category', 'duration' to 'time_limit'
     list_display = ['title', 'created_by', 'category', 'difficulty', 'time_limit', 'total_marks', 'status', 'created_at']
+    list_select_related = ['created_by__user']
+    autocomplete_fields = ['created_by']
     list_filter = ['status', 'difficulty', 'category', 'created_at']
     search_fields = ['title', 'category', 'description']
     readonly_fields = ['created_at', 'updated_at']
     date_hierarchy = 'created_at'
+    actions = job_actions(Quiz)
+    
+    # Soft delete with a background purge instead of the ORM cascade
+    def delete_model(self, request, obj):
+        soft_delete_quiz(obj, user=request.user)
+    
+    def delete_queryset(self, request, queryset):
+        for quiz in queryset:
+            soft_delete_quiz(quiz, user=request.user)
     
     fieldsets = (
         ('Basic Information', {
@@ -40,6 +133,9 @@ class QuizAdmin(admin.ModelAdmin):
         ('Settings', {
             'fields': ('difficulty', 'time_limit', 'total_marks', 'passing_marks', 'status')
         }),
+        ('Schedule', {
+            'fields': ('opens_at', 'closes_at')
+        }),
         ('Advanced Options', {
             'fields': ('allow_retake', 'max_attempts', 'shuffle_questions', 'shuffle_options', 'show_correct_answers'),
             'classes': ('collapse',)
@@ -50,9 +146,12 @@ class QuizAdmin(admin.ModelAdmin):
         }),
     )
 
+
 @admin.register(Question)
 class QuestionAdmin(admin.ModelAdmin):
     list_display = ['quiz', 'question_text_preview', 'question_type', 'marks', 'order', 'created_at']
+    list_select_related = ['quiz']
+    autocomplete_fields = ['quiz']
     list_filter = ['question_type', 'quiz', 'created_at']
     search_fields = ['question_text', 'quiz__title']
     readonly_fields = ['created_at', 'updated_at']
@@ -65,6 +164,8 @@ class QuestionAdmin(admin.ModelAdmin):
 @admin.register(Option)
 class OptionAdmin(admin.ModelAdmin):
     list_display = ['question', 'option_text_preview', 'is_correct', 'order', 'created_at']
+    list_select_related = ['question__quiz']
+    autocomplete_fields = ['question']
     list_filter = ['is_correct', 'created_at']
     search_fields = ['option_text', 'question__question_text']
     readonly_fields = ['created_at']
@@ -73,13 +174,23 @@ class OptionAdmin(admin.ModelAdmin):
         return obj.option_text[:50] + '...' if len(obj.option_text) > 50 else obj.option_text
     option_text_preview.short_description = 'Option Text'
 
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        # Options sync as part of their question
+        Question.objects.filter(id=obj.question_id).update(updated_at=timezone.now())
+
 @admin.register(QuizAttempt)
 class QuizAttemptAdmin(admin.ModelAdmin):
     list_display = ['student', 'quiz', 'status', 'score', 'percentage', 'passed', 'start_time', 'end_time']
+    list_select_related = ['student', 'quiz']
+    # start_time is indexed; a date_hierarchy would scan the table for its year list
     list_filter = ['status', 'passed', 'start_time']
     search_fields = ['student__username', 'quiz__title']
     readonly_fields = ['start_time', 'created_at', 'updated_at']
-    date_hierarchy = 'start_time'
+    autocomplete_fields = ['student', 'quiz']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    actions = job_actions(QuizAttempt)
     
     fieldsets = (
         ('Attempt Information', {
@@ -104,9 +215,91 @@ class QuizAttemptAdmin(admin.ModelAdmin):
 @admin.register(StudentAnswer)
 class StudentAnswerAdmin(admin.ModelAdmin):
     list_display = ['attempt', 'question', 'selected_option', 'is_correct', 'is_flagged', 'time_taken', 'created_at']
-    list_filter = ['is_correct', 'is_flagged', 'created_at']
-    search_fields = ['attempt__student__username', 'question__question_text']
+    list_select_related = ['attempt__student', 'attempt__quiz', 'question__quiz', 'selected_option__question__quiz']
+    list_filter = ['created_at', 'is_correct', 'is_flagged']
+    # Prefix match on the indexed username; a substring search over the
+    # question text would scan every answer
+    search_fields = ['^attempt__student__username']
     readonly_fields = ['created_at']
+    # Dropdowns would list every attempt, question and option
+    raw_id_fields = ['attempt', 'question', 'selected_option']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    actions = job_actions(StudentAnswer)
+
+@admin.register(ArchivedAttempt)
+class ArchivedAttemptAdmin(admin.ModelAdmin):
+    list_display = ['id', 'student_username', 'quiz_title', 'score', 'percentage', 'passed', 'start_time', 'archived_at']
+    list_filter = ['passed', 'start_time']
+    search_fields = ['^student_username', '^quiz_title']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    actions = job_actions(ArchivedAttempt)
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def has_delete_permission(self, request, obj=None):
+        # The rollups would still count it; archived rows go with their quiz
+        return False
+
+@admin.register(AttemptRollup)
+class AttemptRollupAdmin(admin.ModelAdmin):
+    list_display = ['student', 'quiz', 'attempts', 'passed', 'failed', 'best_score', 'last_attempt_at']
+    list_select_related = ['student', 'quiz']
+    search_fields = ['^student__username']
+    raw_id_fields = ['student', 'quiz']
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+@admin.register(BackgroundJob)
+class BackgroundJobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'operation', 'status', 'progress_display', 'created_by', 'created_at', 'finished_at']
+    list_filter = ['status', 'operation']
+    list_select_related = ['created_by']
+    actions = ['cancel_selected']
+    fields = ['operation', 'status', 'progress_display', 'result', 'download', 'error', 'cancel_requested',
+              'created_by', 'worker', 'created_at', 'started_at', 'finished_at', 'heartbeat_at']
+    readonly_fields = fields
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def get_urls(self):
+        return [
+            path('<int:job_id>/download/', self.admin_site.admin_view(self.download_view), name='quiz_backgroundjob_download'),
+        ] + super().get_urls()
+    
+    @admin.display(description='Progress')
+    def progress_display(self, obj):
+        return f"{obj.processed}/{obj.total} ({obj.progress}%)"
+    
+    @admin.display(description='Export')
+    def download(self, obj):
+        if not obj.result.get('file') or not os.path.exists(export_path(obj)):
+            return '-'
+        return format_html('<a href="{}">{}</a>', reverse('admin:quiz_backgroundjob_download', args=[obj.id]), obj.result['file'])
+    
+    def download_view(self, request, job_id):
+        job = BackgroundJob.objects.filter(id=job_id).first()
+        if job is None or not self.has_view_permission(request, job) or not os.path.exists(export_path(job)):
+            raise Http404('No export for this job')
+        return FileResponse(open(export_path(job), 'rb'), as_attachment=True, filename=os.path.basename(export_path(job)))
+    
+    @admin.action(description='Cancel selected jobs')
+    def cancel_selected(self, request, queryset):
+        cancelled, stopping = cancel_jobs(queryset)
+        self.message_user(request, f'Cancelled {cancelled} queued jobs; {stopping} running jobs will stop after their current chunk.')
 
 # Customize admin site headers
 admin.site.site_header = 'QUIZMASTER Admin'
@@ -1,9 +1,12 @@
 import google.generativeai as genai
+import logging
 import os
 import json
 import re
 from django.conf import settings
 
+logger = logging.getLogger('quiz')
+
 # 1. Load API Key securely from Environment Variables
 # Make sure to set GEMINI_API_KEY in your .env file
 genai.configure(api_key=os.environ.get("GEMINI_API_KEY"))
@@ -63,5 +66,5 @@ def generate_quiz_questions(topic, num_questions, difficulty, instructions=""):
         return json.loads(raw_text)
 
     except Exception as e:
-        print(f"AI Generation Error: {e}")
+        logger.error("AI Generation Error: %s", e)
         return [] # Return empty list on error for easier handling in views
\ No newline at end of file
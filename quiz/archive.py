@@ -0,0 +1,324 @@
+"""
+Archival of old attempts
+
+Completed attempts older than ARCHIVE['HORIZON_DAYS'] are moved, with their
+answers, from QuizAttempt/StudentAnswer into ArchivedAttempt/ArchivedAnswer,
+so the hot tables and their indexes only hold recent activity. The archive
+tables live on ARCHIVE['DATABASE'] (quiz.routers.ArchiveRouter), which can
+be a separate SQLite file. Run from cron:
+
+    python manage.py archive_attempts
+
+For each batch the archiver copies the rows to the archive, adds them to
+the per-student, per-quiz AttemptRollup rows in the main database and then
+deletes them from the hot tables; the last two happen in one transaction.
+With a separate archive database the copy commits first, so a batch cut
+short is copied again on the next run (existing archive rows are skipped)
+and never counted twice in the rollups.
+
+Dashboards add the rollups to what they count in the hot tables;
+QuizAttempt.history lists attempts from both tables. Regrading a quiz
+(grading.regrade_quiz) regrades its archived attempts too and adjusts their
+rollups by the difference. Archived attempts get no sync tombstone, since
+clients should keep them.
+"""
+
+import logging
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max, Min, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .caching import SCOPE_STUDENT, SCOPE_TEACHER, bump_many
+from .deletion import raw_delete
+from .grading import ATTEMPT_STATUS_COMPLETED, grade_band
+from .models import ArchivedAnswer, ArchivedAttempt, AttemptRollup, Option, Question, QuizAttempt, StudentAnswer
+
+logger = logging.getLogger('quiz')
+
+DEFAULT_ARCHIVE = {
+    'DATABASE': 'default',
+    'HORIZON_DAYS': 365,
+    'BATCH_SIZE': 500,
+}
+
+ATTEMPT_FIELDS = [
+    'id', 'student_id', 'quiz_id', 'start_time', 'end_time', 'time_spent', 'score', 'max_score', 'percentage',
+    'status', 'correct_answers', 'incorrect_answers', 'unanswered', 'passed', 'ip_address', 'user_agent', 'created_at',
+]
+ANSWER_FIELDS = [
+    'id', 'attempt_id', 'question_id', 'selected_option_id', 'selected_option_index', 'is_correct', 'is_flagged',
+    'time_taken', 'created_at',
+]
+# Archived attempt columns a regrade recomputes
+REGRADED_FIELDS = ['score', 'max_score', 'percentage', 'correct_answers', 'incorrect_answers', 'passed']
+ROLLUP_FIELDS = [
+    'attempts', 'passed', 'failed', 'scored', 'score_total', 'best_score', 'worst_score', 'time_spent_total',
+    'grade_counts', 'first_attempt_at', 'last_attempt_at', 'updated_at',
+]
+
+
+def archive_config():
+    return {**DEFAULT_ARCHIVE, **getattr(settings, 'ARCHIVE', {})}
+
+
+def archive_candidates(horizon_days=None):
+    """Completed attempts old enough to archive."""
+    if horizon_days is None:
+        horizon_days = archive_config()['HORIZON_DAYS']
+    cutoff = timezone.now() - timedelta(days=horizon_days)
+    # start_time rather than end_time: (status, start_time) is indexed
+    return QuizAttempt.objects.filter(status=ATTEMPT_STATUS_COMPLETED, start_time__lt=cutoff)
+
+
+def archive_attempts(horizon_days=None, batch_size=None, limit=None):
+    """Archive every candidate in batches (at most ``limit`` attempts); returns counts."""
+    batch_size = batch_size or archive_config()['BATCH_SIZE']
+    candidates = archive_candidates(horizon_days)
+    counts = {'attempts_archived': 0, 'answers_archived': 0}
+    while limit is None or counts['attempts_archived'] < limit:
+        size = batch_size if limit is None else min(batch_size, limit - counts['attempts_archived'])
+        attempt_ids = list(candidates.order_by('start_time', 'id').values_list('id', flat=True)[:size])
+        if not attempt_ids:
+            break
+        batch = archive_attempt_ids(attempt_ids)
+        if not batch['attempts_archived']:
+            break
+        counts['attempts_archived'] += batch['attempts_archived']
+        counts['answers_archived'] += batch['answers_archived']
+    logger.info("Archived %s attempts and %s answers", counts['attempts_archived'], counts['answers_archived'])
+    return counts
+
+
+def archive_attempt_ids(attempt_ids):
+    """Move the completed attempts among ``attempt_ids`` and their answers to the archive."""
+    attempts = list(
+        QuizAttempt.objects.filter(id__in=attempt_ids, status=ATTEMPT_STATUS_COMPLETED)
+        .values(*ATTEMPT_FIELDS, 'student__username', 'quiz__title', 'quiz__created_by_id')
+    )
+    if not attempts:
+        return {'attempts_archived': 0, 'answers_archived': 0}
+    attempt_ids = [attempt['id'] for attempt in attempts]
+    answers = list(StudentAnswer.objects.filter(attempt_id__in=attempt_ids).values(*ANSWER_FIELDS))
+    now = timezone.now()
+
+    with transaction.atomic():
+        with transaction.atomic(using=archive_config()['DATABASE']):
+            ArchivedAttempt.objects.bulk_create([
+                ArchivedAttempt(
+                    **{field: attempt[field] for field in ATTEMPT_FIELDS},
+                    student_username=attempt['student__username'], quiz_title=attempt['quiz__title'], archived_at=now,
+                )
+                for attempt in attempts
+            ], ignore_conflicts=True)
+            ArchivedAnswer.objects.bulk_create([ArchivedAnswer(**answer) for answer in answers], ignore_conflicts=True)
+        _add_to_rollups(attempts, now)
+        answers_deleted = raw_delete(StudentAnswer.objects.filter(attempt_id__in=attempt_ids))
+        attempts_deleted = raw_delete(QuizAttempt.objects.filter(id__in=attempt_ids))
+
+    bump_many(*{
+        scope for attempt in attempts
+        for scope in ((SCOPE_STUDENT, attempt['student_id']), (SCOPE_TEACHER, attempt['quiz__created_by_id']))
+    })
+    return {'attempts_archived': attempts_deleted, 'answers_archived': answers_deleted}
+
+
+def _add_to_rollups(attempts, now):
+    keys = {(attempt['student_id'], attempt['quiz_id']) for attempt in attempts}
+    existing = AttemptRollup.objects.select_for_update().filter(
+        student_id__in={student_id for student_id, _ in keys}, quiz_id__in={quiz_id for _, quiz_id in keys},
+    )
+    # The two IN lists also match pairs outside the batch
+    rollups = {(rollup.student_id, rollup.quiz_id): rollup for rollup in existing if (rollup.student_id, rollup.quiz_id) in keys}
+    created = {}
+    for attempt in attempts:
+        key = (attempt['student_id'], attempt['quiz_id'])
+        rollup = rollups.get(key) or created.get(key)
+        if rollup is None:
+            rollup = created[key] = AttemptRollup(student_id=key[0], quiz_id=key[1], grade_counts={})
+        _add_attempt(rollup, attempt)
+    for rollup in rollups.values():
+        # bulk_update() does not apply auto_now
+        rollup.updated_at = now
+    AttemptRollup.objects.bulk_update(list(rollups.values()), ROLLUP_FIELDS)
+    AttemptRollup.objects.bulk_create(list(created.values()))
+
+
+def _remove_attempt(rollup, attempt):
+    """Undo _add_attempt() except for best/worst score and the first/last times."""
+    rollup.attempts -= 1
+    if attempt['passed'] is True:
+        rollup.passed -= 1
+    elif attempt['passed'] is False:
+        rollup.failed -= 1
+    if attempt['score'] is not None:
+        rollup.scored -= 1
+        rollup.score_total -= attempt['score']
+    rollup.time_spent_total -= attempt['time_spent'] or 0
+    band = grade_band(attempt['percentage'])
+    if band and rollup.grade_counts.get(band):
+        rollup.grade_counts[band] -= 1
+        if not rollup.grade_counts[band]:
+            del rollup.grade_counts[band]
+
+
+def _add_attempt(rollup, attempt):
+    rollup.attempts += 1
+    if attempt['passed'] is True:
+        rollup.passed += 1
+    elif attempt['passed'] is False:
+        rollup.failed += 1
+    score = attempt['score']
+    if score is not None:
+        rollup.scored += 1
+        rollup.score_total += score
+        rollup.best_score = score if rollup.best_score is None else max(rollup.best_score, score)
+        rollup.worst_score = score if rollup.worst_score is None else min(rollup.worst_score, score)
+    rollup.time_spent_total += attempt['time_spent'] or 0
+    band = grade_band(attempt['percentage'])
+    if band:
+        rollup.grade_counts[band] = rollup.grade_counts.get(band, 0) + 1
+    start_time = attempt['start_time']
+    if rollup.first_attempt_at is None or start_time < rollup.first_attempt_at:
+        rollup.first_attempt_at = start_time
+    if rollup.last_attempt_at is None or start_time > rollup.last_attempt_at:
+        rollup.last_attempt_at = start_time
+
+
+# Regrading
+
+def regrade_archived_attempts(quiz_id, passing_marks, chunk_size=None, progress=None):
+    """
+    Regrade the archived attempts of a quiz against its current answer key
+    and question marks, like grading.regrade_quiz() does for the hot
+    tables, and adjust their rollups by the difference.
+
+    The archive can be another database, so the work is done in Python: the
+    answer key is loaded once and the attempts are walked in id order, a
+    chunk per transaction. Answers to questions deleted since no longer
+    count, as their hot counterparts were deleted with the question.
+    ``progress()`` is called before every chunk.
+    """
+    chunk_size = chunk_size or archive_config()['BATCH_SIZE']
+    questions = {
+        question_id: (marks, correct_answer)
+        for question_id, marks, correct_answer in Question.objects.filter(quiz_id=quiz_id).values_list('id', 'marks', 'correct_answer')
+    }
+    option_is_correct = dict(Option.objects.filter(question__quiz_id=quiz_id).values_list('id', 'is_correct'))
+    attempts = ArchivedAttempt.objects.filter(quiz_id=quiz_id, status=ATTEMPT_STATUS_COMPLETED)
+    counts = {'archived_attempts_regraded': 0, 'archived_answers_updated': 0}
+    students, last_id = set(), 0
+    while True:
+        chunk = list(
+            attempts.filter(id__gt=last_id).order_by('id')
+            .values('id', 'student_id', 'quiz_id', 'time_spent', 'start_time', *REGRADED_FIELDS)[:chunk_size]
+        )
+        if not chunk:
+            break
+        if progress:
+            progress()
+        last_id = chunk[-1]['id']
+        totals = {attempt['id']: {'score': 0, 'max_score': 0, 'correct_answers': 0, 'incorrect_answers': 0} for attempt in chunk}
+        changed_answers = []
+        for answer in ArchivedAnswer.objects.filter(attempt_id__in=list(totals)).only(
+            'id', 'attempt_id', 'question_id', 'selected_option_id', 'selected_option_index', 'is_correct',
+        ):
+            if answer.question_id not in questions:
+                continue
+            marks, correct_answer = questions[answer.question_id]
+            if answer.selected_option_id is not None:
+                is_correct = option_is_correct.get(answer.selected_option_id, False)
+            else:
+                is_correct = answer.selected_option_index == correct_answer
+            if is_correct != answer.is_correct:
+                answer.is_correct = is_correct
+                changed_answers.append(answer)
+            total = totals[answer.attempt_id]
+            total['max_score'] += marks
+            if is_correct:
+                total['score'] += marks
+                total['correct_answers'] += 1
+            else:
+                total['incorrect_answers'] += 1
+
+        changed = []
+        for attempt in chunk:
+            regraded = {**attempt, **totals[attempt['id']]}
+            max_score = regraded['max_score']
+            regraded['percentage'] = regraded['score'] * 100.0 / max_score if max_score > 0 else 0.0
+            regraded['passed'] = max_score > 0 and regraded['score'] >= (passing_marks or 0)
+            if any(regraded[field] != attempt[field] for field in REGRADED_FIELDS):
+                changed.append((attempt, regraded))
+        if not changed and not changed_answers:
+            continue
+
+        with transaction.atomic():
+            with transaction.atomic(using=archive_config()['DATABASE']):
+                ArchivedAnswer.objects.bulk_update(changed_answers, ['is_correct'])
+                ArchivedAttempt.objects.bulk_update([
+                    ArchivedAttempt(id=regraded['id'], **{field: regraded[field] for field in REGRADED_FIELDS})
+                    for _, regraded in changed
+                ], REGRADED_FIELDS)
+            _regrade_rollups(quiz_id, changed)
+        counts['archived_attempts_regraded'] += len(changed)
+        counts['archived_answers_updated'] += len(changed_answers)
+        students.update(attempt['student_id'] for attempt, _ in changed)
+
+    bump_many(*((SCOPE_STUDENT, student_id) for student_id in students))
+    return counts
+
+
+def _regrade_rollups(quiz_id, changed):
+    """Swap the old totals of regraded archived attempts for the new ones in their rollups."""
+    student_ids = {attempt['student_id'] for attempt, _ in changed}
+    rollups = {
+        rollup.student_id: rollup
+        for rollup in AttemptRollup.objects.select_for_update().filter(quiz_id=quiz_id, student_id__in=student_ids)
+    }
+    for attempt, regraded in changed:
+        rollup = rollups.get(attempt['student_id'])
+        if rollup is None:
+            # Still being archived; the archiver adds it to a new rollup
+            continue
+        _remove_attempt(rollup, attempt)
+        _add_attempt(rollup, regraded)
+    # Best and worst scores cannot be taken back, so they are read again
+    extremes = (
+        ArchivedAttempt.objects.filter(quiz_id=quiz_id, student_id__in=list(rollups), status=ATTEMPT_STATUS_COMPLETED)
+        .values('student_id').annotate(best=Max('score'), worst=Min('score'))
+    )
+    for row in extremes:
+        rollup = rollups[row['student_id']]
+        rollup.best_score, rollup.worst_score = row['best'], row['worst']
+    now = timezone.now()
+    for rollup in rollups.values():
+        rollup.updated_at = now
+    AttemptRollup.objects.bulk_update(list(rollups.values()), ROLLUP_FIELDS)
+
+
+# Reading the rollups
+
+def rollup_totals(rollups):
+    """Archived totals over an AttemptRollup queryset, zero when there are none."""
+    return rollups.aggregate(
+        attempts=Coalesce(Sum('attempts'), 0),
+        passed=Coalesce(Sum('passed'), 0),
+        failed=Coalesce(Sum('failed'), 0),
+        scored=Coalesce(Sum('scored'), 0),
+        score_total=Coalesce(Sum('score_total'), 0),
+        best_score=Max('best_score'),
+        worst_score=Min('worst_score'),
+        students=Count('student', distinct=True),
+    )
+
+
+def rollup_grade_counts(rollups):
+    """Archived attempts per grade band label over an AttemptRollup queryset."""
+    counts = Counter()
+    for grade_counts in rollups.values_list('grade_counts', flat=True):
+        counts.update(grade_counts)
+    return counts
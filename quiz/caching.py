@@ -0,0 +1,174 @@
+"""
+Shared cache helpers
+
+Cached values are namespaced by scope and object id and carry the scope's
+current generation:
+
+    quiz:12:g1813315421471768613:payload
+    teacher:4:g1813315421472818053:dashboard
+
+Bumping a generation (a single cache write) orphans every key of that
+scope at once, so invalidation is O(1) however many entries were derived
+from it; orphaned entries age out through their timeout. bump_many()
+writes fresh generations for all its scopes in one set_many(). Generations
+are stored without a timeout, and a generation that is evicted or bumped
+restarts from the current time in milliseconds, with random low bits,
+never from a value that was used before.
+
+Hit/miss counts are kept per process and folded into shared counters every
+few seconds, so a cache hit does not cost a cache write.
+"""
+
+import random
+import threading
+import time
+
+from django.core.cache import cache
+
+SCOPE_QUIZ = 'quiz'
+SCOPE_TEACHER = 'teacher'
+SCOPE_STUDENT = 'student'
+# The list of active quizzes every student sees; a single object id
+SCOPE_CATALOGUE = 'catalogue'
+CATALOGUE_ID = 'active'
+# A user's role and profile ids cached in their sessions (quiz.roles); by user id
+SCOPE_ROLE = 'role'
+
+STATS_FLUSH_SECONDS = 10
+STATS_TIMEOUT = 7 * 24 * 60 * 60
+
+
+def _generation_key(scope, object_id):
+    return f'gen:{scope}:{object_id}'
+
+
+_generation_lock = threading.Lock()
+_last_generation = 0
+
+
+def _fresh_generation():
+    """
+    Milliseconds shifted left over 20 random bits: two workers writing one
+    scope in the same millisecond almost surely differ, and within a
+    process every value is larger than the last.
+    """
+    global _last_generation
+    value = (int(time.time() * 1000) << 20) | random.getrandbits(20)
+    with _generation_lock:
+        _last_generation = value = max(value, _last_generation + 1)
+    return value
+
+
+def generations(*scopes):
+    """Current generation for each (scope, object_id) pair, in order."""
+    keys = [_generation_key(scope, object_id) for scope, object_id in scopes]
+    found = cache.get_many(keys)
+    missing = [key for key in keys if key not in found]
+    for key in missing:
+        cache.add(key, _fresh_generation(), None)
+    if missing:
+        # Another worker may have won the add
+        found.update(cache.get_many(missing))
+    return [found.get(key, 0) for key in keys]
+
+
+def generation(scope, object_id):
+    return generations((scope, object_id))[0]
+
+
+def bump(scope, object_id):
+    """
+    Invalidate everything cached under a scope.
+
+    Generations are replaced, not incremented: incr() is a get followed by
+    a set on the file, database and local-memory backends, so two bumps at
+    once could both land on the same value (keeping an entry cached between
+    them alive), and that set() gives the key the default TIMEOUT, after
+    which the generation silently restarts. A set() of a fresh value with
+    timeout=None is a single write on every backend, and whichever of two
+    bumps lands last leaves a generation no reader has seen.
+    """
+    bump_many((scope, object_id))
+
+
+def bump_many(*scopes):
+    """Invalidate several scopes with a single cache write."""
+    keys = {_generation_key(scope, object_id) for scope, object_id in scopes if object_id is not None}
+    if keys:
+        cache.set_many({key: _fresh_generation() for key in keys}, None)
+
+
+def versioned_key(scope, object_id, name, generation_value=None):
+    if generation_value is None:
+        generation_value = generation(scope, object_id)
+    return f'{scope}:{object_id}:g{generation_value}:{name}'
+
+
+def get_or_build(scope, object_id, name, build, timeout, stats_kind=None):
+    """
+    Return the cached value for (scope, object_id, name) at the scope's
+    current generation, building and storing it on a miss.
+    """
+    key = versioned_key(scope, object_id, name)
+    value = cache.get(key)
+    hit = value is not None
+    record(stats_kind or name, hit)
+    if not hit:
+        value = build()
+        cache.set(key, value, timeout)
+    return value
+
+
+class HitCounter:
+    """Per-process hit/miss counts, flushed to shared cache counters periodically."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._flushed_at = time.monotonic()
+
+    def record(self, kind, hit):
+        event = 'hit' if hit else 'miss'
+        with self._lock:
+            self._pending[(kind, event)] = self._pending.get((kind, event), 0) + 1
+            due = time.monotonic() - self._flushed_at >= STATS_FLUSH_SECONDS
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._flushed_at = time.monotonic()
+        for (kind, event), count in pending.items():
+            key = f'stats:{kind}:{event}'
+            # incr() is not atomic on every backend; a lost flush only
+            # undercounts the statistics
+            try:
+                if not cache.add(key, count, STATS_TIMEOUT):
+                    cache.incr(key, count)
+            except ValueError:
+                cache.set(key, count, STATS_TIMEOUT)
+
+    def stats(self, kinds):
+        """Hits, misses and hit ratio per kind across all processes."""
+        self.flush()
+        keys = [f'stats:{kind}:{event}' for kind in kinds for event in ('hit', 'miss')]
+        counts = cache.get_many(keys)
+        report = {}
+        for kind in kinds:
+            hits = counts.get(f'stats:{kind}:hit', 0)
+            misses = counts.get(f'stats:{kind}:miss', 0)
+            total = hits + misses
+            report[kind] = {'hits': hits, 'misses': misses, 'hit_ratio': round(hits / total, 4) if total else None}
+        return report
+
+
+hit_counter = HitCounter()
+record = hit_counter.record
+
+# Kinds reported by cache_stats() unless asked for others
+REPORTED_KINDS = ['payload', 'answer_key', 'page']
+
+
+def cache_stats(kinds=None):
+    return hit_counter.stats(kinds or REPORTED_KINDS)
@@ -0,0 +1,122 @@
+"""
+Soft delete and background purge of quizzes
+
+Deleting a popular quiz through the ORM makes the collector load every
+question, option, attempt and answer to cascade, and holds the write lock
+while it deletes them. Instead, soft_delete_quiz() only stamps
+Quiz.deleted_at (Quiz.objects hides the quiz from then on), records the
+sync tombstone and queues a background job. The job's purge_quiz() then
+removes the dependents with plain DELETE ... WHERE id IN (...) statements
+of at most PURGE_BATCH_SIZE rows, each in its own short transaction:
+
+    answers -> attempts -> archived answers and attempts -> rollups
+            -> options -> questions -> the quiz row
+
+Raw deletes skip the model signals, so the purge writes the attempt and
+question tombstones and bumps the dashboard caches itself. Attempts of a
+deleted quiz stay in students' history until the purge reaches them.
+"""
+
+import logging
+
+from django.db import transaction
+from django.utils import timezone
+
+from .caching import CATALOGUE_ID, SCOPE_CATALOGUE, SCOPE_STUDENT, SCOPE_TEACHER, bump_many
+from .delivery import invalidate_quiz_payload
+from .models import (
+    ArchivedAnswer, ArchivedAttempt, AttemptRollup, Option, Question, Quiz, QuizAttempt, StudentAnswer, Tombstone,
+)
+
+logger = logging.getLogger('quiz')
+
+PURGE_BATCH_SIZE = 2000
+
+
+def soft_delete_quiz(quiz, user=None):
+    """Hide the quiz at once and queue the purge of its rows; returns the job."""
+    from .jobs import enqueue
+
+    with transaction.atomic():
+        quiz.deleted_at = timezone.now()
+        # save() so the signals bump the teacher and catalogue caches
+        quiz.save(update_fields=['deleted_at', 'updated_at'])
+        Tombstone.objects.create(
+            model_name='quiz', object_id=quiz.pk, quiz_id=quiz.pk, owner_id=quiz.created_by_id,
+            teachers_only=quiz.status != 'active',
+        )
+        job = enqueue('delete_quizzes', Quiz.all_objects.filter(pk=quiz.pk), user=user)
+    invalidate_quiz_payload(quiz.pk)
+    return job
+
+
+def raw_delete(queryset):
+    """One DELETE, without loading rows or sending signals."""
+    return queryset._raw_delete(queryset.db)
+
+
+def _purge_batches(queryset, before_delete=None, batch_size=PURGE_BATCH_SIZE, progress=None):
+    """Delete the rows of ``queryset`` in batches; returns how many went."""
+    model = queryset.model
+    deleted = 0
+    while True:
+        batch = list(queryset.order_by('pk').values_list('pk', flat=True)[:batch_size])
+        if not batch:
+            return deleted
+        with transaction.atomic(using=queryset.db):
+            rows = model._base_manager.filter(pk__in=batch)
+            if before_delete:
+                before_delete(rows)
+            deleted += raw_delete(rows)
+        if progress:
+            progress()
+
+
+def _tombstone_attempts(attempts):
+    rows = list(attempts.values_list('id', 'quiz_id', 'student_id'))
+    Tombstone.objects.bulk_create([
+        Tombstone(model_name='attempt', object_id=attempt_id, quiz_id=quiz_id, owner_id=student_id)
+        for attempt_id, quiz_id, student_id in rows
+    ])
+    bump_many(*{(SCOPE_STUDENT, student_id) for _, _, student_id in rows})
+
+
+def purge_quiz(quiz_id, batch_size=PURGE_BATCH_SIZE, progress=None):
+    """
+    Remove a soft-deleted quiz and everything under it in bounded batches.
+    ``progress()`` is called after every batch.
+    """
+    quiz = Quiz.all_objects.filter(pk=quiz_id).first()
+    if quiz is None:
+        return {'quizzes_deleted': 0}
+    if quiz.deleted_at is None:
+        raise ValueError(f'Quiz {quiz_id} is not deleted; soft-delete it before purging')
+
+    # Students could see the questions if the quiz was open when it was deleted
+    teachers_only = not (quiz.status == 'active' and quiz.is_open(quiz.deleted_at))
+
+    def tombstone_questions(questions):
+        Tombstone.objects.bulk_create([
+            Tombstone(model_name='question', object_id=question_id, quiz_id=quiz_id, owner_id=quiz.created_by_id, teachers_only=teachers_only)
+            for question_id in questions.values_list('id', flat=True)
+        ])
+
+    def purge(queryset, before_delete=None):
+        return _purge_batches(queryset, before_delete, batch_size, progress)
+
+    counts = {
+        'answers_deleted': purge(StudentAnswer.objects.filter(attempt__quiz_id=quiz_id)),
+        'attempts_deleted': purge(QuizAttempt.objects.filter(quiz_id=quiz_id), _tombstone_attempts),
+        'archived_answers_deleted': purge(ArchivedAnswer.objects.filter(attempt__quiz_id=quiz_id)),
+        'archived_attempts_deleted': purge(ArchivedAttempt.objects.filter(quiz_id=quiz_id), _tombstone_attempts),
+        'rollups_deleted': raw_delete(AttemptRollup.objects.filter(quiz_id=quiz_id)),
+        'options_deleted': purge(Option.objects.filter(question__quiz_id=quiz_id)),
+        'questions_deleted': purge(Question.objects.filter(quiz_id=quiz_id), tombstone_questions),
+    }
+    counts['quizzes_deleted'] = raw_delete(Quiz.all_objects.filter(pk=quiz_id))
+    bump_many((SCOPE_TEACHER, quiz.created_by_id), (SCOPE_CATALOGUE, CATALOGUE_ID))
+    logger.info(
+        "Purged quiz %s: %s answers, %s attempts, %s questions",
+        quiz_id, counts['answers_deleted'], counts['attempts_deleted'], counts['questions_deleted'],
+    )
+    return counts
@@ -0,0 +1,180 @@
+"""
+Quiz delivery helpers
+
+The question/option payload for a quiz is built once and cached for every
+student. Per-attempt ordering (shuffle_questions / shuffle_options) is applied
+on top of the shared payload by sorting on a hash keyed with a seed derived
+from the attempt id, so the same attempt always sees the same order without
+storing the permutation, and editing a quiz mid-attempt does not reshuffle
+the questions and options that were already there.
+
+The answer key used to grade submissions is cached alongside the payload, and
+both can be pre-warmed before a scheduled exam opens. Both live under the
+quiz's cache generation (see quiz.caching), so one bump invalidates them in
+every worker.
+"""
+
+import hashlib
+import logging
+import pickle
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .caching import SCOPE_QUIZ, bump, cache_stats, generation, get_or_build, versioned_key
+from .models import Question, Option
+
+logger = logging.getLogger('quiz')
+
+PAYLOAD_CACHE_TIMEOUT = 60 * 60  # 1 hour
+
+
+def payload_cache_key(quiz_id, generation_value=None):
+    return versioned_key(SCOPE_QUIZ, quiz_id, 'payload', generation_value)
+
+
+def answer_key_cache_key(quiz_id, generation_value=None):
+    return versioned_key(SCOPE_QUIZ, quiz_id, 'answer_key', generation_value)
+
+
+def delivery_cache_stats():
+    """Hit/miss counts and hit ratio for the payload and answer-key caches."""
+    return cache_stats(['payload', 'answer_key'])
+
+
+def build_quiz_payload(quiz_id):
+    """Build the delivery payload for a quiz with two queries."""
+    questions = list(
+        Question.objects.filter(quiz_id=quiz_id)
+        .order_by('order', 'id')
+        .values_list('id', 'question_text', 'marks')
+    )
+    options_by_question = {}
+    option_rows = (
+        Option.objects.filter(question__quiz_id=quiz_id)
+        .order_by('order', 'id')
+        .values_list('question_id', 'id', 'option_text')
+    )
+    for question_id, option_id, option_text in option_rows:
+        options_by_question.setdefault(question_id, []).append({'id': option_id, 'text': option_text})
+    return [
+        {'id': q_id, 'text': text, 'marks': marks, 'options': options_by_question.get(q_id, [])}
+        for q_id, text, marks in questions
+    ]
+
+
+def get_quiz_payload(quiz_id):
+    """Return the shared (unshuffled) payload for a quiz, building it on a cache miss."""
+    return get_or_build(SCOPE_QUIZ, quiz_id, 'payload', lambda: build_quiz_payload(quiz_id), PAYLOAD_CACHE_TIMEOUT)
+
+
+def build_answer_key(quiz_id):
+    """
+    Map question id -> (marks, {option id: is_correct}) for grading without
+    per-answer Question/Option lookups.
+    """
+    answer_key = {
+        question_id: (marks, {})
+        for question_id, marks in Question.objects.filter(quiz_id=quiz_id).values_list('id', 'marks')
+    }
+    option_rows = Option.objects.filter(question__quiz_id=quiz_id).values_list('question_id', 'id', 'is_correct')
+    for question_id, option_id, is_correct in option_rows:
+        answer_key[question_id][1][option_id] = is_correct
+    return answer_key
+
+
+def get_answer_key(quiz_id):
+    """Return the cached answer key for a quiz, building it on a cache miss."""
+    return get_or_build(SCOPE_QUIZ, quiz_id, 'answer_key', lambda: build_answer_key(quiz_id), PAYLOAD_CACHE_TIMEOUT)
+
+
+def invalidate_quiz_payload(quiz_id):
+    """Invalidate the cached payload and answer key after questions or options change."""
+    bump(SCOPE_QUIZ, quiz_id)
+
+
+def prewarm_quiz(quiz_id, timeout=PAYLOAD_CACHE_TIMEOUT, max_bytes=None):
+    """
+    Build and store the payload and answer key for a quiz ahead of its exam
+    window, then read them back to confirm the cache kept them.
+    Entries larger than max_bytes are not stored (most shared caches reject
+    or silently drop oversized values).
+    """
+    started = time.perf_counter()
+    generation_value = generation(SCOPE_QUIZ, quiz_id)
+    payload_key = payload_cache_key(quiz_id, generation_value)
+    answer_key_key = answer_key_cache_key(quiz_id, generation_value)
+    entries = {
+        payload_key: build_quiz_payload(quiz_id),
+        answer_key_key: build_answer_key(quiz_id),
+    }
+    sizes = {key: len(pickle.dumps(value, pickle.HIGHEST_PROTOCOL)) for key, value in entries.items()}
+    oversized = [key for key, size in sizes.items() if max_bytes and size > max_bytes]
+    if not oversized:
+        cache.set_many(entries, timeout)
+    stored = cache.get_many(list(entries))
+    result = {
+        'quiz_id': quiz_id,
+        'seconds': round(time.perf_counter() - started, 4),
+        'payload_bytes': sizes[payload_key],
+        'answer_key_bytes': sizes[answer_key_key],
+        'oversized': oversized,
+        'verified': not oversized and len(stored) == len(entries),
+    }
+    logger.info(
+        "Pre-warmed quiz %s in %.1f ms (payload %s B, answer key %s B, verified=%s)",
+        quiz_id, result['seconds'] * 1000, result['payload_bytes'], result['answer_key_bytes'], result['verified'],
+    )
+    return result
+
+
+def attempt_seed(attempt_id):
+    """Stable, non-guessable seed for an attempt."""
+    digest = hashlib.sha256(f'{settings.SECRET_KEY}:attempt:{attempt_id}'.encode()).digest()
+    return int.from_bytes(digest[:8], 'big')
+
+
+def _sort_key(seed, kind, item_id):
+    """Keyed hash of one item: its place in the attempt's order."""
+    return hashlib.blake2b(f'{kind}:{item_id}'.encode(), key=seed.to_bytes(8, 'big'), digest_size=8).digest()
+
+
+def apply_attempt_order(payload, attempt, quiz):
+    """
+    Return the payload in the order this attempt should see it.
+    The shared payload is never mutated. Questions and options are sorted by
+    a keyed hash of (attempt seed, id), so adding or removing one item leaves
+    the relative order of the others unchanged.
+    """
+    if not (quiz.shuffle_questions or quiz.shuffle_options):
+        return payload
+    seed = attempt_seed(attempt.id)
+    questions = list(payload)
+    # Sorted rather than random.Random(seed).shuffle(): a seeded shuffle's
+    # permutation depends on the list's length, so a question added or
+    # removed mid-attempt would reorder every question the student has seen,
+    # and the review page (question_positions) would disagree with the
+    # quiz page. A quiz has tens of questions and each key is computed once,
+    # so the O(n log n) sort costs microseconds.
+    if quiz.shuffle_questions:
+        questions.sort(key=lambda question: _sort_key(seed, 'question', question['id']))
+    if quiz.shuffle_options:
+        questions = [
+            {**question, 'options': sorted(question['options'], key=lambda option: _sort_key(seed, 'option', option['id']))}
+            for question in questions
+        ]
+    return questions
+
+
+def question_positions(attempt, quiz):
+    """Map question id -> display position for an attempt (used by result/review pages)."""
+    ordered = apply_attempt_order(get_quiz_payload(quiz.id), attempt, quiz)
+    return {question['id']: index for index, question in enumerate(ordered)}
+
+
+def order_answers_for_attempt(answers, attempt, quiz):
+    """Sort an attempt's answers into the order the student saw the questions."""
+    positions = question_positions(attempt, quiz)
+    fallback = len(positions)
+    return sorted(answers, key=lambda answer: (positions.get(answer.question_id, fallback), answer.question_id))
@@ -0,0 +1,289 @@
+"""
+Attempt grading and time-limit enforcement
+
+Shared by the submission views and the management commands so that an
+attempt is finalized the same way whether the student submits it, the
+sweeper closes it after the time limit, or a regrade recomputes it after
+the answer key changed.
+"""
+
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Sum, Count, Case, When, F, Q, Value, IntegerField, FloatField, BooleanField, OuterRef, Subquery, Exists
+from django.db.models.functions import Coalesce, Cast
+from django.utils import timezone
+
+from . import metrics
+from .caching import SCOPE_STUDENT, SCOPE_TEACHER, bump_many
+from .models import Quiz, Question, Option, QuizAttempt, StudentAnswer
+
+logger = logging.getLogger('quiz')
+
+ATTEMPT_STATUS_COMPLETED = 'completed'
+ATTEMPT_STATUS_IN_PROGRESS = 'in_progress'
+ATTEMPT_STATUS_ABANDONED = 'abandoned'
+
+# Grade distribution bands on the dashboards: (label, min, max), inclusive
+GRADE_BANDS = [('90-100', 90, 100), ('80-89', 80, 89), ('70-79', 70, 79), ('60-69', 60, 69), ('50-59', 50, 59), ('0-49', 0, 49)]
+
+# Quiz.time_limit is capped at 300 minutes by its validator
+MIN_TIME_LIMIT_MINUTES = 1
+
+
+def grade_band(percentage):
+    """Label of the grade band ``percentage`` falls in, or None."""
+    if percentage is None:
+        return None
+    for label, low, high in GRADE_BANDS:
+        if low <= percentage <= high:
+            return label
+    return None
+
+
+def submission_grace():
+    """Extra time allowed after the limit for network latency on submit."""
+    return timedelta(seconds=settings.QUIZ_SETTINGS.get('SUBMISSION_GRACE_SECONDS', 60))
+
+
+def attempt_deadline(start_time, time_limit):
+    """Moment the attempt's time limit runs out."""
+    return start_time + timedelta(minutes=time_limit)
+
+
+def is_attempt_expired(attempt, quiz, now=None):
+    """True once the time limit plus the grace period has passed."""
+    now = now or timezone.now()
+    return now > attempt_deadline(attempt.start_time, quiz.time_limit) + submission_grace()
+
+
+def finalize_attempt(attempt, quiz, total_score, max_score, correct_count, incorrect_count, time_spent, end_time=None):
+    attempt.score = total_score
+    attempt.max_score = max_score
+    attempt.total_marks = max_score
+    attempt.correct_answers = correct_count
+    attempt.incorrect_answers = incorrect_count
+    attempt.end_time = end_time or timezone.now()
+    attempt.time_spent = int(time_spent)
+    if max_score > 0:
+        attempt.percentage = (total_score / max_score) * 100
+        attempt.passed = total_score >= quiz.passing_marks
+    else:
+        attempt.percentage = 0
+        attempt.passed = False
+    attempt.status = ATTEMPT_STATUS_COMPLETED
+    attempt.save()
+    # Both dashboards show this attempt's result
+    bump_many((SCOPE_STUDENT, attempt.student_id), (SCOPE_TEACHER, quiz.created_by_id))
+    metrics.inc('quizmaster_submissions_graded_total', {'result': 'pass' if attempt.passed else 'fail'})
+    return {'success': True, 'attempt_id': attempt.id, 'score': attempt.score, 'max_score': attempt.max_score, 'percentage': round(attempt.percentage, 2), 'passed': attempt.passed, 'message': 'Quiz submitted successfully!'}
+
+
+def saved_answer_totals(attempt_ids):
+    """Score the answers already saved for a set of attempts with one grouped query."""
+    rows = (
+        StudentAnswer.objects.filter(attempt_id__in=attempt_ids)
+        .values('attempt_id')
+        .annotate(
+            score=Sum(Case(When(is_correct=True, then=F('question__marks')), default=Value(0), output_field=IntegerField())),
+            max_score=Sum('question__marks'),
+            correct=Count('id', filter=Q(is_correct=True)),
+            incorrect=Count('id', filter=Q(is_correct=False)),
+        )
+    )
+    return {row['attempt_id']: row for row in rows}
+
+
+def close_expired_attempt(attempt, quiz):
+    """
+    Close an attempt whose time ran out: grade it with whatever answers were
+    saved, or mark it abandoned if there are none. Returns the new status.
+    """
+    deadline = attempt_deadline(attempt.start_time, quiz.time_limit)
+    totals = saved_answer_totals([attempt.id]).get(attempt.id)
+    if totals:
+        finalize_attempt(
+            attempt, quiz, totals['score'], totals['max_score'], totals['correct'], totals['incorrect'],
+            quiz.time_limit * 60, end_time=deadline,
+        )
+        return ATTEMPT_STATUS_COMPLETED
+    QuizAttempt.objects.filter(id=attempt.id, status=ATTEMPT_STATUS_IN_PROGRESS).update(
+        status=ATTEMPT_STATUS_ABANDONED, updated_at=timezone.now()
+    )
+    attempt.status = ATTEMPT_STATUS_ABANDONED
+    return ATTEMPT_STATUS_ABANDONED
+
+
+def sweep_expired_attempts(batch_size=500, now=None, limit=None):
+    """
+    Close every expired in-progress attempt.
+
+    Walks the (status, start_time) index with a keyset cursor so only one
+    batch of rows is held in memory at a time, whatever the table size.
+    Returns a dict with the number of attempts completed and abandoned.
+    """
+    now = now or timezone.now()
+    grace = submission_grace()
+    # Nothing that started after this can have run out of time yet
+    cutoff = now - timedelta(minutes=MIN_TIME_LIMIT_MINUTES) - grace
+    stats = {'scanned': 0, 'completed': 0, 'abandoned': 0}
+    last_start, last_id = None, 0
+
+    while limit is None or stats['completed'] + stats['abandoned'] < limit:
+        # A batch closes at most as many attempts as it holds, so this keeps within limit
+        size = batch_size if limit is None else min(batch_size, limit - stats['completed'] - stats['abandoned'])
+        batch = QuizAttempt.objects.filter(status=ATTEMPT_STATUS_IN_PROGRESS, start_time__lt=cutoff)
+        if last_start is not None:
+            batch = batch.filter(Q(start_time__gt=last_start) | Q(start_time=last_start, id__gt=last_id))
+        rows = list(
+            batch.order_by('start_time', 'id')
+            .values_list('id', 'start_time', 'quiz__time_limit')[:size]
+        )
+        if not rows:
+            break
+        last_id, last_start = rows[-1][0], rows[-1][1]
+        stats['scanned'] += len(rows)
+
+        expired = [
+            row for row in rows
+            if now > attempt_deadline(row[1], row[2]) + grace
+        ]
+        if not expired:
+            continue
+        expired_ids = [row[0] for row in expired]
+        totals = saved_answer_totals(expired_ids)
+
+        abandoned_ids = [attempt_id for attempt_id in expired_ids if attempt_id not in totals]
+        if abandoned_ids:
+            stats['abandoned'] += QuizAttempt.objects.filter(
+                id__in=abandoned_ids, status=ATTEMPT_STATUS_IN_PROGRESS
+            ).update(status=ATTEMPT_STATUS_ABANDONED, updated_at=now)
+
+        if totals:
+            for attempt in QuizAttempt.objects.filter(id__in=list(totals), status=ATTEMPT_STATUS_IN_PROGRESS).select_related('quiz'):
+                row = totals[attempt.id]
+                quiz = attempt.quiz
+                finalize_attempt(
+                    attempt, quiz, row['score'], row['max_score'], row['correct'], row['incorrect'],
+                    quiz.time_limit * 60, end_time=attempt_deadline(attempt.start_time, quiz.time_limit),
+                )
+                stats['completed'] += 1
+
+    logger.info("Expired attempt sweep: %(scanned)s scanned, %(completed)s completed, %(abandoned)s abandoned", stats)
+    return stats
+
+
+def regrade_answers(quiz_id):
+    """
+    Recompute StudentAnswer.is_correct for a whole quiz with two set-based
+    UPDATEs (one for option answers, one for legacy index answers).
+    """
+    answers = StudentAnswer.objects.filter(question__quiz_id=quiz_id)
+    selected_is_correct = Option.objects.filter(id=OuterRef('selected_option_id')).values('is_correct')[:1]
+    updated = answers.filter(selected_option__isnull=False).update(
+        is_correct=Coalesce(Subquery(selected_is_correct), Value(False), output_field=BooleanField())
+    )
+    index_is_correct = Question.objects.filter(id=OuterRef('question_id'), correct_answer=OuterRef('selected_option_index'))
+    updated += answers.filter(selected_option__isnull=True).update(is_correct=Exists(index_is_correct))
+    return updated
+
+
+def _attempt_answer_aggregate(expression):
+    """Correlated subquery aggregating an attempt's answers (uses the attempt/question index)."""
+    return Coalesce(
+        Subquery(
+            StudentAnswer.objects.filter(attempt_id=OuterRef('id'))
+            .values('attempt_id')
+            .annotate(total=expression)
+            .values('total')[:1],
+            output_field=IntegerField(),
+        ),
+        Value(0),
+    )
+
+
+def regrade_attempts(attempts, passing_marks):
+    """
+    Recompute score, max_score, counts, percentage and passed for a queryset
+    of attempts entirely in the database (two UPDATE statements).
+    """
+    now = timezone.now()
+    updated = attempts.update(
+        score=_attempt_answer_aggregate(
+            Sum(Case(When(is_correct=True, then=F('question__marks')), default=Value(0), output_field=IntegerField()))
+        ),
+        max_score=_attempt_answer_aggregate(Sum('question__marks')),
+        correct_answers=_attempt_answer_aggregate(Count('id', filter=Q(is_correct=True))),
+        incorrect_answers=_attempt_answer_aggregate(Count('id', filter=Q(is_correct=False))),
+        updated_at=now,
+    )
+    # Derived columns read the new totals, so they need a second pass
+    attempts.update(
+        total_marks=F('max_score'),
+        percentage=Case(
+            When(max_score__gt=0, then=Cast('score', FloatField()) * Value(100.0) / F('max_score')),
+            default=Value(0.0),
+            output_field=FloatField(),
+        ),
+        passed=Case(
+            When(max_score__gt=0, score__gte=passing_marks or 0, then=Value(True)),
+            default=Value(False),
+            output_field=BooleanField(),
+        ),
+    )
+    return updated
+
+
+def regrade_quiz(quiz_id, chunk_size=5000, progress=None):
+    """
+    Bring every completed attempt of a quiz in line with its current answer
+    key and question marks.
+
+    Everything runs as set-based UPDATEs: one pass over the answers, then
+    per chunk of attempt ids (to keep write transactions short) two UPDATEs
+    that recompute the totals from the answers. ``progress(done, total)`` is
+    called after every chunk. Archived attempts and their rollups follow
+    (archive.regrade_archived_attempts); only the ones whose grade changed
+    are rewritten, and ``progress`` is called again for each of their
+    chunks with the same counts.
+    """
+    started = time.perf_counter()
+    quiz = Quiz.objects.get(id=quiz_id)
+    with transaction.atomic():
+        answers_updated = regrade_answers(quiz_id)
+
+    attempts = QuizAttempt.objects.filter(quiz_id=quiz_id, status=ATTEMPT_STATUS_COMPLETED)
+    total = attempts.count()
+    done, last_id = 0, 0
+    while True:
+        chunk_ids = list(attempts.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:chunk_size])
+        if not chunk_ids:
+            break
+        with transaction.atomic():
+            done += regrade_attempts(attempts.filter(id__gte=chunk_ids[0], id__lte=chunk_ids[-1]), quiz.passing_marks)
+        last_id = chunk_ids[-1]
+        if progress:
+            progress(done, total)
+
+    # Archived attempts are regraded too, so dashboards stay consistent
+    from .archive import regrade_archived_attempts
+    archived = regrade_archived_attempts(quiz_id, quiz.passing_marks, progress=progress and (lambda: progress(done, total)))
+
+    # The answer key itself was invalidated by the question and option signals
+    student_ids = attempts.order_by('student_id').values_list('student_id', flat=True).distinct()
+    bump_many((SCOPE_TEACHER, quiz.created_by_id), *((SCOPE_STUDENT, student_id) for student_id in student_ids))
+    result = {
+        'quiz_id': quiz_id,
+        'answers_updated': answers_updated,
+        'attempts_regraded': done,
+        **archived,
+        'seconds': round(time.perf_counter() - started, 3),
+    }
+    logger.info(
+        "Regraded quiz %(quiz_id)s: %(answers_updated)s answers, %(attempts_regraded)s attempts "
+        "(%(archived_attempts_regraded)s archived) in %(seconds)ss", result,
+    )
+    return result
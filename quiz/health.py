@@ -0,0 +1,131 @@
+"""
+Liveness and readiness probes
+
+/health/live only shows that the process answers. /health/ready times the
+dependencies a request needs and answers 503 when any of them fails or is
+slower than its threshold in HEALTH['THRESHOLDS_MS']:
+
+    db_read   a trivial SELECT
+    db_write  an UPDATE of a HealthProbe scratch row (catches a locked SQLite)
+    cache     a set/get/delete round trip on the default cache
+    queues    the depth of the log queue and of the background job queue,
+              failing when either is deeper than HEALTH['MAX_QUEUE_DEPTH']
+
+The result is kept per process for HEALTH['CACHE_SECONDS'], and only one
+thread runs the probes at a time, so a busy load balancer cannot turn the
+probes themselves into load.
+"""
+
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.utils import timezone
+
+from .models import BackgroundJob, HealthProbe
+from .structured_logging import QueuedHandler
+
+DEFAULT_HEALTH = {
+    'CACHE_SECONDS': 1.0,
+    'THRESHOLDS_MS': {'db_read': 100, 'db_write': 250, 'cache': 50, 'queues': 100},
+    'MAX_QUEUE_DEPTH': 5000,
+}
+PROBE_ROW = 'readiness'
+
+
+def health_config():
+    config = {**DEFAULT_HEALTH, **getattr(settings, 'HEALTH', {})}
+    config['THRESHOLDS_MS'] = {**DEFAULT_HEALTH['THRESHOLDS_MS'], **config['THRESHOLDS_MS']}
+    return config
+
+
+def probe_db_read():
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT 1')
+        cursor.fetchone()
+
+
+def probe_db_write():
+    if not HealthProbe.objects.filter(name=PROBE_ROW).update(checked_at=timezone.now()):
+        HealthProbe.objects.get_or_create(name=PROBE_ROW)
+
+
+def probe_cache():
+    key, value = f'health:{uuid.uuid4().hex}', uuid.uuid4().hex
+    cache.set(key, value, 10)
+    try:
+        if cache.get(key) != value:
+            raise RuntimeError('value read back differs from the one written')
+    finally:
+        cache.delete(key)
+
+
+PROBES = [('db_read', probe_db_read), ('db_write', probe_db_write), ('cache', probe_cache)]
+
+
+def queue_depths():
+    return {
+        'logging': sum(handler.queue.qsize() for handler in list(QueuedHandler.instances)),
+        'jobs': BackgroundJob.objects.filter(status='queued').count(),
+    }
+
+
+def run_checks(config):
+    checks = {}
+    for name, probe in PROBES:
+        threshold = config['THRESHOLDS_MS'][name]
+        started = time.perf_counter()
+        try:
+            probe()
+        except Exception as e:
+            checks[name] = {'ok': False, 'error': f'{type(e).__name__}: {e}'}
+            continue
+        elapsed_ms = round((time.perf_counter() - started) * 1000, 2)
+        checks[name] = {'ok': elapsed_ms <= threshold, 'ms': elapsed_ms, 'threshold_ms': threshold}
+    threshold = config['THRESHOLDS_MS']['queues']
+    started = time.perf_counter()
+    try:
+        # The job count is a query too, so it can fail or stall like db_read
+        depths = queue_depths()
+    except Exception as e:
+        checks['queues'] = {'ok': False, 'error': f'{type(e).__name__}: {e}'}
+    else:
+        elapsed_ms = round((time.perf_counter() - started) * 1000, 2)
+        checks['queues'] = {'ok': elapsed_ms <= threshold and all(depth <= config['MAX_QUEUE_DEPTH'] for depth in depths.values()),
+                            'depths': depths, 'max_depth': config['MAX_QUEUE_DEPTH'], 'ms': elapsed_ms, 'threshold_ms': threshold}
+    return {
+        'status': 'ready' if all(check['ok'] for check in checks.values()) else 'unready',
+        'checks': checks,
+        'checked_at': timezone.now().isoformat(),
+    }
+
+
+class ReadinessCache:
+    """The last readiness result of this process, refreshed by one thread at a time."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._result = None
+        self._expires = 0.0
+
+    def get(self):
+        config = health_config()
+        if time.monotonic() < self._expires:
+            return self._result
+        # While one thread probes (a locked database can take seconds),
+        # the others answer with the previous result instead of piling up
+        if not self._lock.acquire(blocking=self._result is None):
+            return self._result
+        try:
+            if time.monotonic() >= self._expires:
+                self._result = run_checks(config)
+                self._expires = time.monotonic() + config['CACHE_SECONDS']
+            return self._result
+        finally:
+            self._lock.release()
+
+
+readiness = ReadinessCache()
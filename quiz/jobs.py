@@ -0,0 +1,400 @@
+"""
+Background jobs for bulk operations
+
+An admin action enqueues a BackgroundJob holding the rows' model label,
+filter kwargs that select them (the changelist filters, or the ticked
+primary keys) and the smallest and largest primary keys they matched, and
+returns at once. The job runner (python manage.py run_jobs) claims queued
+jobs one at a time and runs the registered operation over chunk after
+chunk of those rows, paging through them in primary key order with a
+keyset cursor (pk > last_pk). After each chunk it saves the cursor, the
+merged result counts and a heartbeat, and it checks for a cancellation
+request. Operations whose chunks run long call heartbeat(job) as they go.
+A job whose runner died is requeued once its heartbeat is older than
+JOBS['STALE_SECONDS'] and resumes after the last saved chunk.
+
+The filters are evaluated chunk by chunk, so rows that stop matching
+before their chunk runs are skipped, and rows added after the job was
+queued are left out by the max_pk bound. A queryset whose WHERE clause is
+more than ANDed lookups on its own columns (a changelist search, say) is
+stored as the primary keys it matched when queued.
+
+Operations are registered with @operation:
+
+    @operation('archive_quizzes', Quiz, 'Archive quizzes', chunk_size=200)
+    def archive_quizzes(quizzes, job):
+        ...
+        return {'archived': count}
+
+A handler gets a queryset for one chunk and returns counts that are added
+to job.result. Handlers of atomic operations run inside the chunk's
+transaction; the others manage their own.
+"""
+
+import csv
+import logging
+import os
+import socket
+import tempfile
+import time
+import traceback
+from contextlib import nullcontext
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max, Min
+from django.db.models.expressions import Col
+from django.db.models.sql.where import AND, WhereNode
+from django.utils import timezone
+
+from .archive import archive_attempt_ids
+from .caching import SCOPE_STUDENT, SCOPE_TEACHER, bump_many
+from .deletion import purge_quiz
+from .grading import regrade_quiz
+from .models import ArchivedAttempt, BackgroundJob, Quiz, QuizAttempt, StudentAnswer, Tombstone
+
+logger = logging.getLogger('quiz')
+
+DEFAULT_JOBS = {
+    'CHUNK_SIZE': 500,
+    # A running job without a heartbeat for this long is requeued
+    'STALE_SECONDS': 900,
+    # Least time between heartbeats written from inside a chunk
+    'HEARTBEAT_SECONDS': 30,
+    'POLL_SECONDS': 2.0,
+    'EXPORT_DIR': os.path.join(tempfile.gettempdir(), 'quizmaster-exports'),
+}
+
+OPERATIONS = {}
+
+JSON_SCALARS = (str, int, float, bool, type(None))
+
+
+def jobs_config():
+    return {**DEFAULT_JOBS, **getattr(settings, 'JOBS', {})}
+
+
+class Operation:
+    def __init__(self, name, model, label, handler, chunk_size=None, atomic=True):
+        self.name = name
+        self.model = model
+        self.label = label
+        self.handler = handler
+        self.chunk_size = chunk_size
+        self.atomic = atomic
+
+
+def operation(name, model, label, chunk_size=None, atomic=True):
+    """Register a bulk operation over ``model`` rows under ``name``."""
+    def decorator(handler):
+        OPERATIONS[name] = Operation(name, model, label, handler, chunk_size, atomic)
+        return handler
+    return decorator
+
+
+def operations_for(model):
+    return [op for op in OPERATIONS.values() if op.model is model]
+
+
+# Queueing and control
+
+def enqueue(name, queryset, user=None, params=None):
+    """Queue ``name`` over the rows of ``queryset``; returns the job."""
+    op = OPERATIONS[name]
+    if queryset.model is not op.model:
+        raise ValueError(f'{name} runs on {op.model.__name__}, not {queryset.model.__name__}')
+    queryset = queryset.order_by()
+    bounds = queryset.aggregate(total=Count('pk'), min_pk=Min('pk'), max_pk=Max('pk'))
+    job = BackgroundJob.objects.create(
+        operation=name, model=op.model._meta.label, filters=selection_filters(queryset),
+        min_pk=bounds['min_pk'], max_pk=bounds['max_pk'], total=bounds['total'],
+        params=params or {}, created_by=user,
+    )
+    logger.info("Queued job %s: %s over %s rows", job.id, name, job.total)
+    return job
+
+
+def selection_filters(queryset):
+    """
+    JSON filter kwargs selecting the rows of ``queryset``: its own lookups
+    when the WHERE clause is only ANDed lookups on the model's columns with
+    plain values, otherwise the primary keys it matches now.
+    """
+    query = queryset.query
+    filters = {}
+    if len(query.alias_map) <= 1 and not query.is_sliced and not query.combinator and _where_filters(query.where, filters):
+        return filters
+    return {'pk__in': list(queryset.values_list('pk', flat=True))}
+
+
+def _where_filters(node, filters):
+    if node.negated or (node.connector != AND and len(node.children) > 1):
+        return False
+    for child in node.children:
+        if isinstance(child, WhereNode):
+            if not _where_filters(child, filters):
+                return False
+            continue
+        lhs, rhs = getattr(child, 'lhs', None), getattr(child, 'rhs', None)
+        if not isinstance(lhs, Col) or not getattr(child, 'lookup_name', None):
+            return False
+        if isinstance(rhs, (list, tuple, set, frozenset)):
+            rhs = sorted(rhs) if isinstance(rhs, (set, frozenset)) else list(rhs)
+            if not all(isinstance(value, JSON_SCALARS) for value in rhs):
+                return False
+        elif not isinstance(rhs, JSON_SCALARS):
+            return False
+        key = f'{lhs.target.attname}__{child.lookup_name}'
+        if key in filters:
+            # The same lookup twice cannot be one keyword argument
+            return False
+        filters[key] = rhs
+    return True
+
+
+def cancel_jobs(jobs):
+    """Cancel queued jobs now and ask running ones to stop after their current chunk."""
+    now = timezone.now()
+    cancelled = jobs.filter(status='queued').update(status='cancelled', cancel_requested=True, finished_at=now)
+    stopping = jobs.filter(status='running').update(cancel_requested=True)
+    return cancelled, stopping
+
+
+def requeue_stale_jobs():
+    cutoff = timezone.now() - timedelta(seconds=jobs_config()['STALE_SECONDS'])
+    count = BackgroundJob.objects.filter(status='running', heartbeat_at__lt=cutoff).update(status='queued', worker='')
+    if count:
+        logger.warning("Requeued %s stale jobs", count)
+    return count
+
+
+def claim_job(worker):
+    """Mark the oldest queued job as running for ``worker``; None if there is none."""
+    while True:
+        job_id = BackgroundJob.objects.filter(status='queued').order_by('created_at', 'id').values_list('id', flat=True).first()
+        if job_id is None:
+            return None
+        now = timezone.now()
+        # Another runner may claim the same job first; then try the next one
+        claimed = BackgroundJob.objects.filter(id=job_id, status='queued').update(
+            status='running', worker=worker, heartbeat_at=now,
+        )
+        if claimed:
+            job = BackgroundJob.objects.get(id=job_id)
+            if job.started_at is None:
+                job.started_at = now
+                job.save(update_fields=['started_at'])
+            return job
+
+
+# Running
+
+def _merge_result(result, counts):
+    for key, value in (counts or {}).items():
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            result[key] = result.get(key, 0) + value
+        else:
+            result[key] = value
+
+
+def run_job(job):
+    """Run a claimed job from its saved cursor to the end, a cancellation or an error."""
+    op = OPERATIONS.get(job.operation)
+    if op is None:
+        return _finish(job, 'failed', error=f'Unknown operation {job.operation!r}')
+    chunk_size = op.chunk_size or jobs_config()['CHUNK_SIZE']
+    started = time.perf_counter()
+    try:
+        rows = job_rows(job, op)
+        while True:
+            if BackgroundJob.objects.filter(id=job.id, cancel_requested=True).exists():
+                logger.info("Job %s cancelled after %s of %s rows", job.id, job.processed, job.total)
+                return _finish(job, 'cancelled')
+            page = rows if job.last_pk is None else rows.filter(pk__gt=job.last_pk)
+            chunk_ids = list(page.order_by('pk').values_list('pk', flat=True)[:chunk_size])
+            if not chunk_ids:
+                break
+            # The base manager also reaches soft-deleted quizzes, for the purge
+            queryset = op.model._base_manager.filter(pk__in=chunk_ids)
+            with transaction.atomic() if op.atomic else nullcontext():
+                _merge_result(job.result, op.handler(queryset, job))
+                job.processed += len(chunk_ids)
+                job.last_pk = chunk_ids[-1]
+                job.heartbeat_at = timezone.now()
+                job.save(update_fields=['processed', 'last_pk', 'result', 'heartbeat_at'])
+    except Exception:
+        logger.exception("Job %s (%s) failed", job.id, job.operation)
+        return _finish(job, 'failed', error=traceback.format_exc())
+    logger.info("Job %s (%s) completed %s rows in %.1fs", job.id, job.operation, job.processed, time.perf_counter() - started)
+    return _finish(job, 'completed')
+
+
+def job_rows(job, op):
+    """The rows a job was queued over, within the primary keys matched then."""
+    if apps.get_model(job.model) is not op.model:
+        raise ValueError(f'{job.operation} runs on {op.model._meta.label}, not {job.model}')
+    rows = op.model._base_manager.filter(**job.filters)
+    if job.max_pk is None:
+        return rows.none()
+    return rows.filter(pk__gte=job.min_pk, pk__lte=job.max_pk)
+
+
+def heartbeat(job):
+    """
+    Show a running job is alive from inside a long chunk, so it is not
+    requeued as stale and run twice. Written at most every
+    JOBS['HEARTBEAT_SECONDS'].
+    """
+    now = timezone.now()
+    if job.heartbeat_at and (now - job.heartbeat_at).total_seconds() < jobs_config()['HEARTBEAT_SECONDS']:
+        return
+    job.heartbeat_at = now
+    BackgroundJob.objects.filter(id=job.id).update(heartbeat_at=now)
+
+
+def _finish(job, status, error=''):
+    job.status = status
+    job.error = error
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'error', 'finished_at', 'result', 'processed', 'last_pk'])
+    return job
+
+
+def default_worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def run_pending_jobs(worker=None, limit=None):
+    """Run queued jobs until there are none left (or ``limit`` ran); returns how many ran."""
+    worker = worker or default_worker_name()
+    ran = 0
+    requeue_stale_jobs()
+    while limit is None or ran < limit:
+        job = claim_job(worker)
+        if job is None:
+            break
+        run_job(job)
+        ran += 1
+    return ran
+
+
+# Exports
+
+def export_path(job):
+    return os.path.join(jobs_config()['EXPORT_DIR'], f'job-{job.id}-{job.operation}.csv')
+
+
+def _append_csv(job, header, rows):
+    """
+    Append a chunk's rows to the job's CSV file. The result's file_bytes
+    adds up to the length of the file at the last saved chunk, so a resumed
+    job first cuts off whatever a dead runner wrote after it.
+    """
+    path = export_path(job)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    new_file = job.processed == 0 or not os.path.exists(path)
+    offset = 0 if new_file else job.result['file_bytes']
+    if not new_file:
+        os.truncate(path, offset)
+    with open(path, 'w' if new_file else 'a', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        if new_file:
+            writer.writerow(header)
+        count = 0
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+    return {'exported': count, 'file': os.path.basename(path), 'file_bytes': os.path.getsize(path) - offset}
+
+
+# Operations
+
+@operation('archive_quizzes', Quiz, 'Archive quizzes', chunk_size=200)
+def archive_quizzes(quizzes, job):
+    archived = 0
+    for quiz in quizzes.exclude(status='archived'):
+        quiz.status = 'archived'
+        # save() so the dashboard caches are bumped by the signals
+        quiz.save(update_fields=['status', 'updated_at'])
+        archived += 1
+    return {'archived': archived}
+
+
+@operation('regrade_quizzes', Quiz, 'Regrade attempts with the current answer key', chunk_size=1, atomic=False)
+def regrade_quizzes(quizzes, job):
+    counts = {'quizzes_regraded': 0, 'attempts_regraded': 0, 'answers_updated': 0,
+              'archived_attempts_regraded': 0, 'archived_answers_updated': 0}
+    for quiz_id in quizzes.values_list('id', flat=True):
+        result = regrade_quiz(quiz_id, progress=lambda done, total: heartbeat(job))
+        counts['quizzes_regraded'] += 1
+        for key in counts.keys() - {'quizzes_regraded'}:
+            counts[key] += result[key]
+    return counts
+
+
+@operation('delete_quizzes', Quiz, 'Delete quizzes with all their attempts', chunk_size=1, atomic=False)
+def delete_quizzes(quizzes, job):
+    counts = {}
+    for quiz in quizzes:
+        if quiz.deleted_at is None:
+            # Queued from the admin action rather than soft_delete_quiz()
+            quiz.deleted_at = timezone.now()
+            quiz.save(update_fields=['deleted_at', 'updated_at'])
+            Tombstone.objects.create(
+                model_name='quiz', object_id=quiz.pk, quiz_id=quiz.pk, owner_id=quiz.created_by_id,
+                teachers_only=quiz.status != 'active',
+            )
+        _merge_result(counts, purge_quiz(quiz.pk, progress=lambda: heartbeat(job)))
+    return counts
+
+
+@operation('export_attempts', QuizAttempt, 'Export attempts to CSV', atomic=False)
+def export_attempts(attempts, job):
+    rows = attempts.order_by('id').values_list(
+        'id', 'quiz_id', 'quiz__title', 'student_id', 'student__username', 'status', 'score', 'max_score',
+        'percentage', 'passed', 'start_time', 'end_time', 'time_spent',
+    )
+    header = ['id', 'quiz_id', 'quiz', 'student_id', 'student', 'status', 'score', 'max_score',
+              'percentage', 'passed', 'start_time', 'end_time', 'time_spent']
+    return _append_csv(job, header, rows.iterator())
+
+
+@operation('delete_attempts', QuizAttempt, 'Delete attempts with their answers')
+def delete_attempts(attempts, job):
+    deleted, by_model = attempts.delete()
+    return {'attempts_deleted': by_model.get(QuizAttempt._meta.label, 0), 'answers_deleted': by_model.get(StudentAnswer._meta.label, 0)}
+
+
+@operation('archive_attempts', QuizAttempt, 'Move completed attempts to the archive', atomic=False)
+def archive_attempts(attempts, job):
+    return archive_attempt_ids(list(attempts.values_list('id', flat=True)))
+
+
+@operation('export_archived_attempts', ArchivedAttempt, 'Export archived attempts to CSV', atomic=False)
+def export_archived_attempts(attempts, job):
+    rows = attempts.order_by('id').values_list(
+        'id', 'quiz_id', 'quiz_title', 'student_id', 'student_username', 'status', 'score', 'max_score',
+        'percentage', 'passed', 'start_time', 'end_time', 'time_spent',
+    )
+    header = ['id', 'quiz_id', 'quiz', 'student_id', 'student', 'status', 'score', 'max_score',
+              'percentage', 'passed', 'start_time', 'end_time', 'time_spent']
+    return _append_csv(job, header, rows.iterator())
+
+
+@operation('export_answers', StudentAnswer, 'Export answers to CSV', chunk_size=5000, atomic=False)
+def export_answers(answers, job):
+    rows = answers.order_by('id').values_list(
+        'id', 'attempt_id', 'attempt__student__username', 'question_id', 'selected_option_id', 'is_correct', 'time_taken', 'created_at',
+    )
+    header = ['id', 'attempt_id', 'student', 'question_id', 'selected_option_id', 'is_correct', 'time_taken', 'created_at']
+    return _append_csv(job, header, rows.iterator())
+
+
+@operation('delete_answers', StudentAnswer, 'Delete answers (attempt scores are not recomputed)', chunk_size=5000)
+def delete_answers(answers, job):
+    owners = set(answers.values_list('attempt__student_id', 'attempt__quiz__created_by_id').distinct())
+    deleted, _ = answers.delete()
+    bump_many(*{scope for student_id, teacher_id in owners for scope in ((SCOPE_STUDENT, student_id), (SCOPE_TEACHER, teacher_id))})
+    return {'answers_deleted': deleted}
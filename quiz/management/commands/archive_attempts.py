@@ -0,0 +1,33 @@
+"""
+Move completed attempts older than the archive horizon, with their answers,
+to the archive tables and add them to the per-student, per-quiz rollups.
+Meant to run from cron, e.g. nightly:
+
+    python manage.py archive_attempts
+    python manage.py archive_attempts --horizon-days 180 --limit 100000
+"""
+
+from django.core.management.base import BaseCommand
+
+from quiz.archive import archive_attempts, archive_candidates, archive_config
+
+
+class Command(BaseCommand):
+    help = 'Move old completed quiz attempts and their answers to the archive tables'
+
+    def add_arguments(self, parser):
+        config = archive_config()
+        parser.add_argument('--horizon-days', type=int, default=config['HORIZON_DAYS'], help='Archive attempts started more than this many days ago')
+        parser.add_argument('--batch-size', type=int, default=config['BATCH_SIZE'], help='Attempts moved per transaction')
+        parser.add_argument('--limit', type=int, default=None, help='Stop after archiving this many attempts')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the attempts that would be archived')
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            count = archive_candidates(options['horizon_days']).count()
+            self.stdout.write(f"{count} attempts are older than {options['horizon_days']} days")
+            return
+        counts = archive_attempts(options['horizon_days'], options['batch_size'], options['limit'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {counts['attempts_archived']} attempts and {counts['answers_archived']} answers"
+        ))
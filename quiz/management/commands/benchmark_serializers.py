@@ -0,0 +1,108 @@
+"""
+Compare the fast values_list() serializers with the DRF ModelSerializers.
+
+Runs both over the same rows from the current database, checks that they
+produce identical data, and reports the best time of several runs:
+
+    python manage.py benchmark_serializers
+    python manage.py benchmark_serializers --rows 2000 --repeat 7 --json
+"""
+
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from rest_framework.renderers import JSONRenderer
+
+from accounts.fast_serializers import FastQuizSerializer, FastQuizAttemptSerializer, FastQuizResultSerializer
+from accounts.renderers import ORJSONRenderer
+from accounts.serializers import QuizSerializer, QuizAttemptSerializer, QuizResultSerializer, QuestionSerializer
+from quiz.delivery import build_quiz_payload
+from quiz.models import Quiz, Question, QuizAttempt
+
+
+def best_of(repeat, function):
+    timings, result = [], None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - started)
+    return min(timings), result
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the fast API serializers and renderer against their DRF equivalents'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000, help='Rows serialized per case')
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per case; the best is reported')
+        parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+
+    def handle(self, *args, **options):
+        rows, repeat = options['rows'], options['repeat']
+        quizzes = Quiz.objects.select_related('created_by__user').annotate(num_questions=Count('questions')).order_by('-created_at')[:rows]
+        attempts = QuizAttempt.objects.select_related('quiz', 'student').order_by('-start_time')[:rows]
+        results = QuizAttempt.objects.filter(status='completed').select_related('quiz', 'student').order_by('-id')[:rows]
+        busiest_quiz = Question.objects.values('quiz_id').annotate(n=Count('id')).order_by('-n').values_list('quiz_id', flat=True).first()
+        if busiest_quiz is None or not attempts.exists():
+            raise CommandError('Not enough data to benchmark; seed some quizzes and attempts first')
+
+        answered_results = results.prefetch_related('answers')
+        questions = Question.objects.filter(quiz_id=busiest_quiz).prefetch_related('option_set')
+        # (name, fetch instances, ModelSerializer, fast serializer, its queryset)
+        cases = [
+            ('quiz list', lambda: list(quizzes), lambda data: QuizSerializer(data, many=True).data,
+             FastQuizSerializer(), quizzes),
+            ('attempt list', lambda: list(attempts), lambda data: QuizAttemptSerializer(data, many=True).data,
+             FastQuizAttemptSerializer(), attempts),
+            ('results', lambda: list(answered_results), lambda data: QuizResultSerializer(data, many=True).data,
+             FastQuizResultSerializer(), results),
+            # Different shapes, same information: the ModelSerializer a delivery API would otherwise use
+            ('delivery payload', lambda: list(questions), lambda data: QuestionSerializer(data, many=True).data,
+             None, busiest_quiz),
+        ]
+
+        report = []
+        for name, fetch, serialize, fast, source in cases:
+            slow_total, slow_data = best_of(repeat, lambda: serialize(fetch()))
+            instances = fetch()
+            slow_serialize, _ = best_of(repeat, lambda: serialize(instances))
+            if fast is None:
+                fast_total, fast_data = best_of(repeat, lambda: build_quiz_payload(source))
+                fast_serialize = fast_total
+            else:
+                fast_total, fast_data = best_of(repeat, lambda: fast.serialize(source))
+                rows = list(fast.rows(source))
+                fast_serialize, _ = best_of(repeat, lambda: fast.to_dicts(rows))
+            json_seconds, rendered = best_of(repeat, lambda: JSONRenderer().render(fast_data))
+            orjson_seconds, fast_rendered = best_of(repeat, lambda: ORJSONRenderer().render(fast_data))
+            report.append({
+                'case': name,
+                'rows': len(fast_data),
+                'model_serializer_ms': round(slow_serialize * 1000, 2),
+                'fast_serializer_ms': round(fast_serialize * 1000, 2),
+                'speedup': round(slow_serialize / fast_serialize, 1) if fast_serialize else None,
+                'model_serializer_with_query_ms': round(slow_total * 1000, 2),
+                'fast_serializer_with_query_ms': round(fast_total * 1000, 2),
+                'speedup_with_query': round(slow_total / fast_total, 1) if fast_total else None,
+                'identical': json.loads(JSONRenderer().render(slow_data)) == json.loads(rendered) if fast else None,
+                'json_render_ms': round(json_seconds * 1000, 2),
+                'orjson_render_ms': round(orjson_seconds * 1000, 2),
+                'identical_render': rendered == fast_rendered,
+            })
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+        for row in report:
+            line = (
+                f"{row['case']:<17} {row['rows']:>6} rows  "
+                f"serialize {row['model_serializer_ms']:>8.2f} -> {row['fast_serializer_ms']:>7.2f} ms (x{row['speedup']})  "
+                f"with query {row['model_serializer_with_query_ms']:>8.2f} -> {row['fast_serializer_with_query_ms']:>7.2f} ms (x{row['speedup_with_query']})  "
+                f"render json {row['json_render_ms']:.2f} / orjson {row['orjson_render_ms']:.2f} ms"
+            )
+            if row['identical'] is False or not row['identical_render']:
+                self.stdout.write(self.style.ERROR(f"{line}  OUTPUT DIFFERS"))
+            else:
+                self.stdout.write(self.style.SUCCESS(line))
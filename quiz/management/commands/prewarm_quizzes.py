@@ -0,0 +1,74 @@
+"""
+Pre-warm the delivery cache for quizzes about to open.
+
+Builds the question payload and answer key for every active quiz whose
+opens_at falls inside the lead window, stores them in the shared cache and
+verifies they were kept. Meant to run from cron every few minutes:
+
+    python manage.py prewarm_quizzes
+    python manage.py prewarm_quizzes --quiz 12 --quiz 15
+"""
+
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+
+from quiz.delivery import prewarm_quiz, delivery_cache_stats
+from quiz.models import Quiz
+
+
+class Command(BaseCommand):
+    help = 'Build and cache quiz payloads and answer keys ahead of scheduled exam windows'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lead-minutes', type=int,
+            default=settings.QUIZ_SETTINGS.get('PREWARM_LEAD_MINUTES', 15),
+            help='Pre-warm quizzes opening within this many minutes',
+        )
+        parser.add_argument('--quiz', type=int, action='append', dest='quiz_ids', help='Pre-warm specific quiz ids')
+        parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        lead = timedelta(minutes=options['lead_minutes'])
+        quizzes = Quiz.objects.filter(status='active')
+        if options['quiz_ids']:
+            quizzes = quizzes.filter(id__in=options['quiz_ids'])
+        else:
+            # Opening soon, or open right now and not yet closed
+            quizzes = quizzes.filter(opens_at__isnull=False, opens_at__lte=now + lead).filter(
+                Q(closes_at__isnull=True) | Q(closes_at__gt=now)
+            )
+
+        max_bytes = settings.QUIZ_SETTINGS.get('PREWARM_MAX_ENTRY_BYTES')
+        results = []
+        for quiz_id, time_limit, closes_at in quizzes.values_list('id', 'time_limit', 'closes_at'):
+            # Keep the entries alive until the last possible submission
+            end = closes_at + timedelta(minutes=time_limit) if closes_at else now + lead + timedelta(minutes=time_limit)
+            timeout = max(int((end - now).total_seconds()), 60) + 15 * 60
+            results.append(prewarm_quiz(quiz_id, timeout=timeout, max_bytes=max_bytes))
+
+        report = {'quizzes': results, 'cache': delivery_cache_stats()}
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        for result in results:
+            line = (
+                f"Quiz {result['quiz_id']}: {result['seconds'] * 1000:.1f} ms, "
+                f"payload {result['payload_bytes']} B, answer key {result['answer_key_bytes']} B"
+            )
+            if result['verified']:
+                self.stdout.write(self.style.SUCCESS(line))
+            else:
+                self.stdout.write(self.style.ERROR(f"{line} - NOT CACHED (oversized: {result['oversized'] or 'none'})"))
+        payload_rate = report['cache']['payload']['hit_ratio']
+        self.stdout.write(
+            f"Pre-warmed {sum(r['verified'] for r in results)}/{len(results)} quizzes; "
+            f"payload cache hit rate: {'n/a' if payload_rate is None else f'{payload_rate:.1%}'}"
+        )
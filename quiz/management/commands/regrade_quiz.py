@@ -0,0 +1,36 @@
+"""
+Regrade quizzes after their answer key or question marks changed.
+
+    python manage.py regrade_quiz 12
+    python manage.py regrade_quiz 12 15 --chunk-size 5000
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from quiz.grading import regrade_quiz
+from quiz.models import Quiz
+
+
+class Command(BaseCommand):
+    help = 'Recompute answer correctness and attempt scores for one or more quizzes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('quiz_ids', nargs='+', type=int)
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Attempts recomputed per UPDATE')
+
+    def handle(self, *args, **options):
+        missing = set(options['quiz_ids']) - set(Quiz.objects.filter(id__in=options['quiz_ids']).values_list('id', flat=True))
+        if missing:
+            raise CommandError(f"Quiz not found: {', '.join(map(str, sorted(missing)))}")
+
+        for quiz_id in options['quiz_ids']:
+            def report(done, total, quiz_id=quiz_id):
+                self.stdout.write(f"  quiz {quiz_id}: {done}/{total} attempts", ending='\r')
+                self.stdout.flush()
+
+            result = regrade_quiz(quiz_id, chunk_size=options['chunk_size'], progress=report)
+            self.stdout.write(self.style.SUCCESS(
+                f"Quiz {quiz_id}: {result['answers_updated']} answers and "
+                f"{result['attempts_regraded']} attempts regraded, "
+                f"{result['archived_attempts_regraded']} archived attempts changed, in {result['seconds']}s"
+            ))
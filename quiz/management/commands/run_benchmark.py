@@ -0,0 +1,235 @@
+"""
+End-to-end load benchmark over the hot views.
+
+Drives the views through the Django test client (the full middleware
+stack, no network) from --concurrency threads, as users created by
+seed_dataset, and prints throughput, latency percentiles and queries per
+request as JSON:
+
+    python manage.py seed_dataset --prefix bench
+    python manage.py run_benchmark --requests 500 --concurrency 8 --output before.json
+    python manage.py run_benchmark --requests 500 --concurrency 8 --compare before.json
+
+take_quiz and submit_quiz start and complete real attempts on quizzes the
+student has not completed yet, so they change the data; re-seed (or use a
+copy of the database) to compare runs like for like.
+"""
+
+import json
+import math
+import queue
+import statistics
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from quiz.delivery import get_quiz_payload
+from quiz.models import Quiz, QuizAttempt
+
+SCENARIOS = ['teacher_dashboard', 'manage_quizzes', 'view_quiz_results', 'student_dashboard', 'take_quiz', 'submit_quiz']
+# Compared by --compare; for latency lower is better, for throughput higher
+COMPARED_METRICS = ['throughput_rps', 'p50_ms', 'p95_ms', 'p99_ms', 'queries_mean']
+
+
+def percentile(sorted_values, percent):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(percent / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def benchmark_host():
+    """A Host header the current ALLOWED_HOSTS accepts."""
+    for host in settings.ALLOWED_HOSTS:
+        if host == '*':
+            return 'testserver'
+        return f'benchmark{host}' if host.startswith('.') else host
+    return 'localhost'
+
+
+class Scenario:
+    """
+    One view under test. ``items`` are (user_id, args) pairs; ``prepare``
+    runs untimed before each timed ``request``.
+    """
+
+    def __init__(self, name, items, request, prepare=None):
+        self.name = name
+        self.items = items
+        self.request = request
+        self.prepare = prepare
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the hot views at a given concurrency and report throughput, latency and queries as JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=SCENARIOS)
+        parser.add_argument('--requests', type=int, default=200, help='Timed requests per scenario')
+        parser.add_argument('--concurrency', type=int, default=4, help='Client threads per scenario')
+        parser.add_argument('--prefix', default='bench', help='Username prefix used by seed_dataset')
+        parser.add_argument('--output', help='Also write the JSON report to this file')
+        parser.add_argument('--compare', help='Earlier report to compare against')
+
+    def handle(self, *args, **options):
+        self.secure = settings.SECURE_SSL_REDIRECT
+        self.host = benchmark_host()
+        prefix, count = options['prefix'], options['requests']
+        teachers = list(User.objects.filter(username__startswith=f'{prefix}_t', teacher__isnull=False).values_list('id', 'teacher__id'))
+        students = list(User.objects.filter(username__startswith=f'{prefix}_s', student__isnull=False).values_list('id', flat=True))
+        if not teachers or not students:
+            raise CommandError(f'No seeded users named {prefix}_*; run seed_dataset first')
+
+        report = {
+            'database': connection.vendor,
+            'concurrency': options['concurrency'],
+            'requests_per_scenario': count,
+            'started_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'scenarios': {},
+        }
+        for name in options['scenarios']:
+            scenario = self.build_scenario(name, teachers, students, count)
+            if not scenario.items:
+                self.stderr.write(f'Skipping {name}: nothing left to run it on')
+                continue
+            report['scenarios'][name] = self.run(scenario, options['concurrency'])
+            self.stderr.write(f"{name}: {report['scenarios'][name]['throughput_rps']} req/s, p95 {report['scenarios'][name]['p95_ms']} ms")
+
+        if options['compare']:
+            with open(options['compare']) as f:
+                report['comparison'] = self.compare(json.load(f), report)
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output)
+        self.stdout.write(output)
+
+    # Scenarios
+
+    def build_scenario(self, name, teachers, students, count):
+        cycle = lambda values: [values[n % len(values)] for n in range(count)]
+        if name in ('teacher_dashboard', 'manage_quizzes'):
+            url = reverse(f'quiz:{name}')
+            return Scenario(name, [(user_id, None) for user_id, _ in cycle(teachers)], lambda client, args: client.get(url, secure=self.secure))
+        if name == 'student_dashboard':
+            url = reverse('quiz:student_dashboard')
+            return Scenario(name, [(user_id, None) for user_id in cycle(students)], lambda client, args: client.get(url, secure=self.secure))
+        if name == 'view_quiz_results':
+            owners = dict((teacher_id, user_id) for user_id, teacher_id in teachers)
+            quizzes = list(Quiz.objects.filter(created_by_id__in=owners).values_list('id', 'created_by_id')[:count])
+            items = [(owners[teacher_id], quiz_id) for quiz_id, teacher_id in cycle(quizzes)] if quizzes else []
+            return Scenario(name, items, lambda client, quiz_id: client.get(reverse('quiz:view_quiz_results', args=[quiz_id]), secure=self.secure))
+
+        pairs = self.open_pairs(students, count)
+        take = lambda client, quiz_id: client.get(reverse('quiz:take_quiz', args=[quiz_id]), secure=self.secure)
+        if name == 'take_quiz':
+            return Scenario(name, pairs, take)
+        return Scenario(name, pairs, self.submit, prepare=take)
+
+    def open_pairs(self, students, count):
+        """(student, quiz) pairs the student has not completed, one per timed request."""
+        quiz_ids = list(Quiz.objects.filter(status='active').values_list('id', flat=True))
+        completed = set(QuizAttempt.objects.filter(student_id__in=students, status='completed').values_list('student_id', 'quiz_id'))
+        pairs = []
+        for quiz_id in quiz_ids:
+            for student_id in students:
+                if (student_id, quiz_id) not in completed:
+                    pairs.append((student_id, quiz_id))
+                    if len(pairs) == count:
+                        return pairs
+        return pairs
+
+    def submit(self, client, quiz_id):
+        answers = {str(question['id']): question['options'][0]['id'] for question in get_quiz_payload(quiz_id) if question['options']}
+        return client.post(
+            reverse('quiz:submit_quiz', args=[quiz_id]), data=json.dumps({'answers': answers, 'time_spent': 60}),
+            content_type='application/json', secure=self.secure,
+        )
+
+    # Running
+
+    def run(self, scenario, concurrency):
+        work = queue.Queue()
+        for item in scenario.items:
+            work.put(item)
+        samples, failures, lock = [], [], threading.Lock()
+
+        def worker():
+            clients = {}
+            db = connections['default']
+            try:
+                while True:
+                    try:
+                        user_id, args = work.get_nowait()
+                    except queue.Empty:
+                        return
+                    client = clients.get(user_id)
+                    if client is None:
+                        # View errors are reported as 500s rather than raised
+                        client = clients[user_id] = Client(raise_request_exception=False, HTTP_HOST=self.host)
+                        client.force_login(User.objects.get(id=user_id))
+                    if scenario.prepare:
+                        scenario.prepare(client, args)
+                    with CaptureQueriesContext(db) as queries:
+                        started = time.perf_counter()
+                        response = scenario.request(client, args)
+                        elapsed = time.perf_counter() - started
+                    with lock:
+                        samples.append((elapsed, len(queries), response.status_code))
+            except Exception as e:
+                failures.append(e)
+            finally:
+                db.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        wall = time.perf_counter() - started
+        if failures:
+            raise CommandError(f'{scenario.name} failed: {failures[0]!r}')
+        return self.summarize(samples, wall)
+
+    def summarize(self, samples, wall):
+        latencies = sorted(elapsed * 1000 for elapsed, _, _ in samples)
+        query_counts = sorted(count for _, count, _ in samples)
+        statuses = Counter(status for _, _, status in samples)
+        return {
+            'requests': len(samples),
+            'errors': sum(count for status, count in statuses.items() if status >= 400),
+            'status_codes': {str(status): count for status, count in sorted(statuses.items())},
+            'seconds': round(wall, 3),
+            'throughput_rps': round(len(samples) / wall, 1) if wall else None,
+            'mean_ms': round(statistics.fmean(latencies), 2),
+            'p50_ms': round(percentile(latencies, 50), 2),
+            'p95_ms': round(percentile(latencies, 95), 2),
+            'p99_ms': round(percentile(latencies, 99), 2),
+            'max_ms': round(latencies[-1], 2),
+            'queries_mean': round(statistics.fmean(query_counts), 1),
+            'queries_p95': percentile(query_counts, 95),
+            'queries_max': query_counts[-1],
+        }
+
+    def compare(self, baseline, report):
+        """Per-scenario change against a baseline report, as a ratio (1.2 = 20% higher)."""
+        comparison = {}
+        for name, current in report['scenarios'].items():
+            before = baseline.get('scenarios', {}).get(name)
+            if not before:
+                continue
+            comparison[name] = {
+                metric: round(current[metric] / before[metric], 3) if before.get(metric) else None
+                for metric in COMPARED_METRICS
+            }
+        return comparison
@@ -0,0 +1,39 @@
+"""
+Run queued background jobs (quiz/jobs.py), such as the bulk admin actions.
+
+Either keep one or more runners going next to the web workers:
+
+    python manage.py run_jobs
+
+or drain the queue from cron:
+
+    python manage.py run_jobs --once
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from quiz.jobs import default_worker_name, jobs_config, run_pending_jobs
+
+
+class Command(BaseCommand):
+    help = 'Run queued background jobs, polling for new ones unless --once is given'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Exit when the queue is empty')
+        parser.add_argument('--poll', type=float, default=None, help='Seconds between checks for new jobs')
+        parser.add_argument('--worker', default=None, help='Name recorded on claimed jobs (default host:pid)')
+
+    def handle(self, *args, **options):
+        worker = options['worker'] or default_worker_name()
+        poll = options['poll'] if options['poll'] is not None else jobs_config()['POLL_SECONDS']
+        total = 0
+        while True:
+            ran = run_pending_jobs(worker=worker)
+            total += ran
+            if options['once']:
+                break
+            if not ran:
+                time.sleep(poll)
+        self.stdout.write(self.style.SUCCESS(f'Ran {total} jobs'))
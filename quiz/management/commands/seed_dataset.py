@@ -0,0 +1,209 @@
+"""
+Seed a synthetic dataset for load testing and benchmarks.
+
+Everything is written with bulk inserts in batches, one transaction per
+batch, so millions of answers load in minutes:
+
+    python manage.py seed_dataset
+    python manage.py seed_dataset --teachers 50 --students 20000 --quizzes-per-teacher 20 \\
+        --questions 25 --attempts-per-student 30 --prefix load1
+
+Seeded users are named <prefix>_t<n> and <prefix>_s<n> and share one
+password (--password), so run_benchmark and manual testing can log in as
+them. Bulk inserts skip model signals, so nothing is written to the sync
+tombstones and cache generations are bumped once at the end.
+"""
+
+import random
+import time
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from quiz.caching import CATALOGUE_ID, SCOPE_CATALOGUE, bump
+from quiz.models import UserProfile, Teacher, Student, Quiz, Question, Option, QuizAttempt, StudentAnswer
+
+CATEGORIES = ['Mathematics', 'Physics', 'Chemistry', 'Biology', 'History', 'Geography', 'Computer Science', 'English']
+DIFFICULTIES = ['easy', 'medium', 'hard']
+
+
+def chunked(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class Command(BaseCommand):
+    help = 'Seed teachers, students, quizzes, questions, attempts and answers with bulk inserts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--teachers', type=int, default=10)
+        parser.add_argument('--students', type=int, default=500)
+        parser.add_argument('--quizzes-per-teacher', type=int, default=10)
+        parser.add_argument('--questions', type=int, default=20, help='Questions per quiz')
+        parser.add_argument('--options', type=int, default=4, help='Options per question')
+        parser.add_argument('--attempts-per-student', type=int, default=10,
+                            help='Distinct quizzes each student has attempted (capped at the number of quizzes)')
+        parser.add_argument('--completion-rate', type=float, default=0.95,
+                            help='Share of attempts that are completed; the rest are left in progress')
+        parser.add_argument('--correct-rate', type=float, default=0.7, help='Chance that an answer is correct')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--prefix', default='bench', help='Username prefix of the seeded users')
+        parser.add_argument('--password', default='benchmark-pass', help='Password of every seeded user')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed, for reproducible datasets')
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.batch_size = options['batch_size']
+        self.random = random.Random(options['seed'])
+        self.now = timezone.now()
+        prefix = options['prefix']
+        if User.objects.filter(username__startswith=f'{prefix}_').exists():
+            raise CommandError(f'Users named {prefix}_* already exist; pick another --prefix')
+
+        started = time.perf_counter()
+        self.counts = {}
+        teacher_ids = self.seed_users('teacher', options['teachers'])
+        student_user_ids = self.seed_users('student', options['students'])
+        quizzes = self.seed_quizzes(teacher_ids)
+        self.seed_attempts(student_user_ids, quizzes)
+        bump(SCOPE_CATALOGUE, CATALOGUE_ID)
+
+        seconds = time.perf_counter() - started
+        summary = ', '.join(f'{count} {name}' for name, count in self.counts.items())
+        self.stdout.write(self.style.SUCCESS(f'Seeded {summary} in {seconds:.1f}s (prefix {prefix!r})'))
+
+    def insert(self, model, objects):
+        with transaction.atomic():
+            model.objects.bulk_create(objects, batch_size=self.batch_size)
+        key = model._meta.verbose_name_plural
+        self.counts[key] = self.counts.get(key, 0) + len(objects)
+
+    def seed_users(self, role, count):
+        """Create users with their profile rows; returns Teacher ids or student User ids."""
+        prefix, letter = self.options['prefix'], role[0]
+        # Hashing is deliberately slow, so every seeded user shares one hash
+        password = make_password(self.options['password'])
+        usernames = [f'{prefix}_{letter}{n}' for n in range(1, count + 1)]
+        for chunk in chunked(usernames, self.batch_size):
+            self.insert(User, [
+                User(username=username, password=password, first_name=role.title(), last_name=username.rsplit('_', 1)[1],
+                     email=f'{username}@example.com', date_joined=self.now)
+                for username in chunk
+            ])
+        # The prefix is known to be unused, so this matches exactly the new users
+        user_ids = list(User.objects.filter(username__startswith=f'{prefix}_{letter}').order_by('id').values_list('id', flat=True))
+
+        for chunk in chunked(user_ids, self.batch_size):
+            self.insert(UserProfile, [UserProfile(user_id=user_id, role=role) for user_id in chunk])
+            if role == 'teacher':
+                self.insert(Teacher, [Teacher(user_id=user_id, specialization=self.random.choice(CATEGORIES)) for user_id in chunk])
+            else:
+                self.insert(Student, [Student(user_id=user_id) for user_id in chunk])
+        if role == 'teacher':
+            return list(Teacher.objects.filter(user_id__in=user_ids).values_list('id', flat=True))
+        return user_ids
+
+    def seed_quizzes(self, teacher_ids):
+        """Create quizzes, questions and options; returns {quiz_id: answer key} for the attempts."""
+        per_teacher, question_count = self.options['quizzes_per_teacher'], self.options['questions']
+        option_count = self.options['options']
+        rng = self.random
+        quizzes = {}
+        for teacher_chunk in chunked(teacher_ids, max(1, self.batch_size // max(per_teacher, 1))):
+            new_quizzes, marks_by_title = [], {}
+            for teacher_id in teacher_chunk:
+                for n in range(per_teacher):
+                    category = rng.choice(CATEGORIES)
+                    title = f'{category} quiz {n + 1}'
+                    marks = [rng.randint(1, 3) for _ in range(question_count)]
+                    marks_by_title[(teacher_id, title)] = marks
+                    new_quizzes.append(Quiz(
+                        created_by_id=teacher_id, title=title, category=category,
+                        description=f'Synthetic {category.lower()} quiz', difficulty=rng.choice(DIFFICULTIES),
+                        time_limit=rng.choice([10, 20, 30, 45, 60]), total_marks=max(sum(marks), 1),
+                        passing_marks=int(sum(marks) * 0.6), status='active',
+                        created_at=self.now - timedelta(days=rng.randint(0, 180)),
+                    ))
+            self.insert(Quiz, new_quizzes)
+            quiz_rows = Quiz.objects.filter(created_by_id__in=teacher_chunk).values_list('id', 'created_by_id', 'title')
+            chunk_marks = {quiz_id: marks_by_title[(teacher_id, title)] for quiz_id, teacher_id, title in quiz_rows}
+            self.seed_questions(chunk_marks, option_count, quizzes)
+        return quizzes
+
+    def seed_questions(self, marks_by_quiz, option_count, quizzes):
+        rng = self.random
+        quiz_ids = list(marks_by_quiz)
+        for quiz_chunk in chunked(quiz_ids, max(1, self.batch_size // max(self.options['questions'], 1))):
+            self.insert(Question, [
+                Question(quiz_id=quiz_id, question_text=f'Question {order + 1} of quiz {quiz_id}?', marks=mark, order=order,
+                         explanation='Synthetic question')
+                for quiz_id in quiz_chunk
+                for order, mark in enumerate(marks_by_quiz[quiz_id])
+            ])
+            questions = list(Question.objects.filter(quiz_id__in=quiz_chunk).order_by('order').values_list('id', 'quiz_id', 'marks'))
+            correct = {question_id: rng.randrange(option_count) for question_id, _, _ in questions}
+            for question_chunk in chunked(questions, max(1, self.batch_size // max(option_count, 1))):
+                self.insert(Option, [
+                    Option(question_id=question_id, option_text=f'Option {n + 1}', is_correct=(n == correct[question_id]), order=n)
+                    for question_id, _, _ in question_chunk
+                    for n in range(option_count)
+                ])
+            options_by_question = {}
+            option_rows = Option.objects.filter(question__quiz_id__in=quiz_chunk).order_by('order').values_list('question_id', 'id', 'is_correct')
+            for question_id, option_id, is_correct in option_rows:
+                options_by_question.setdefault(question_id, []).append((option_id, is_correct))
+            for question_id, quiz_id, marks in questions:
+                quizzes.setdefault(quiz_id, []).append((question_id, marks, options_by_question.get(question_id, [])))
+
+    def seed_attempts(self, student_user_ids, quizzes):
+        rng = self.random
+        quiz_ids = [quiz_id for quiz_id, key in quizzes.items() if key]
+        if not quiz_ids:
+            return
+        per_student = min(self.options['attempts_per_student'], len(quiz_ids))
+        completion_rate, correct_rate = self.options['completion_rate'], self.options['correct_rate']
+        passing = {quiz_id: int(sum(marks for _, marks, _ in quizzes[quiz_id]) * 0.6) for quiz_id in quiz_ids}
+        students_per_batch = max(1, self.batch_size // max(per_student, 1))
+
+        for student_chunk in chunked(student_user_ids, students_per_batch):
+            attempts, answers_by_pair = [], {}
+            for student_id in student_chunk:
+                for quiz_id in rng.sample(quiz_ids, per_student):
+                    start_time = self.now - timedelta(days=rng.randint(0, 90), seconds=rng.randint(0, 86400))
+                    if rng.random() >= completion_rate:
+                        attempts.append(QuizAttempt(student_id=student_id, quiz_id=quiz_id, start_time=start_time, status='in_progress'))
+                        continue
+                    answers, score, max_score, correct_count = [], 0, 0, 0
+                    for question_id, marks, options in quizzes[quiz_id]:
+                        is_correct = rng.random() < correct_rate
+                        choices = [option for option in options if option[1] == is_correct] or options
+                        option_id, is_correct = rng.choice(choices)
+                        answers.append((question_id, option_id, is_correct))
+                        max_score += marks
+                        if is_correct:
+                            score += marks
+                            correct_count += 1
+                    time_spent = rng.randint(60, 1800)
+                    attempts.append(QuizAttempt(
+                        student_id=student_id, quiz_id=quiz_id, start_time=start_time,
+                        end_time=start_time + timedelta(seconds=time_spent), time_spent=time_spent,
+                        score=score, max_score=max_score, total_marks=max_score,
+                        percentage=(score / max_score * 100) if max_score else 0, passed=score >= passing[quiz_id],
+                        correct_answers=correct_count, incorrect_answers=len(answers) - correct_count, status='completed',
+                    ))
+                    answers_by_pair[(student_id, quiz_id)] = answers
+            self.insert(QuizAttempt, attempts)
+
+            attempt_ids = QuizAttempt.objects.filter(student_id__in=student_chunk, status='completed').values_list('id', 'student_id', 'quiz_id')
+            answers = [
+                StudentAnswer(attempt_id=attempt_id, question_id=question_id, selected_option_id=option_id, is_correct=is_correct,
+                              time_taken=rng.randint(5, 90))
+                for attempt_id, student_id, quiz_id in attempt_ids
+                for question_id, option_id, is_correct in answers_by_pair.get((student_id, quiz_id), ())
+            ]
+            for answer_chunk in chunked(answers, self.batch_size):
+                self.insert(StudentAnswer, answer_chunk)
@@ -0,0 +1,31 @@
+"""
+Close in-progress attempts whose time limit has run out.
+
+Attempts with saved answers are graded and completed; attempts without any
+are marked abandoned. Meant to run from cron every few minutes:
+
+    python manage.py sweep_expired_attempts
+"""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from quiz.grading import sweep_expired_attempts
+
+
+class Command(BaseCommand):
+    help = 'Finalize or abandon in-progress quiz attempts that are past their time limit'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int,
+            default=settings.QUIZ_SETTINGS.get('SWEEP_BATCH_SIZE', 500),
+            help='Attempts loaded per batch',
+        )
+        parser.add_argument('--limit', type=int, default=None, help='Stop after closing this many attempts')
+
+    def handle(self, *args, **options):
+        stats = sweep_expired_attempts(batch_size=options['batch_size'], limit=options['limit'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Scanned {stats['scanned']} attempts: {stats['completed']} completed, {stats['abandoned']} abandoned"
+        ))
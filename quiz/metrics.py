@@ -0,0 +1,402 @@
+"""
+Process metrics in the Prometheus text exposition format
+
+Each worker keeps its counters and histograms in memory; a daemon thread
+writes them to the worker's own file under METRICS['DIRECTORY'] every
+FLUSH_SECONDS, and /metrics writes the serving worker's file before merging
+the files of every worker on the host. Recording a value costs a dict
+update and never any I/O on the request path. Worker files are named after
+the pid and the time the worker started counting, so a recycled pid never
+overwrites an earlier worker's totals. When /metrics finds the file of a
+worker that has exited, it folds the counters and histograms into
+aggregate.json and removes the file, so counters keep counting without the
+directory growing; the dead worker's gauges are dropped. Liveness is told
+from the pid, so the directory must not be shared between hosts or
+containers.
+
+Gauges (current values such as requests in flight) come from functions
+registered with @gauge_source, read each time the worker writes its file;
+/metrics sums them over the workers.
+
+Cache hit/miss counts are already shared through the cache (quiz.caching)
+and are exported from there.
+"""
+
+import atexit
+import json
+import math
+import os
+import re
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:
+    # No flock (Windows): dead workers' files are left in place and still summed
+    fcntl = None
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+AI_BUCKETS = (0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 30.0, 60.0)
+
+# name -> (type, help, histogram buckets)
+METRICS = {
+    'quizmaster_http_requests_total': ('counter', 'HTTP responses by view, method and status', None),
+    'quizmaster_http_request_duration_seconds': ('histogram', 'Time spent handling a request, by view', LATENCY_BUCKETS),
+    'quizmaster_db_queries_total': ('counter', 'Database queries run while handling requests, by view', None),
+    'quizmaster_db_duration_seconds': ('histogram', 'Database time per request, by view', LATENCY_BUCKETS),
+    'quizmaster_ai_requests_total': ('counter', 'Gemini question-generation calls by outcome', None),
+    'quizmaster_ai_request_duration_seconds': ('histogram', 'Gemini question-generation call latency', AI_BUCKETS),
+    'quizmaster_submissions_graded_total': ('counter', 'Attempts graded and completed, by pass/fail', None),
+    'quizmaster_admission_rejected_total': ('counter', 'Requests turned away by admission control, by route class', None),
+    'quizmaster_admission_in_flight': ('gauge', 'Requests in flight by admission route class', None),
+    'quizmaster_admission_limit': ('gauge', 'Admission control concurrency limit by route class, summed over workers', None),
+    'quizmaster_admission_pressure': ('gauge', 'Requests of every class in flight and the threshold above which low classes are shed', None),
+}
+CACHE_METRIC = 'quizmaster_cache_requests_total'
+
+DEFAULT_METRICS = {
+    'ENABLED': True,
+    'DIRECTORY': os.path.join(tempfile.gettempdir(), 'quizmaster-metrics'),
+    'FLUSH_SECONDS': 5,
+    # /metrics requires "Authorization: Bearer <TOKEN>"; without a token it
+    # is only served with DEBUG on
+    'TOKEN': '',
+}
+
+# worker-<pid>-<start ms>.json; <pid>.json from before start times were added
+WORKER_FILE = re.compile(r'^(?:worker-)?(\d+)(?:-(\d+))?\.json$')
+AGGREGATE_FILE = 'aggregate.json'
+AGGREGATE_LOCK = 'aggregate.lock'
+
+
+GAUGE_SOURCES = []
+
+
+def metrics_settings():
+    return {**DEFAULT_METRICS, **getattr(settings, 'METRICS', {})}
+
+
+def gauge_source(func):
+    """Register ``func`` returning [(name, labels, value), ...] for the gauges it owns."""
+    GAUGE_SOURCES.append(func)
+    return func
+
+
+def _read_gauges():
+    gauges = []
+    for source in GAUGE_SOURCES:
+        try:
+            gauges.extend([name, list(_label_key(labels)), value] for name, labels, value in source())
+        except Exception:
+            # Metrics must never break a request
+            pass
+    return gauges
+
+
+class QueryTimer:
+    """Database execute wrapper that only counts and times statements."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - started
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items())) if labels else ()
+
+
+class MetricsRegistry:
+    """Per-process counters and histograms, periodically written to this worker's file."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+        self._pid = os.getpid()
+        self._started_ms = int(time.time() * 1000)
+        # Threads do not survive a fork, so each worker starts its own
+        self._flusher_pid = None
+
+    def _check_fork(self):
+        """Start afresh in a forked worker, so the parent's counts are not summed twice."""
+        if os.getpid() != self._pid:
+            with self._lock:
+                if os.getpid() != self._pid:
+                    self._counters, self._histograms = {}, {}
+                    self._pid, self._started_ms = os.getpid(), int(time.time() * 1000)
+
+    @property
+    def file_name(self):
+        return f'worker-{self._pid}-{self._started_ms}.json'
+
+    def inc(self, name, labels=None, amount=1):
+        self._check_fork()
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+        self._start_flusher()
+
+    def observe(self, name, value, labels=None):
+        self._check_fork()
+        buckets = METRICS[name][2]
+        key = (name, _label_key(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = {'buckets': [0] * len(buckets), 'sum': 0.0, 'count': 0}
+            for index, bound in enumerate(buckets):
+                if value <= bound:
+                    histogram['buckets'][index] += 1
+                    break
+            histogram['sum'] += value
+            histogram['count'] += 1
+        self._start_flusher()
+
+    def _start_flusher(self):
+        if self._flusher_pid != self._pid:
+            with self._lock:
+                if self._flusher_pid == self._pid:
+                    return
+                self._flusher_pid = self._pid
+            threading.Thread(target=self._flush_loop, name='metrics-flush', daemon=True).start()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(metrics_settings()['FLUSH_SECONDS'])
+            try:
+                self.flush()
+            except Exception:
+                # Keep flushing; a bad gauge source or a full disk is retried next time
+                pass
+
+    def _state(self):
+        gauges = _read_gauges()
+        with self._lock:
+            return {
+                'counters': [[name, list(labels), value] for (name, labels), value in self._counters.items()],
+                'histograms': [[name, list(labels), dict(h, buckets=list(h['buckets']))] for (name, labels), h in self._histograms.items()],
+                'gauges': gauges,
+            }
+
+    def flush(self):
+        """Write this worker's totals to its file (atomically)."""
+        config = metrics_settings()
+        if not config['ENABLED']:
+            return
+        self._check_fork()
+        state = self._state()
+        try:
+            _write_json(config['DIRECTORY'], self.file_name, state)
+        except OSError:
+            # Metrics must never break a request
+            pass
+
+    def collect(self):
+        """Totals across the aggregate and every live worker file in the metrics directory."""
+        self.flush()
+        directory = metrics_settings()['DIRECTORY']
+        try:
+            fold_dead_workers(directory)
+        except OSError:
+            pass
+        counters, histograms, gauges = {}, {}, {}
+        # Shared lock: a fold between reading the aggregate and a worker file
+        # would drop that worker's counts from this scrape
+        with _aggregate_lock(directory, exclusive=False):
+            states = [_read_json(directory, file_name) for file_name in [AGGREGATE_FILE] + worker_files(directory)]
+        for state in states:
+            if state is None:
+                continue
+            _merge_state(counters, histograms, state)
+            for name, labels, value in state.get('gauges', []):
+                key = (name, tuple(map(tuple, labels)))
+                gauges[key] = gauges.get(key, 0) + value
+        return counters, histograms, gauges
+
+
+def _write_json(directory, file_name, state):
+    """Replace ``file_name`` atomically."""
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    with os.fdopen(fd, 'w') as f:
+        json.dump(state, f)
+    os.replace(temp_path, os.path.join(directory, file_name))
+
+
+def _read_json(directory, file_name):
+    try:
+        with open(os.path.join(directory, file_name)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _merge_state(counters, histograms, state):
+    """Add the counters and histograms of a saved state to the two dicts."""
+    for name, labels, value in state.get('counters', []):
+        key = (name, tuple(map(tuple, labels)))
+        counters[key] = counters.get(key, 0) + value
+    for name, labels, histogram in state.get('histograms', []):
+        key = (name, tuple(map(tuple, labels)))
+        merged = histograms.setdefault(key, {'buckets': [0] * len(histogram['buckets']), 'sum': 0.0, 'count': 0})
+        merged['buckets'] = [a + b for a, b in zip(merged['buckets'], histogram['buckets'])]
+        merged['sum'] += histogram['sum']
+        merged['count'] += histogram['count']
+
+
+def worker_files(directory):
+    try:
+        return sorted(name for name in os.listdir(directory) if WORKER_FILE.match(name))
+    except OSError:
+        return []
+
+
+@contextmanager
+def _aggregate_lock(directory, exclusive):
+    if fcntl is None or not os.path.isdir(directory):
+        yield
+        return
+    with open(os.path.join(directory, AGGREGATE_LOCK), 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        yield
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Someone else's process: alive
+        return True
+    return True
+
+
+def dead_worker_files(directory):
+    """Files of workers that have exited: a gone pid, or an older file of a reused pid."""
+    newest = {}
+    for name in worker_files(directory):
+        pid, started = WORKER_FILE.match(name).groups()
+        pid, started = int(pid), int(started or 0)
+        newest[pid] = max(newest.get(pid, 0), started)
+    dead = []
+    for name in worker_files(directory):
+        pid, started = WORKER_FILE.match(name).groups()
+        pid, started = int(pid), int(started or 0)
+        if name == registry.file_name:
+            continue
+        if not _pid_alive(pid) or started < newest[pid]:
+            dead.append(name)
+    return dead
+
+
+def fold_dead_workers(directory):
+    """
+    Add the counters and histograms of exited workers to aggregate.json and
+    remove their files. Runs under a file lock; the aggregate lists the files
+    it already holds, so a fold cut short between the two steps is not
+    counted twice.
+    """
+    if fcntl is None or not dead_worker_files(directory):
+        return
+    with _aggregate_lock(directory, exclusive=True):
+        aggregate = _read_json(directory, AGGREGATE_FILE) or {}
+        counters, histograms = {}, {}
+        _merge_state(counters, histograms, aggregate)
+        folded = set(aggregate.get('folded', []))
+        for name in dead_worker_files(directory):
+            if name in folded:
+                continue
+            state = _read_json(directory, name)
+            if state is not None:
+                _merge_state(counters, histograms, state)
+            folded.add(name)
+        existing = set(worker_files(directory))
+        _write_json(directory, AGGREGATE_FILE, {
+            'counters': [[name, list(labels), value] for (name, labels), value in counters.items()],
+            'histograms': [[name, list(labels), histogram] for (name, labels), histogram in histograms.items()],
+            # Only names still on disk can come up again
+            'folded': sorted(folded & existing),
+        })
+        for name in folded & existing:
+            try:
+                os.remove(os.path.join(directory, name))
+            except FileNotFoundError:
+                pass
+
+
+registry = MetricsRegistry()
+atexit.register(registry.flush)
+
+
+def inc(name, labels=None, amount=1):
+    if metrics_settings()['ENABLED']:
+        registry.inc(name, labels, amount)
+
+
+def observe(name, value, labels=None):
+    if metrics_settings()['ENABLED']:
+        registry.observe(name, value, labels)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in pairs) + '}'
+
+
+def _format_value(value):
+    if isinstance(value, float) and math.isinf(value):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render(cache_report=None):
+    """Text exposition of every metric, plus the shared cache hit/miss counters."""
+    counters, histograms, gauges = registry.collect()
+    lines = []
+    for name, (metric_type, help_text, buckets) in METRICS.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {metric_type}')
+        if metric_type in ('counter', 'gauge'):
+            values = counters if metric_type == 'counter' else gauges
+            for (metric, labels), value in sorted(values.items()):
+                if metric == name:
+                    lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+            continue
+        for (metric, labels), histogram in sorted(histograms.items()):
+            if metric != name:
+                continue
+            cumulative = 0
+            for bound, count in zip(buckets, histogram['buckets']):
+                cumulative += count
+                lines.append(f'{name}_bucket{_format_labels(labels, [("le", bound)])} {cumulative}')
+            lines.append(f'{name}_bucket{_format_labels(labels, [("le", "+Inf")])} {histogram["count"]}')
+            lines.append(f'{name}_sum{_format_labels(labels)} {_format_value(histogram["sum"])}')
+            lines.append(f'{name}_count{_format_labels(labels)} {histogram["count"]}')
+
+    if cache_report:
+        lines.append(f'# HELP {CACHE_METRIC} Shared cache lookups by kind and result')
+        lines.append(f'# TYPE {CACHE_METRIC} counter')
+        for kind, stats in sorted(cache_report.items()):
+            for result, field in (('hit', 'hits'), ('miss', 'misses')):
+                lines.append(f'{CACHE_METRIC}{_format_labels([("kind", kind), ("result", result)])} {stats[field]}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,383 @@
+"""
+Middleware for the quiz app
+
+AdmissionControlMiddleware caps the number of in-flight requests per route
+class so that an exam-start surge on take_quiz/submit_quiz cannot starve
+the rest of the site. Excess exam requests get a lightweight waiting-room
+response with a server-provided retry time; under overall pressure the
+low-priority classes (dashboards, then AI generation) are shed first.
+
+Counters are per worker process: every gunicorn worker enforces its own
+share of the limits, which is what protects that worker's threads. /metrics
+exports the in-flight counts and limits as gauges summed over the workers.
+
+RoleMiddleware attaches the user's session-cached role and profile ids.
+
+QueryInstrumentationMiddleware samples per-request query counts and checks
+them against the views' query budgets (see quiz/query_budget.py).
+
+MetricsMiddleware records request counts, latency and DB time per view for
+/metrics (see quiz/metrics.py).
+
+RequestIdMiddleware gives every request an id, attached to its log
+records (see quiz/structured_logging.py) and returned in X-Request-ID.
+
+ProfilingMiddleware runs staff-requested or sampled requests under cProfile
+and a stack sampler (see quiz/profiling.py).
+"""
+
+import cProfile
+import itertools
+import logging
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import HttpResponse, JsonResponse
+
+from . import metrics
+from .profiling import SqlTimeline, StackSampler, profiling_config, save_profile
+from .query_budget import (
+    QueryBudgetExceeded, QueryRecorder, budget_message, budget_violations, instrumentation_config, view_query_stats,
+)
+from .roles import ANONYMOUS_ROLE, attach_role, role_for_request
+from .structured_logging import request_id_var
+
+logger = logging.getLogger('quiz')
+
+# url_name -> route class
+ROUTE_CLASSES = {
+    'take_quiz': 'delivery',
+    'submit_quiz': 'submission',
+    'teacher_dashboard': 'dashboard',
+    'student_dashboard': 'dashboard',
+    'view_quiz_results': 'dashboard',
+    'manage_quizzes': 'dashboard',
+    'batch': 'dashboard',
+    'generate_questions': 'ai',
+}
+
+DEFAULT_ADMISSION_CONTROL = {
+    'ENABLED': True,
+    # Maximum concurrent requests per class in one worker
+    'LIMITS': {'delivery': 24, 'submission': 32, 'dashboard': 8, 'ai': 2},
+    # Once this many requests of any class are in flight, shed the classes below
+    'PRESSURE_THRESHOLD': 32,
+    'SHED_UNDER_PRESSURE': ['dashboard', 'ai'],
+    # Base retry delay in seconds; scaled up with the overflow and jittered
+    'RETRY_AFTER': 3,
+    'MAX_RETRY_AFTER': 30,
+}
+
+WAITING_ROOM_HTML = """<!DOCTYPE html>
+<html lang="en"><head><meta charset="utf-8"><meta http-equiv="refresh" content="{retry}">
+<title>Please wait - QUIZMASTER</title>
+<style>body{{font-family:system-ui,sans-serif;display:flex;align-items:center;justify-content:center;height:100vh;margin:0;background:#0f172a;color:#e2e8f0;text-align:center}}</style>
+</head><body><div><h1>Almost there&hellip;</h1>
+<p>Lots of students are starting right now. This page will retry automatically in {retry} seconds.</p>
+<p>Your quiz timer has not started yet.</p></div></body></html>"""
+
+
+class AdmissionController:
+    """Thread-safe in-flight counters for each route class."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._in_flight = {}
+        self._rejected = {}
+        self._admitted = {}
+
+    def try_acquire(self, route_class, config):
+        limits = config['LIMITS']
+        with self._lock:
+            current = self._in_flight.get(route_class, 0)
+            total = sum(self._in_flight.values())
+            over_limit = current >= limits.get(route_class, float('inf'))
+            shed = route_class in config['SHED_UNDER_PRESSURE'] and total >= config['PRESSURE_THRESHOLD']
+            if over_limit or shed:
+                self._rejected[route_class] = self._rejected.get(route_class, 0) + 1
+                return False, current - limits.get(route_class, current) + 1
+            self._in_flight[route_class] = current + 1
+            self._admitted[route_class] = self._admitted.get(route_class, 0) + 1
+            return True, 0
+
+    def release(self, route_class):
+        with self._lock:
+            self._in_flight[route_class] = max(self._in_flight.get(route_class, 0) - 1, 0)
+
+    def snapshot(self):
+        """Current queue depths and totals, for metrics and health checks."""
+        with self._lock:
+            classes = set(self._in_flight) | set(self._rejected) | set(ROUTE_CLASSES.values())
+            return {
+                route_class: {
+                    'in_flight': self._in_flight.get(route_class, 0),
+                    'admitted': self._admitted.get(route_class, 0),
+                    'rejected': self._rejected.get(route_class, 0),
+                }
+                for route_class in sorted(classes)
+            }
+
+
+admission_controller = AdmissionController()
+
+
+def admission_config():
+    config = dict(DEFAULT_ADMISSION_CONTROL)
+    config.update(getattr(settings, 'ADMISSION_CONTROL', {}))
+    return config
+
+
+@metrics.gauge_source
+def admission_gauges():
+    """This worker's in-flight counts and limits per route class, for /metrics."""
+    config = admission_config()
+    if not config['ENABLED']:
+        return []
+    snapshot = admission_controller.snapshot()
+    gauges = []
+    for route_class, counts in snapshot.items():
+        gauges.append(('quizmaster_admission_in_flight', {'route_class': route_class}, counts['in_flight']))
+        if route_class in config['LIMITS']:
+            gauges.append(('quizmaster_admission_limit', {'route_class': route_class}, config['LIMITS'][route_class]))
+    gauges.append(('quizmaster_admission_pressure', {'kind': 'in_flight'}, sum(counts['in_flight'] for counts in snapshot.values())))
+    gauges.append(('quizmaster_admission_pressure', {'kind': 'threshold'}, config['PRESSURE_THRESHOLD']))
+    return gauges
+
+
+def retry_after_seconds(overflow, config):
+    """Spread retries out so a rejected wave does not come back all at once."""
+    base = config['RETRY_AFTER'] * (1 + max(overflow, 0) / 8)
+    return int(min(base + random.uniform(0, base), config['MAX_RETRY_AFTER'])) or 1
+
+
+class AdmissionControlMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        route_class = getattr(request, '_admission_class', None)
+        if route_class:
+            admission_controller.release(route_class)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        config = admission_config()
+        if not config['ENABLED']:
+            return None
+        route_class = ROUTE_CLASSES.get(request.resolver_match.url_name)
+        if route_class is None:
+            return None
+        admitted, overflow = admission_controller.try_acquire(route_class, config)
+        if admitted:
+            request._admission_class = route_class
+            return None
+        metrics.inc('quizmaster_admission_rejected_total', {'route_class': route_class})
+        return self.waiting_room_response(request, route_class, retry_after_seconds(overflow, config))
+
+    def waiting_room_response(self, request, route_class, retry):
+        if request.method == 'GET' and route_class == 'delivery':
+            response = HttpResponse(WAITING_ROOM_HTML.format(retry=retry), status=503)
+        else:
+            response = JsonResponse({
+                'success': False,
+                'error': 'Server busy, please retry shortly',
+                'retry_after': retry,
+            }, status=503)
+        response['Retry-After'] = str(retry)
+        response['Cache-Control'] = 'no-store'
+        # Shedding is expected under load; don't write an error log line per rejected request
+        response._has_been_logged = True
+        return response
+
+
+class RoleMiddleware:
+    """
+    Attach the session-cached role and profile ids (see quiz.roles) to every
+    request. Must come after AuthenticationMiddleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if request.path.startswith(settings.STATIC_URL):
+            # Keeps the session untouched, so static responses get no Vary: Cookie
+            return self.get_response(request)
+        info = role_for_request(request) if request.user.is_authenticated else ANONYMOUS_ROLE
+        attach_role(request, info)
+        return self.get_response(request)
+
+
+class QueryInstrumentationMiddleware:
+    """
+    Count the queries of a sample of requests (all of them when
+    SAMPLE_RATE is 1) and enforce the view's @query_budget. Put it near
+    the top so session and auth queries count too.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        config = instrumentation_config()
+        if not config['ENABLED'] or random.random() >= config['SAMPLE_RATE']:
+            return self.get_response(request)
+
+        recorder = QueryRecorder()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+
+        stats = recorder.summary()
+        match = getattr(request, 'resolver_match', None)
+        view_name = match.view_name if match else 'unresolved'
+        budget = getattr(request, '_query_budget', None)
+        problems = budget_violations(stats, budget) if budget else []
+        view_query_stats.record(view_name, stats, bool(problems))
+
+        response.query_stats = stats
+        response.query_budget = budget
+        response.query_view_name = view_name
+        if settings.DEBUG:
+            response['X-Query-Count'] = str(stats['queries'])
+            response['X-Query-Time-Ms'] = str(stats['sql_ms'])
+        if problems:
+            message = budget_message(view_name, stats, problems)
+            if config['RAISE_ON_BUDGET']:
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._query_budget = getattr(view_func, 'query_budget', None)
+
+
+class MetricsMiddleware:
+    """Request count, latency and database time per view. Put it first."""
+    methods = {'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'}
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not metrics.metrics_settings()['ENABLED']:
+            return self.get_response(request)
+
+        timer = metrics.QueryTimer()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timer))
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+
+        match = getattr(request, 'resolver_match', None)
+        labels = {'view': match.view_name if match else 'unresolved'}
+        method = request.method if request.method in self.methods else 'other'
+        metrics.inc('quizmaster_http_requests_total', {**labels, 'method': method, 'status': str(response.status_code)})
+        metrics.observe('quizmaster_http_request_duration_seconds', elapsed, labels)
+        if timer.count:
+            metrics.inc('quizmaster_db_queries_total', labels, timer.count)
+        metrics.observe('quizmaster_db_duration_seconds', timer.seconds, labels)
+        return response
+
+
+class ProfilingMiddleware:
+    """
+    Profile a request when a staff user asks for it with the profiling
+    header or query flag, or every SAMPLE_EVERY-th request. Must come after
+    AuthenticationMiddleware. Not loaded at all unless PROFILING['ENABLED'].
+    """
+
+    def __init__(self, get_response):
+        config = profiling_config()
+        if not config['ENABLED']:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.header = config['HEADER']
+        self.query_param = config['QUERY_PARAM']
+        self.sample_every = config['SAMPLE_EVERY']
+        self.sample_interval = config['SAMPLE_INTERVAL']
+        self.requests = itertools.count(1)
+
+    def trigger(self, request):
+        if request.headers.get(self.header) or self.query_param in request.GET:
+            if request.user.is_staff:
+                return 'staff'
+        if self.sample_every and next(self.requests) % self.sample_every == 0:
+            return 'sample'
+        return None
+
+    def __call__(self, request):
+        trigger = self.trigger(request)
+        if trigger is None:
+            return self.get_response(request)
+
+        timeline = SqlTimeline()
+        profiler = cProfile.Profile()
+        sampler = StackSampler(self.sample_interval, stop_frame=sys._getframe())
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timeline))
+            sampler.start()
+            profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.disable()
+                sampler.stop()
+        elapsed = time.perf_counter() - timeline.started
+
+        match = getattr(request, 'resolver_match', None)
+        details = {
+            'path': request.path,
+            'method': request.method,
+            'view': match.view_name if match else 'unresolved',
+            'user': request.user.get_username() if request.user.is_authenticated else None,
+            'status': response.status_code,
+            'trigger': trigger,
+            'duration_ms': round(elapsed * 1000, 3),
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        }
+        try:
+            profile_id = save_profile(profiler, sampler, details, timeline)
+        except OSError:
+            logger.exception('Could not save the profile of %s', request.path)
+        else:
+            if trigger == 'staff':
+                response['X-Profile-Id'] = profile_id
+        return response
+
+
+class RequestIdMiddleware:
+    """
+    Tag the request's log records with an id: the X-Request-ID sent by the
+    proxy when it looks like one, else a new one. Put it first.
+    """
+    valid_id = re.compile(r'^[\w.:-]{1,64}$')
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request_id = request.headers.get('X-Request-ID', '')
+        if not self.valid_id.match(request_id):
+            request_id = uuid.uuid4().hex
+        request.request_id = request_id
+        token = request_id_var.set(request_id)
+        try:
+            response = self.get_response(request)
+        finally:
+            request_id_var.reset(token)
+        response['X-Request-ID'] = request_id
+        return response
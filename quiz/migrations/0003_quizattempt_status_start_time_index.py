@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:06
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0002_quizattempt_max_score_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='quizattempt',
+            index=models.Index(fields=['status', 'start_time'], name='quiz_quizat_status_4999a2_idx'),
+        ),
+    ]
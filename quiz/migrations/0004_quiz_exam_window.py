@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0003_quizattempt_status_start_time_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quiz',
+            name='closes_at',
+            field=models.DateTimeField(blank=True, help_text='Students cannot start after this time', null=True),
+        ),
+        migrations.AddField(
+            model_name='quiz',
+            name='opens_at',
+            field=models.DateTimeField(blank=True, db_index=True, help_text='Students cannot start before this time', null=True),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:12
+
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0004_quiz_exam_window'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model_name', models.CharField(choices=[('quiz', 'Quiz'), ('question', 'Question'), ('attempt', 'Quiz Attempt')], max_length=20)),
+                ('object_id', models.BigIntegerField()),
+                ('quiz_id', models.BigIntegerField(blank=True, null=True)),
+                ('owner_id', models.BigIntegerField(blank=True, help_text='Teacher user id for quizzes/questions, student user id for attempts', null=True)),
+                ('deleted_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'Tombstone',
+                'verbose_name_plural': 'Tombstones',
+                'ordering': ['id'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(fields=['updated_at', 'id'], name='quiz_questi_updated_6c5ecc_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='quiz',
+            index=models.Index(fields=['updated_at', 'id'], name='quiz_quiz_updated_a1c884_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='quizattempt',
+            index=models.Index(fields=['updated_at', 'id'], name='quiz_quizat_updated_ba1a25_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tombstone',
+            index=models.Index(fields=['model_name', 'id'], name='quiz_tombst_model_n_eeb3ef_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tombstone',
+            index=models.Index(fields=['deleted_at'], name='quiz_tombst_deleted_b43403_idx'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:45
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0005_sync_tombstones_and_updated_at_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HealthProbe',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('checked_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'Health Probe',
+                'verbose_name_plural': 'Health Probes',
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0006_health_probe'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='studentanswer',
+            index=models.Index(fields=['created_at'], name='quiz_studen_created_042ce5_idx'),
+        ),
+    ]
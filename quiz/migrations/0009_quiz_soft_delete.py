@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0008_background_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quiz',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+    ]
@@ -0,0 +1,91 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:56
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0009_quiz_soft_delete'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedAttempt',
+            fields=[
+                ('id', models.BigIntegerField(help_text="The attempt's original id", primary_key=True, serialize=False)),
+                ('student_id', models.BigIntegerField()),
+                ('quiz_id', models.BigIntegerField()),
+                ('student_username', models.CharField(max_length=150)),
+                ('quiz_title', models.CharField(max_length=200)),
+                ('start_time', models.DateTimeField()),
+                ('end_time', models.DateTimeField(blank=True, null=True)),
+                ('time_spent', models.IntegerField(default=0)),
+                ('score', models.IntegerField(blank=True, null=True)),
+                ('max_score', models.IntegerField(default=0)),
+                ('percentage', models.FloatField(blank=True, null=True)),
+                ('status', models.CharField(choices=[('in_progress', 'In Progress'), ('completed', 'Completed'), ('abandoned', 'Abandoned')], default='completed', max_length=20)),
+                ('correct_answers', models.IntegerField(default=0)),
+                ('incorrect_answers', models.IntegerField(default=0)),
+                ('unanswered', models.IntegerField(default=0)),
+                ('passed', models.BooleanField(blank=True, null=True)),
+                ('ip_address', models.GenericIPAddressField(blank=True, null=True)),
+                ('user_agent', models.CharField(blank=True, max_length=255)),
+                ('created_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'Archived Attempt',
+                'verbose_name_plural': 'Archived Attempts',
+                'ordering': ['-start_time'],
+                'indexes': [models.Index(fields=['student_id', '-start_time'], name='quiz_archiv_student_3434db_idx'), models.Index(fields=['quiz_id', '-start_time'], name='quiz_archiv_quiz_id_770166_idx'), models.Index(fields=['student_id', 'quiz_id'], name='quiz_archiv_student_b905b8_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedAnswer',
+            fields=[
+                ('id', models.BigIntegerField(help_text="The answer's original id", primary_key=True, serialize=False)),
+                ('question_id', models.BigIntegerField()),
+                ('selected_option_id', models.BigIntegerField(blank=True, null=True)),
+                ('selected_option_index', models.IntegerField(default=0)),
+                ('is_correct', models.BooleanField(default=False)),
+                ('is_flagged', models.BooleanField(default=False)),
+                ('time_taken', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField()),
+                ('attempt', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='answers', to='quiz.archivedattempt')),
+            ],
+            options={
+                'verbose_name': 'Archived Answer',
+                'verbose_name_plural': 'Archived Answers',
+            },
+        ),
+        migrations.CreateModel(
+            name='AttemptRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('attempts', models.IntegerField(default=0)),
+                ('passed', models.IntegerField(default=0)),
+                ('failed', models.IntegerField(default=0)),
+                ('scored', models.IntegerField(default=0)),
+                ('score_total', models.BigIntegerField(default=0)),
+                ('best_score', models.IntegerField(blank=True, null=True)),
+                ('worst_score', models.IntegerField(blank=True, null=True)),
+                ('time_spent_total', models.BigIntegerField(default=0)),
+                ('grade_counts', models.JSONField(blank=True, default=dict)),
+                ('first_attempt_at', models.DateTimeField(blank=True, null=True)),
+                ('last_attempt_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('quiz', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attempt_rollups', to='quiz.quiz')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attempt_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Attempt Rollup',
+                'verbose_name_plural': 'Attempt Rollups',
+                'unique_together': {('student', 'quiz')},
+            },
+        ),
+    ]
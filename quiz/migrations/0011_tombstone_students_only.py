@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0010_attempt_archive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tombstone',
+            name='students_only',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AlterField(
+            model_name='tombstone',
+            name='owner_id',
+            field=models.BigIntegerField(blank=True, help_text='Teacher id (not user id) for quizzes/questions, student user id for attempts', null=True),
+        ),
+    ]
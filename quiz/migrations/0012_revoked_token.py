@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:10
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0011_tombstone_students_only'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RevokedToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('jti', models.CharField(blank=True, max_length=32, null=True, unique=True)),
+                ('revoked_before', models.BigIntegerField(blank=True, help_text='Unix time; tokens issued up to then are revoked', null=True)),
+                ('expires_at', models.DateTimeField()),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='revoked_tokens', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Revoked Token',
+                'verbose_name_plural': 'Revoked Tokens',
+                'indexes': [models.Index(fields=['expires_at'], name='quiz_revoke_expires_7c5e3d_idx')],
+            },
+        ),
+    ]
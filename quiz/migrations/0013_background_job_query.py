@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:13
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def fail_unfinished_jobs(apps, schema_editor):
+    # Their id lists are dropped, so they cannot resume; queue them again
+    BackgroundJob = apps.get_model('quiz', 'BackgroundJob')
+    BackgroundJob.objects.filter(status__in=['queued', 'running']).update(
+        status='failed', error='Dropped by migration 0013; queue the job again', finished_at=timezone.now(),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0012_revoked_token'),
+    ]
+
+    operations = [
+        migrations.RunPython(fail_unfinished_jobs, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='backgroundjob',
+            name='object_ids',
+        ),
+        migrations.AddField(
+            model_name='backgroundjob',
+            name='last_pk',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='backgroundjob',
+            name='max_pk',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='backgroundjob',
+            name='query',
+            field=models.BinaryField(default=bytes),
+        ),
+        migrations.AlterField(
+            model_name='backgroundjob',
+            name='total',
+            field=models.PositiveIntegerField(default=0, help_text='Rows selected when the job was queued'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:02
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def fail_unfinished_jobs(apps, schema_editor):
+    # Their pickled queries are dropped, so they cannot resume; queue them again
+    BackgroundJob = apps.get_model('quiz', 'BackgroundJob')
+    BackgroundJob.objects.filter(status__in=['queued', 'running']).update(
+        status='failed', error='Dropped by migration 0014; queue the job again', finished_at=timezone.now(),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0013_background_job_query'),
+    ]
+
+    operations = [
+        migrations.RunPython(fail_unfinished_jobs, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='backgroundjob',
+            name='query',
+        ),
+        migrations.AddField(
+            model_name='backgroundjob',
+            name='model',
+            field=models.CharField(default='', help_text='app_label.Model of the rows', max_length=100),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='backgroundjob',
+            name='filters',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='backgroundjob',
+            name='min_pk',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0014_background_job_filters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tombstone',
+            name='teachers_only',
+            field=models.BooleanField(default=False),
+        ),
+    ]
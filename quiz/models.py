@@ -131,6 +131,13 @@ class Student(models.Model):
         return round(avg, 2) if avg else 0
 
 
+class QuizManager(models.Manager):
+    """Hides soft-deleted quizzes; Quiz.all_objects includes them"""
+    
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+
 class Quiz(models.Model):
     """Quiz model with comprehensive settings"""
     # Creator information
@@ -186,9 +193,19 @@ class Quiz(models.Model):
     shuffle_options = models.BooleanField(default=False, help_text="Randomize option order")
     show_correct_answers = models.BooleanField(default=True, help_text="Show correct answers after completion")
     
+    # Scheduled exam window (both optional)
+    opens_at = models.DateTimeField(null=True, blank=True, db_index=True, help_text="Students cannot start before this time")
+    closes_at = models.DateTimeField(null=True, blank=True, help_text="Students cannot start after this time")
+    
     created_at = models.DateTimeField(default=timezone.now, db_index=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    # Set when a teacher deletes the quiz; its rows are purged in the background (quiz.deletion)
+    deleted_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    
+    objects = QuizManager()
+    all_objects = models.Manager()
+    
     class Meta:
         verbose_name = 'Quiz'
         verbose_name_plural = 'Quizzes'
@@ -196,6 +213,8 @@ class Quiz(models.Model):
         indexes = [
             models.Index(fields=['-created_at', 'status']),
             models.Index(fields=['category', 'difficulty']),
+            # Delta-sync feeds page on (updated_at, id)
+            models.Index(fields=['updated_at', 'id']),
         ]
     
     def __str__(self):
@@ -214,6 +233,28 @@ class Quiz(models.Model):
             self.passing_marks = int(self.total_marks * 0.6)
         super().save(*args, **kwargs)
     
+    def clean(self):
+        if self.opens_at and self.closes_at and self.closes_at <= self.opens_at:
+            raise ValidationError('Closing time must be after opening time')
+    
+    def is_open(self, now=None):
+        """Check whether the quiz window allows starting an attempt"""
+        now = now or timezone.now()
+        if self.opens_at and now < self.opens_at:
+            return False
+        if self.closes_at and now >= self.closes_at:
+            return False
+        return True
+    
+    @staticmethod
+    def open_window_q(now=None, prefix=''):
+        """is_open() as a filter; ``prefix`` reaches the quiz through a relation, e.g. 'quiz__'"""
+        now = now or timezone.now()
+        return (
+            (models.Q(**{f'{prefix}opens_at__isnull': True}) | models.Q(**{f'{prefix}opens_at__lte': now}))
+            & (models.Q(**{f'{prefix}closes_at__isnull': True}) | models.Q(**{f'{prefix}closes_at__gt': now}))
+        )
+    
     @property
     def question_count(self):
         """Get total number of questions"""
@@ -287,6 +328,7 @@ class Question(models.Model):
         ordering = ['order', 'id']
         indexes = [
             models.Index(fields=['quiz', 'order']),
+            models.Index(fields=['updated_at', 'id']),
         ]
     
     def __str__(self):
@@ -339,6 +381,41 @@ class Option(models.Model):
         return f"<Option: {self.id} - {self.question.id}>"
 
 
+class AttemptHistoryManager(models.Manager):
+    """
+    QuizAttempt.history: attempts from the hot table and the archive
+    together, newest first. Archived ones are ArchivedAttempt instances,
+    which have the same display attributes.
+    """
+    
+    def for_student(self, student_id, limit=None):
+        return self._merge(self.filter(student_id=student_id), ArchivedAttempt.objects.filter(student_id=student_id), limit)
+    
+    def for_quiz(self, quiz_id, limit=None):
+        return self._merge(self.filter(quiz_id=quiz_id), ArchivedAttempt.objects.filter(quiz_id=quiz_id), limit)
+    
+    def get_attempt(self, attempt_id, **filters):
+        """The attempt with this id from either table, or None"""
+        attempt = self.filter(id=attempt_id, **filters).select_related('quiz').first()
+        if attempt is None:
+            attempt = ArchivedAttempt.objects.filter(id=attempt_id, **filters).first()
+            if attempt is not None:
+                ArchivedAttempt.load_quizzes([attempt])
+        return attempt
+    
+    def _merge(self, hot, archived, limit):
+        hot = hot.select_related('quiz').order_by('-start_time', '-id')
+        archived = archived.order_by('-start_time', '-id')
+        if limit is not None:
+            hot, archived = hot[:limit], archived[:limit]
+        attempts = list(hot)
+        seen = {attempt.id for attempt in attempts}
+        # An attempt is in both tables only while its archiving batch is half done
+        attempts += ArchivedAttempt.load_quizzes([attempt for attempt in archived if attempt.id not in seen])
+        attempts.sort(key=lambda attempt: (attempt.start_time, attempt.id), reverse=True)
+        return attempts if limit is None else attempts[:limit]
+
+
 class QuizAttempt(models.Model):
     """Quiz attempt tracking with detailed analytics"""
     student = models.ForeignKey(User, on_delete=models.CASCADE, related_name='quiz_attempts')
@@ -382,6 +459,9 @@ class QuizAttempt(models.Model):
     created_at = models.DateTimeField(default=timezone.now)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = models.Manager()
+    history = AttemptHistoryManager()
+    
     class Meta:
         verbose_name = 'Quiz Attempt'
         verbose_name_plural = 'Quiz Attempts'
@@ -389,6 +469,9 @@ class QuizAttempt(models.Model):
         indexes = [
             models.Index(fields=['-start_time', 'status']),
             models.Index(fields=['student', 'quiz']),
+            # Used by the expired-attempt sweeper
+            models.Index(fields=['status', 'start_time']),
+            models.Index(fields=['updated_at', 'id']),
         ]
     
     def __str__(self):
@@ -481,6 +564,8 @@ class StudentAnswer(models.Model):
         unique_together = ['attempt', 'question']
         indexes = [
             models.Index(fields=['attempt', 'question']),
+            # Admin date filter and newest-first browsing
+            models.Index(fields=['created_at']),
         ]
     
     def __str__(self):
@@ -519,3 +604,272 @@ class StudentAnswer(models.Model):
         return cls.objects.filter(
             attempt_id=attempt_id
         ).select_related('question', 'selected_option')
+
+
+class ArchivedAttempt(models.Model):
+    """
+    Completed attempt moved out of QuizAttempt by the archiver
+    (quiz/archive.py). It may live in a separate database, so it keeps
+    plain ids and copies of the names it is listed by instead of foreign keys.
+    """
+    id = models.BigIntegerField(primary_key=True, help_text="The attempt's original id")
+    student_id = models.BigIntegerField()
+    quiz_id = models.BigIntegerField()
+    student_username = models.CharField(max_length=150)
+    quiz_title = models.CharField(max_length=200)
+    
+    start_time = models.DateTimeField()
+    end_time = models.DateTimeField(null=True, blank=True)
+    time_spent = models.IntegerField(default=0)
+    
+    score = models.IntegerField(null=True, blank=True)
+    max_score = models.IntegerField(default=0)
+    percentage = models.FloatField(null=True, blank=True)
+    status = models.CharField(max_length=20, choices=QuizAttempt.STATUS_CHOICES, default='completed')
+    correct_answers = models.IntegerField(default=0)
+    incorrect_answers = models.IntegerField(default=0)
+    unanswered = models.IntegerField(default=0)
+    passed = models.BooleanField(null=True, blank=True)
+    
+    ip_address = models.GenericIPAddressField(null=True, blank=True)
+    user_agent = models.CharField(max_length=255, blank=True)
+    
+    created_at = models.DateTimeField()
+    archived_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        verbose_name = 'Archived Attempt'
+        verbose_name_plural = 'Archived Attempts'
+        ordering = ['-start_time']
+        indexes = [
+            models.Index(fields=['student_id', '-start_time']),
+            models.Index(fields=['quiz_id', '-start_time']),
+            models.Index(fields=['student_id', 'quiz_id']),
+        ]
+    
+    def __str__(self):
+        return f"{self.student_username} - {self.quiz_title} (archived)"
+    
+    @property
+    def quiz(self):
+        """The quiz, from the main database (set in bulk by load_quizzes)"""
+        if not hasattr(self, '_quiz'):
+            self._quiz = Quiz.all_objects.filter(pk=self.quiz_id).first()
+        return self._quiz
+    
+    @classmethod
+    def load_quizzes(cls, attempts):
+        """Fetch the quizzes of ``attempts`` in one query; returns the list"""
+        attempts = list(attempts)
+        quizzes = Quiz.all_objects.in_bulk({attempt.quiz_id for attempt in attempts})
+        for attempt in attempts:
+            attempt._quiz = quizzes.get(attempt.quiz_id)
+        return attempts
+    
+    @property
+    def time_spent_formatted(self):
+        hours, remainder = divmod(self.time_spent, 3600)
+        minutes, seconds = divmod(remainder, 60)
+        return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
+    
+    @property
+    def is_passed(self):
+        return bool(self.passed)
+    
+    def answer_list(self):
+        """
+        Archived answers with their question (options prefetched) and selected
+        option attached, as the result page reads them from StudentAnswer
+        """
+        answers = list(self.answers.all())
+        questions = Question.objects.prefetch_related('option_set').in_bulk({answer.question_id for answer in answers})
+        for answer in answers:
+            answer.question = questions.get(answer.question_id)
+            options = {option.id: option for option in answer.question.option_set.all()} if answer.question else {}
+            answer.selected_option = options.get(answer.selected_option_id)
+        return [answer for answer in answers if answer.question is not None]
+
+
+class ArchivedAnswer(models.Model):
+    """Answer of an archived attempt; stored alongside ArchivedAttempt"""
+    id = models.BigIntegerField(primary_key=True, help_text="The answer's original id")
+    attempt = models.ForeignKey(ArchivedAttempt, on_delete=models.CASCADE, related_name='answers')
+    question_id = models.BigIntegerField()
+    selected_option_id = models.BigIntegerField(null=True, blank=True)
+    selected_option_index = models.IntegerField(default=0)
+    is_correct = models.BooleanField(default=False)
+    is_flagged = models.BooleanField(default=False)
+    time_taken = models.IntegerField(default=0)
+    created_at = models.DateTimeField()
+    
+    class Meta:
+        verbose_name = 'Archived Answer'
+        verbose_name_plural = 'Archived Answers'
+    
+    def __str__(self):
+        return f"Archived answer {self.id} of attempt {self.attempt_id}"
+
+
+class AttemptRollup(models.Model):
+    """
+    Totals of a student's archived attempts at one quiz, kept in the main
+    database so dashboards can add archived history without reading the archive
+    """
+    student = models.ForeignKey(User, on_delete=models.CASCADE, related_name='attempt_rollups')
+    quiz = models.ForeignKey(Quiz, on_delete=models.CASCADE, related_name='attempt_rollups')
+    
+    attempts = models.IntegerField(default=0)
+    passed = models.IntegerField(default=0)
+    failed = models.IntegerField(default=0)
+    # Attempts with a score, and the sum, best and worst of those scores
+    scored = models.IntegerField(default=0)
+    score_total = models.BigIntegerField(default=0)
+    best_score = models.IntegerField(null=True, blank=True)
+    worst_score = models.IntegerField(null=True, blank=True)
+    time_spent_total = models.BigIntegerField(default=0)
+    # Attempts per grade band label (quiz.grading.GRADE_BANDS)
+    grade_counts = models.JSONField(default=dict, blank=True)
+    
+    first_attempt_at = models.DateTimeField(null=True, blank=True)
+    last_attempt_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = 'Attempt Rollup'
+        verbose_name_plural = 'Attempt Rollups'
+        unique_together = ['student', 'quiz']
+    
+    def __str__(self):
+        return f"{self.student_id} / quiz {self.quiz_id}: {self.attempts} archived attempts"
+
+
+class Tombstone(models.Model):
+    """Record of a deleted object so delta-sync clients can drop their copy"""
+    MODEL_CHOICES = [
+        ('quiz', 'Quiz'),
+        ('question', 'Question'),
+        ('attempt', 'Quiz Attempt'),
+    ]
+    model_name = models.CharField(max_length=20, choices=MODEL_CHOICES)
+    object_id = models.BigIntegerField()
+    
+    # Scope, so each client only receives deletions it could have seen
+    quiz_id = models.BigIntegerField(null=True, blank=True)
+    owner_id = models.BigIntegerField(null=True, blank=True, help_text="Teacher id (not user id) for quizzes/questions, student user id for attempts")
+    # The object only left what students can see (the quiz went out of
+    # 'active'); its teacher keeps it
+    students_only = models.BooleanField(default=False)
+    # Students could not see the object when it was deleted (a quiz out of
+    # 'active', a question outside the exam window), so only teachers are told
+    teachers_only = models.BooleanField(default=False)
+    
+    deleted_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        verbose_name = 'Tombstone'
+        verbose_name_plural = 'Tombstones'
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['model_name', 'id']),
+            models.Index(fields=['deleted_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_model_name_display()} #{self.object_id} deleted {self.deleted_at:%Y-%m-%d %H:%M}"
+
+
+class RevokedToken(models.Model):
+    """
+    Revoked API token (jti set) or, with jti empty, every token issued to the
+    user up to revoked_before; see accounts.authentication.RevocationList
+    """
+    jti = models.CharField(max_length=32, null=True, blank=True, unique=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='revoked_tokens')
+    revoked_before = models.BigIntegerField(null=True, blank=True, help_text="Unix time; tokens issued up to then are revoked")
+
+    # Once every token the row covers has expired it can be pruned
+    expires_at = models.DateTimeField()
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name = 'Revoked Token'
+        verbose_name_plural = 'Revoked Tokens'
+        indexes = [
+            models.Index(fields=['expires_at']),
+        ]
+
+    def __str__(self):
+        target = f"token {self.jti}" if self.jti else "all tokens"
+        return f"{target} of user #{self.user_id} until {self.expires_at:%Y-%m-%d %H:%M}"
+
+
+class HealthProbe(models.Model):
+    """Scratch row the readiness probe writes to, to time a database write"""
+    name = models.CharField(max_length=50, unique=True)
+    checked_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        verbose_name = 'Health Probe'
+        verbose_name_plural = 'Health Probes'
+    
+    def __str__(self):
+        return f"{self.name} at {self.checked_at:%Y-%m-%d %H:%M:%S}"
+
+
+class BackgroundJob(models.Model):
+    """Bulk operation over a set of rows, run in chunks by the job runner (quiz/jobs.py)"""
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+        ('cancelled', 'Cancelled'),
+    ]
+    operation = models.CharField(max_length=50, help_text="Registered operation name (quiz.jobs.OPERATIONS)")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    
+    # Filter kwargs selecting the rows of ``model`` to process, walked in
+    # primary key order from min_pk to max_pk; last_pk is the cursor
+    model = models.CharField(max_length=100, help_text="app_label.Model of the rows")
+    filters = models.JSONField(default=dict, blank=True)
+    min_pk = models.BigIntegerField(null=True, blank=True)
+    max_pk = models.BigIntegerField(null=True, blank=True)
+    last_pk = models.BigIntegerField(null=True, blank=True)
+    params = models.JSONField(default=dict, blank=True)
+    total = models.PositiveIntegerField(default=0, help_text="Rows selected when the job was queued")
+    processed = models.PositiveIntegerField(default=0)
+    
+    result = models.JSONField(default=dict, blank=True)
+    error = models.TextField(blank=True)
+    cancel_requested = models.BooleanField(default=False)
+    
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='background_jobs')
+    worker = models.CharField(max_length=100, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        verbose_name = 'Background Job'
+        verbose_name_plural = 'Background Jobs'
+        ordering = ['-created_at']
+        indexes = [
+            # The runner claims the oldest queued job
+            models.Index(fields=['status', 'created_at']),
+        ]
+    
+    def __str__(self):
+        return f"Job #{self.pk} {self.operation} ({self.get_status_display()})"
+    
+    @property
+    def progress(self):
+        """Share of rows processed, in percent"""
+        # Rows that stopped matching before their chunk ran are skipped
+        if self.status == 'completed' or not self.total:
+            return 100.0
+        return min(round(self.processed * 100 / self.total, 1), 100.0)
+    
+    @property
+    def is_finished(self):
+        return self.status in ('completed', 'failed', 'cancelled')
@@ -0,0 +1,99 @@
+"""
+Full-page cache for anonymous visitors
+
+Public pages are rendered once per build and served from the shared cache
+to anonymous GET/HEAD requests, with an ETag and Last-Modified so repeat
+visits and crawlers get a 304 instead of the page. Keys carry
+settings.BUILD_VERSION, so a deploy invalidates every cached page.
+Signed-in users, non-200 responses and responses that set cookies (a CSRF
+token, a message) are never cached.
+"""
+
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+from .caching import record
+
+DEFAULT_PAGE_CACHE = {
+    'ENABLED': True,
+    'TIMEOUT': 60 * 60,
+    # Browsers and proxies revalidate on every visit and get a 304 back
+    'MAX_AGE': 0,
+}
+CACHED_HEADERS = ('Content-Type', 'Content-Language')
+
+
+def page_cache_settings():
+    return {**DEFAULT_PAGE_CACHE, **getattr(settings, 'PAGE_CACHE', {})}
+
+
+def page_cache_key(request):
+    url = hashlib.md5(f'{request.get_host()}{request.get_full_path()}'.encode()).hexdigest()
+    return f'page:{settings.BUILD_VERSION}:{url}'
+
+
+def _cacheable(request, response):
+    return (
+        response.status_code == 200
+        and not response.streaming
+        and not response.cookies
+        and not request.META.get('CSRF_COOKIE_NEEDS_UPDATE')
+        and not response.has_header('Cache-Control')
+    )
+
+
+def _entry_for(response):
+    content = response.content
+    return {
+        'content': content,
+        'headers': {header: response[header] for header in CACHED_HEADERS if response.has_header(header)},
+        'etag': quote_etag(hashlib.md5(content).hexdigest()),
+        'last_modified': int(time.time()),
+    }
+
+
+def _response_for(request, entry):
+    response = HttpResponse(entry['content'])
+    for header, value in entry['headers'].items():
+        response[header] = value
+    response['ETag'] = entry['etag']
+    response['Last-Modified'] = http_date(entry['last_modified'])
+    patch_cache_control(response, public=True, max_age=page_cache_settings()['MAX_AGE'])
+    # Signed-in users get a different page
+    patch_vary_headers(response, ('Cookie',))
+    return get_conditional_response(request, etag=entry['etag'], last_modified=entry['last_modified'], response=response)
+
+
+def anonymous_page_cache(view_func):
+    """Serve a view from the page cache to anonymous GET/HEAD requests."""
+
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        if (
+            request.method not in ('GET', 'HEAD')
+            or request.user.is_authenticated
+            or not page_cache_settings()['ENABLED']
+        ):
+            return view_func(request, *args, **kwargs)
+
+        key = page_cache_key(request)
+        entry = cache.get(key)
+        record('page', entry is not None)
+        if entry is None:
+            response = view_func(request, *args, **kwargs)
+            if hasattr(response, 'render') and callable(response.render):
+                response = response.render()
+            if not _cacheable(request, response):
+                return response
+            entry = _entry_for(response)
+            cache.set(key, entry, page_cache_settings()['TIMEOUT'])
+        return _response_for(request, entry)
+
+    return wrapper
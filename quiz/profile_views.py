@@ -0,0 +1,42 @@
+"""
+Admin pages for the request profiles saved by ProfilingMiddleware
+"""
+
+from django.contrib import admin
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import FileResponse, Http404
+from django.shortcuts import render
+
+from .profiling import list_profiles, load_profile, profile_path, profiling_config
+
+DOWNLOADS = {'prof': '.prof', 'collapsed': '.collapsed', 'json': '.json'}
+
+
+@staff_member_required
+def profile_list(request):
+    return render(request, 'admin/profiles/list.html', {
+        **admin.site.each_context(request),
+        'title': 'Request profiles',
+        'profiles': list_profiles(),
+        'config': profiling_config(),
+    })
+
+
+@staff_member_required
+def profile_detail(request, profile_id):
+    profile = load_profile(profile_id)
+    if profile is None:
+        raise Http404('No such profile')
+    return render(request, 'admin/profiles/detail.html', {
+        **admin.site.each_context(request),
+        'title': f"Profile of {profile['method']} {profile['path']}",
+        'profile': profile,
+    })
+
+
+@staff_member_required
+def profile_download(request, profile_id, kind):
+    path = profile_path(profile_id, DOWNLOADS.get(kind, '')) if kind in DOWNLOADS else None
+    if path is None:
+        raise Http404('No such profile')
+    return FileResponse(open(path, 'rb'), as_attachment=True, filename=f'{profile_id}{DOWNLOADS[kind]}')
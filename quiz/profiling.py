@@ -0,0 +1,193 @@
+"""
+On-demand request profiling
+
+ProfilingMiddleware (quiz/middleware.py) runs selected requests under
+cProfile and a stack sampler and saves, per request, under
+PROFILING['DIRECTORY']:
+
+    <id>.prof       cProfile's pstats dump, for snakeviz / python -m pstats
+    <id>.collapsed  sampled stacks, for flamegraph.pl or speedscope
+    <id>.json       request details and the SQL timeline
+
+A request is profiled when a staff user sends the PROFILING['HEADER']
+header or the PROFILING['QUERY_PARAM'] query flag, or when it is the
+SAMPLE_EVERY-th request of the worker. With ENABLED off the middleware
+removes itself at startup, so it costs nothing. Saved profiles are listed
+on /admin/profiles/.
+
+cProfile only keeps caller/callee pairs, which cannot be turned back into
+stacks through Django's recursive middleware chain, hence the sampler for
+the flamegraph. cProfile slows the request down, so sampled times are
+inflated by roughly the same factor everywhere.
+"""
+
+import io
+import json
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+
+from django.conf import settings
+
+DEFAULT_PROFILING = {
+    'ENABLED': False,
+    # None means <BASE_DIR>/logs/profiles
+    'DIRECTORY': None,
+    'HEADER': 'X-Profile',
+    'QUERY_PARAM': '_profile',
+    # Also profile every Nth request of each worker (0 = never)
+    'SAMPLE_EVERY': 0,
+    # Seconds between flamegraph stack samples
+    'SAMPLE_INTERVAL': 0.001,
+    # Older profiles are deleted beyond this many
+    'KEEP': 200,
+}
+PROFILE_ID = re.compile(r'^[\w-]+$')
+
+
+def profiling_config():
+    config = {**DEFAULT_PROFILING, **getattr(settings, 'PROFILING', {})}
+    if not config['DIRECTORY']:
+        config['DIRECTORY'] = os.path.join(settings.BASE_DIR, 'logs', 'profiles')
+    return config
+
+
+class SqlTimeline:
+    """Database execute wrapper recording when each statement started and how long it took."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({
+                'start_ms': round((started - self.started) * 1000, 3),
+                'duration_ms': round((time.perf_counter() - started) * 1000, 3),
+                'sql': sql,
+            })
+
+
+class StackSampler:
+    """
+    Records the stack of one thread every ``interval`` seconds from a
+    background thread, counting identical stacks. Frames above
+    ``stop_frame`` (the caller of the profiled code) are left out.
+    """
+
+    def __init__(self, interval, stop_frame=None):
+        self.interval = interval
+        self.stop_frame = stop_frame
+        self.thread_id = threading.get_ident()
+        self.counts = Counter()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profile-sampler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None and frame is not self.stop_frame:
+                code = frame.f_code
+                stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})'.replace(';', ':'))
+                frame = frame.f_back
+            if stack:
+                self.counts[';'.join(reversed(stack))] += 1
+
+    def collapsed(self):
+        """Collapsed-stack lines ("a;b;c <samples>") for flamegraph.pl or speedscope."""
+        return [f'{stack} {count}' for stack, count in sorted(self.counts.items())]
+
+
+def save_profile(profiler, sampler, details, timeline):
+    """Write the three files of one profiled request; returns its id."""
+    config = profiling_config()
+    directory = config['DIRECTORY']
+    os.makedirs(directory, exist_ok=True)
+    view = re.sub(r'[^\w-]', '-', details['view'])
+    profile_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{view}-{uuid.uuid4().hex[:8]}"
+    base = os.path.join(directory, profile_id)
+
+    profiler.create_stats()
+    stats = pstats.Stats(profiler)
+    stats.dump_stats(f'{base}.prof')
+    with open(f'{base}.collapsed', 'w') as f:
+        f.write('\n'.join(sampler.collapsed()) + '\n')
+    with open(f'{base}.json', 'w') as f:
+        json.dump({
+            **details,
+            'id': profile_id,
+            'samples': sum(sampler.counts.values()),
+            'queries': len(timeline.queries),
+            'sql_ms': round(sum(query['duration_ms'] for query in timeline.queries), 3),
+            'sql': timeline.queries,
+        }, f, indent=1)
+    prune_profiles(directory, config['KEEP'])
+    return profile_id
+
+
+def prune_profiles(directory, keep):
+    ids = sorted(name[:-5] for name in os.listdir(directory) if name.endswith('.json'))
+    for profile_id in ids[:max(len(ids) - keep, 0)]:
+        for suffix in ('.json', '.prof', '.collapsed'):
+            try:
+                os.remove(os.path.join(directory, profile_id + suffix))
+            except FileNotFoundError:
+                pass
+
+
+def list_profiles():
+    """Details of the saved profiles, newest first (without the SQL timeline)."""
+    directory = profiling_config()['DIRECTORY']
+    try:
+        names = sorted((name for name in os.listdir(directory) if name.endswith('.json')), reverse=True)
+    except FileNotFoundError:
+        return []
+    profiles = []
+    for name in names:
+        try:
+            with open(os.path.join(directory, name)) as f:
+                details = json.load(f)
+        except (OSError, ValueError):
+            continue
+        details.pop('sql', None)
+        profiles.append(details)
+    return profiles
+
+
+def profile_path(profile_id, suffix):
+    """Path of one file of a saved profile, or None for an unknown or malformed id."""
+    if not PROFILE_ID.match(profile_id):
+        return None
+    path = os.path.join(profiling_config()['DIRECTORY'], profile_id + suffix)
+    return path if os.path.isfile(path) else None
+
+
+def load_profile(profile_id, top=40):
+    """Details, SQL timeline and the top functions by cumulative time of one profile."""
+    path = profile_path(profile_id, '.json')
+    if path is None:
+        return None
+    with open(path) as f:
+        details = json.load(f)
+    report = io.StringIO()
+    stats_path = profile_path(profile_id, '.prof')
+    if stats_path:
+        pstats.Stats(stats_path, stream=report).sort_stats('cumulative').print_stats(top)
+    details['top_functions'] = report.getvalue()
+    return details
@@ -0,0 +1,160 @@
+"""
+Per-request query instrumentation and per-view query budgets
+
+QueryInstrumentationMiddleware (quiz/middleware.py) records, for a sample
+of requests, how many queries ran, their total time and how many were the
+same statement run again (the signature of an N+1). Views declare what
+they may spend with @query_budget:
+
+    @query_budget(queries=8, duplicates=0)
+    @teacher_required
+    def manage_quizzes(request):
+        ...
+
+An exceeded budget logs a warning with the most repeated SQL, or raises
+QueryBudgetExceeded when QUERY_INSTRUMENTATION['RAISE_ON_BUDGET'] is set.
+Tests turn both on with enforce_query_budgets() and can check a response
+with assert_within_query_budget().
+"""
+
+import re
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+
+DEFAULT_QUERY_INSTRUMENTATION = {
+    'ENABLED': True,
+    # Share of requests instrumented
+    'SAMPLE_RATE': 0.0,
+    'RAISE_ON_BUDGET': False,
+}
+REPEATED_SQL_IN_MESSAGE = 3
+# Transaction control (session saves wrap their write in a savepoint) is
+# not a query a view chose to run
+TRANSACTION_STATEMENT = re.compile(r'^\s*(BEGIN|COMMIT|ROLLBACK|SAVEPOINT|RELEASE\s+SAVEPOINT)\b', re.IGNORECASE)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def instrumentation_config():
+    return {**DEFAULT_QUERY_INSTRUMENTATION, **getattr(settings, 'QUERY_INSTRUMENTATION', {})}
+
+
+def query_budget(queries, duplicates=None):
+    """Declare the most queries, and repeated statements, a view may run per request."""
+    def decorator(view_func):
+        view_func.query_budget = {'queries': queries, 'duplicates': duplicates}
+        return view_func
+    return decorator
+
+
+class QueryRecorder:
+    """Database execute wrapper that keeps each statement and its duration."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        if TRANSACTION_STATEMENT.match(sql):
+            return execute(sql, params, many, context)
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, time.perf_counter() - started))
+
+    def summary(self):
+        # Statements are compared before parameter binding, so an N+1 shows
+        # up as one statement repeated N times
+        counts = Counter(sql for sql, _ in self.queries)
+        repeated = sorted(((count, sql) for sql, count in counts.items() if count > 1), reverse=True)
+        return {
+            'queries': len(self.queries),
+            'sql_ms': round(sum(seconds for _, seconds in self.queries) * 1000, 2),
+            'duplicates': sum(count - 1 for count, _ in repeated),
+            'repeated': [{'count': count, 'sql': sql} for count, sql in repeated],
+        }
+
+
+def budget_violations(stats, budget):
+    problems = []
+    if stats['queries'] > budget['queries']:
+        problems.append(f"{stats['queries']} queries (budget {budget['queries']})")
+    if budget['duplicates'] is not None and stats['duplicates'] > budget['duplicates']:
+        problems.append(f"{stats['duplicates']} repeated statements (budget {budget['duplicates']})")
+    return problems
+
+
+def budget_message(view_name, stats, problems):
+    repeated = '; '.join(
+        f"{entry['count']}x {entry['sql'][:300]}" for entry in stats['repeated'][:REPEATED_SQL_IN_MESSAGE]
+    )
+    message = f"Query budget exceeded for {view_name}: {', '.join(problems)}"
+    return f'{message}. Most repeated: {repeated}' if repeated else message
+
+
+class ViewQueryStats:
+    """Per-process totals for each instrumented view."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = {}
+
+    def record(self, view_name, stats, over_budget):
+        with self._lock:
+            entry = self._views.setdefault(view_name, {
+                'requests': 0, 'queries': 0, 'sql_ms': 0.0, 'max_queries': 0, 'duplicates': 0, 'over_budget': 0,
+            })
+            entry['requests'] += 1
+            entry['queries'] += stats['queries']
+            entry['sql_ms'] += stats['sql_ms']
+            entry['max_queries'] = max(entry['max_queries'], stats['queries'])
+            entry['duplicates'] += stats['duplicates']
+            entry['over_budget'] += int(over_budget)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                view_name: {
+                    **entry,
+                    'sql_ms': round(entry['sql_ms'], 2),
+                    'queries_per_request': round(entry['queries'] / entry['requests'], 2),
+                }
+                for view_name, entry in sorted(self._views.items())
+            }
+
+
+view_query_stats = ViewQueryStats()
+
+
+def enforce_query_budgets():
+    """
+    override_settings that instruments every request and raises on an
+    exceeded budget; use as a TestCase class decorator or context manager.
+    """
+    from django.test.utils import override_settings
+    return override_settings(QUERY_INSTRUMENTATION={**instrumentation_config(), 'SAMPLE_RATE': 1.0, 'RAISE_ON_BUDGET': True})
+
+
+def assert_within_query_budget(response, queries=None, duplicates=None):
+    """
+    Check an instrumented test-client response against the view's declared
+    budget, or against explicit limits.
+    """
+    stats = getattr(response, 'query_stats', None)
+    if stats is None:
+        raise AssertionError('The request was not instrumented; wrap the test in enforce_query_budgets()')
+    budget = dict(getattr(response, 'query_budget', None) or {'queries': None, 'duplicates': None})
+    if queries is not None:
+        budget['queries'] = queries
+    if duplicates is not None:
+        budget['duplicates'] = duplicates
+    if budget['queries'] is None:
+        raise AssertionError('The view declares no query budget and no limit was given')
+    problems = budget_violations(stats, budget)
+    if problems:
+        raise QueryBudgetExceeded(budget_message(getattr(response, 'query_view_name', '?'), stats, problems))
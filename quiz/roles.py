@@ -0,0 +1,108 @@
+"""
+Role and profile resolution
+
+A user's role and Teacher/Student profile ids are resolved with one query at
+login and kept in the session. RoleMiddleware copies them onto every request
+as request.role, request.teacher_id and request.student_id, and exposes the
+profiles themselves as lazily loaded request.teacher / request.student.
+Views guard on them with @teacher_required / @student_required.
+
+The session copy carries the user's SCOPE_ROLE cache generation, which the
+quiz signals bump when a Teacher or Student profile is created or deleted,
+so every session of that user resolves the role again on its next request.
+"""
+
+from functools import wraps
+
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required
+from django.contrib.auth.models import User
+from django.shortcuts import redirect
+from django.utils.functional import SimpleLazyObject
+
+from .caching import SCOPE_ROLE, generation
+from .models import Teacher, Student
+
+ROLE_SESSION_KEY = '_quiz_role'
+ANONYMOUS_ROLE = {'user_id': None, 'role': None, 'teacher_id': None, 'student_id': None}
+
+
+def resolve_role(user):
+    """
+    Role and profile ids for a user in one query. A Teacher profile wins over
+    a Student profile; users with neither fall back to UserProfile.role.
+    """
+    row = User.objects.filter(id=user.id).values_list('teacher__id', 'student__id', 'profile__role').first()
+    teacher_id, student_id, profile_role = row or (None, None, None)
+    if teacher_id:
+        role = 'teacher'
+    elif student_id:
+        role = 'student'
+    else:
+        role = profile_role
+    return {'user_id': user.id, 'role': role, 'teacher_id': teacher_id, 'student_id': student_id}
+
+
+def _load_profile(request, model, profile_id):
+    profile = model.objects.get(id=profile_id)
+    # The user is already loaded for this request
+    profile.user = request.user
+    return profile
+
+
+def attach_role(request, info):
+    """Expose a resolved role on the request (and on request.user for the API helpers)."""
+    request.role = info['role']
+    request.teacher_id = info['teacher_id']
+    request.student_id = info['student_id']
+    request.teacher = SimpleLazyObject(lambda: _load_profile(request, Teacher, info['teacher_id'])) if info['teacher_id'] else None
+    request.student = SimpleLazyObject(lambda: _load_profile(request, Student, info['student_id'])) if info['student_id'] else None
+    if request.user.is_authenticated:
+        request.user.resolved_role = info['role']
+
+
+def _resolve_versioned(user, version=None):
+    # The generation is read first, so a profile created meanwhile still
+    # leaves the stored copy stale rather than current
+    version = generation(SCOPE_ROLE, user.id) if version is None else version
+    return {**resolve_role(user), 'version': version}
+
+
+def remember_role(request, user):
+    """Resolve a user's role, cache it in the session and attach it. Call right after login()."""
+    info = _resolve_versioned(user)
+    request.session[ROLE_SESSION_KEY] = info
+    attach_role(request, info)
+    return info
+
+
+def role_for_request(request):
+    """Session-cached role info for the current user, resolving it once if missing or stale."""
+    info = request.session.get(ROLE_SESSION_KEY)
+    version = generation(SCOPE_ROLE, request.user.id)
+    if not info or info.get('user_id') != request.user.id or info.get('version') != version:
+        info = _resolve_versioned(request.user, version)
+        request.session[ROLE_SESSION_KEY] = info
+    return info
+
+
+def role_required(role, message=None, redirect_to='home'):
+    """
+    login_required plus a check that the user has a ``role`` profile;
+    otherwise flash ``message`` and redirect.
+    """
+    message = message or f'{role.title()} profile not found.'
+
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if getattr(request, f'{role}_id', None) is None:
+                messages.error(request, message)
+                return redirect(redirect_to)
+            return view_func(request, *args, **kwargs)
+        return login_required(wrapper)
+    return decorator
+
+
+teacher_required = role_required('teacher')
+student_required = role_required('student', redirect_to='quiz:student_login')
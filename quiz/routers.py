@@ -0,0 +1,40 @@
+"""
+Database router for the attempt archive
+
+ArchivedAttempt and ArchivedAnswer are read, written and migrated on
+settings.ARCHIVE['DATABASE']; everything else stays on 'default'. With the
+archive on 'default' (the default) the router changes nothing.
+
+This module must not import models: routers are loaded before the app
+registry is ready.
+"""
+
+from django.conf import settings
+
+ARCHIVE_MODELS = frozenset({'archivedattempt', 'archivedanswer'})
+
+
+def archive_database():
+    return getattr(settings, 'ARCHIVE', {}).get('DATABASE', 'default')
+
+
+class ArchiveRouter:
+    def _route(self, model):
+        if model._meta.app_label == 'quiz' and model._meta.model_name in ARCHIVE_MODELS:
+            return archive_database()
+        return None
+
+    def db_for_read(self, model, **hints):
+        return self._route(model)
+
+    def db_for_write(self, model, **hints):
+        return self._route(model)
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        archive = archive_database()
+        if archive == 'default':
+            return None
+        if app_label == 'quiz' and model_name in ARCHIVE_MODELS:
+            return db == archive
+        # Keep the rest of the schema out of the archive database
+        return False if db == archive else None
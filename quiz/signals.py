@@ -0,0 +1,131 @@
+"""
+Signal handlers for the quiz app
+
+Deletions are recorded as tombstones so the delta-sync API can tell
+clients which quizzes, questions and attempts to drop. A quiz that leaves
+'active' gets students-only tombstones for itself and its questions; a
+quiz or question students could not see when it was deleted gets a
+teachers-only one.
+
+Quiz, question and attempt changes bump the cache generations behind the
+teacher and student dashboard fragments (see quiz.caching). Completed
+attempts are bumped by grading.finalize_attempt. Creating or deleting a
+Teacher or Student profile bumps the user's role generation, so the role
+cached in their sessions is resolved again (see quiz.roles).
+
+Question and option changes also bump the quiz generation, which drops
+the cached delivery payload and answer key (quiz.delivery) whatever made
+the change. bulk_create() and update() send no signals, so code that uses
+them on questions or options calls delivery.invalidate_quiz_payload().
+"""
+
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .caching import CATALOGUE_ID, SCOPE_CATALOGUE, SCOPE_QUIZ, SCOPE_ROLE, SCOPE_STUDENT, SCOPE_TEACHER, bump, bump_many
+from .models import Option, Quiz, Question, QuizAttempt, Student, Teacher, Tombstone
+
+
+def _quiz_owner_id(quiz_id):
+    return Quiz.objects.filter(id=quiz_id).values_list('created_by_id', flat=True).first()
+
+
+@receiver(post_delete, sender=Quiz)
+def record_quiz_tombstone(sender, instance, **kwargs):
+    Tombstone.objects.create(
+        model_name='quiz', object_id=instance.pk, quiz_id=instance.pk, owner_id=instance.created_by_id,
+        teachers_only=instance.status != 'active',
+    )
+
+
+@receiver(post_delete, sender=Question)
+def record_question_tombstone(sender, instance, **kwargs):
+    # A quiz deleted through the ORM is still there while its questions go
+    quiz = Quiz.all_objects.filter(id=instance.quiz_id).only('created_by_id', 'status', 'opens_at', 'closes_at').first()
+    Tombstone.objects.create(
+        model_name='question', object_id=instance.pk, quiz_id=instance.quiz_id,
+        owner_id=quiz.created_by_id if quiz else None,
+        teachers_only=quiz is not None and not (quiz.status == 'active' and quiz.is_open()),
+    )
+
+
+@receiver(post_delete, sender=QuizAttempt)
+def record_attempt_tombstone(sender, instance, **kwargs):
+    Tombstone.objects.create(model_name='attempt', object_id=instance.pk, quiz_id=instance.quiz_id, owner_id=instance.student_id)
+
+
+def record_student_tombstones(quiz):
+    """Tell student clients to drop ``quiz`` and its questions; its teacher keeps them."""
+    Tombstone.objects.bulk_create([
+        Tombstone(model_name='quiz', object_id=quiz.pk, quiz_id=quiz.pk, owner_id=quiz.created_by_id, students_only=True),
+    ] + [
+        Tombstone(model_name='question', object_id=question_id, quiz_id=quiz.pk, owner_id=quiz.created_by_id, students_only=True)
+        for question_id in Question.objects.filter(quiz_id=quiz.pk).values_list('id', flat=True)
+    ])
+
+
+@receiver(pre_save, sender=Quiz)
+def remember_quiz_status(sender, instance, update_fields=None, **kwargs):
+    if instance.pk is None or (update_fields is not None and 'status' not in update_fields):
+        instance._previous_status = None
+        return
+    instance._previous_status = Quiz.all_objects.filter(pk=instance.pk).values_list('status', flat=True).first()
+
+
+@receiver(post_save, sender=Quiz)
+def record_quiz_left_catalogue(sender, instance, created, **kwargs):
+    if getattr(instance, '_previous_status', None) == 'active' and instance.status != 'active':
+        record_student_tombstones(instance)
+
+
+@receiver(post_save, sender=Quiz)
+@receiver(post_delete, sender=Quiz)
+def bump_quiz_dashboards(sender, instance, **kwargs):
+    bump_many((SCOPE_TEACHER, instance.created_by_id), (SCOPE_CATALOGUE, CATALOGUE_ID))
+
+
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+def bump_question_dashboards(sender, instance, **kwargs):
+    # Question counts are shown on both dashboards; the payload and answer
+    # key are cached under the quiz
+    if Question.quiz.is_cached(instance):
+        owner_id = instance.quiz.created_by_id
+    else:
+        owner_id = _quiz_owner_id(instance.quiz_id)
+    bump_many((SCOPE_TEACHER, owner_id), (SCOPE_CATALOGUE, CATALOGUE_ID), (SCOPE_QUIZ, instance.quiz_id))
+
+
+@receiver(post_save, sender=Option)
+@receiver(post_delete, sender=Option)
+def bump_option_quiz(sender, instance, **kwargs):
+    # Options are part of the payload, and is_correct of the answer key
+    if Option.question.is_cached(instance):
+        quiz_id = instance.question.quiz_id
+    else:
+        quiz_id = Question.objects.filter(id=instance.question_id).values_list('quiz_id', flat=True).first()
+    if quiz_id is not None:
+        bump(SCOPE_QUIZ, quiz_id)
+
+
+@receiver(post_save, sender=QuizAttempt)
+@receiver(post_delete, sender=QuizAttempt)
+def bump_attempt_dashboards(sender, instance, signal, created=False, **kwargs):
+    # Only starting or removing an attempt changes the counts; completing
+    # one is handled by finalize_attempt
+    if signal is post_save and not created:
+        return
+    bump_many((SCOPE_STUDENT, instance.student_id), (SCOPE_TEACHER, _quiz_owner_id(instance.quiz_id)))
+
+
+@receiver(post_save, sender=Teacher)
+@receiver(post_save, sender=Student)
+def invalidate_role_on_profile_created(sender, instance, created, **kwargs):
+    if created:
+        bump(SCOPE_ROLE, instance.user_id)
+
+
+@receiver(post_delete, sender=Teacher)
+@receiver(post_delete, sender=Student)
+def invalidate_role_on_profile_deleted(sender, instance, **kwargs):
+    bump(SCOPE_ROLE, instance.user_id)
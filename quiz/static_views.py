@@ -0,0 +1,79 @@
+"""
+Serves collected static files when no web server sits in front of the app
+
+Content-hashed names (from the staticfiles manifest) never change, so they
+are sent with a one-year immutable Cache-Control. Any other name gets a
+short max-age. A .br or .gz variant written by quiz.storage is sent instead
+of the file when the client accepts that encoding, and ``Vary:
+Accept-Encoding`` is set on every file that has one.
+"""
+
+import mimetypes
+import os
+import posixpath
+from functools import lru_cache
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+UNHASHED_MAX_AGE = 60
+
+# Preferred first
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+
+
+@lru_cache(maxsize=1)
+def hashed_names():
+    return frozenset(getattr(staticfiles_storage, 'hashed_files', {}).values())
+
+
+def accepted_encodings(header):
+    """Codings listed in an Accept-Encoding header, minus those with q=0."""
+    accepted = set()
+    for part in header.split(','):
+        coding, _, params = part.strip().partition(';')
+        params = params.replace(' ', '')
+        if coding and params not in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            accepted.add(coding.lower())
+    return accepted
+
+
+def serve_static(request, path):
+    name = posixpath.normpath(path).lstrip('/')
+    try:
+        full_path = safe_join(settings.STATIC_ROOT, name)
+    except SuspiciousFileOperation:
+        raise Http404('Not found')
+    if not os.path.isfile(full_path):
+        raise Http404('Not found')
+
+    variants = [(coding, full_path + suffix) for coding, suffix in ENCODINGS if os.path.isfile(full_path + suffix)]
+    accepted = accepted_encodings(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+    served_path, coding = next(((variant, coding) for coding, variant in variants if coding in accepted), (full_path, None))
+
+    stat = os.stat(served_path)
+    if not was_modified_since(request.META.get('HTTP_IF_MODIFIED_SINCE'), stat.st_mtime):
+        response = HttpResponseNotModified()
+    else:
+        content_type = mimetypes.guess_type(full_path)[0] or 'application/octet-stream'
+        if content_type.startswith('text/') or content_type in ('application/json', 'image/svg+xml'):
+            content_type += '; charset=utf-8'
+        response = FileResponse(open(served_path, 'rb'), content_type=content_type)
+        response['Last-Modified'] = http_date(stat.st_mtime)
+        if coding:
+            response['Content-Encoding'] = coding
+
+    if variants:
+        patch_vary_headers(response, ('Accept-Encoding',))
+    if name in hashed_names():
+        patch_cache_control(response, public=True, max_age=IMMUTABLE_MAX_AGE, immutable=True)
+    else:
+        patch_cache_control(response, public=True, max_age=UNHASHED_MAX_AGE)
+    return response
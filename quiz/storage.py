@@ -0,0 +1,134 @@
+"""
+Static files storage for production
+
+collectstatic minifies CSS and JS as the manifest storage reads them, so
+the content hash in each file name covers the bytes actually served, then
+writes precompressed .gz (and .br, when brotli is installed) variants next
+to each text asset. quiz.static_views serves them.
+
+rcssmin and rjsmin are used when installed. Without them CSS only loses
+comments and indentation and JS is left as is; both are still compressed.
+"""
+
+import gzip
+import os
+import re
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import rcssmin
+except ImportError:
+    rcssmin = None
+
+try:
+    import rjsmin
+except ImportError:
+    rjsmin = None
+
+# Keeps /*! license */ and /*# sourceMappingURL */ comments
+CSS_COMMENT = re.compile(r'/\*(?![!#]).*?\*/', re.S)
+
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.mjs', '.svg', '.html', '.txt', '.json', '.map', '.xml', '.ico')
+MIN_COMPRESS_SIZE = 256
+# A variant has to save at least this much to be worth serving
+MIN_COMPRESS_RATIO = 0.95
+
+
+def minify_css(text):
+    if rcssmin is not None:
+        return rcssmin.cssmin(text, keep_bang_comments=True)
+    lines = (line.strip() for line in CSS_COMMENT.sub('', text).splitlines())
+    return '\n'.join(line for line in lines if line) + '\n'
+
+
+def minify_js(text):
+    if rjsmin is not None:
+        return rjsmin.jsmin(text, keep_bang_comments=True)
+    return text
+
+
+MINIFIERS = {'.css': minify_css, '.js': minify_js}
+
+
+def minified(name, data):
+    """``data`` minified for the type of ``name``, when that makes it smaller."""
+    minify = MINIFIERS.get(os.path.splitext(name)[1].lower())
+    if minify is None:
+        return data
+    try:
+        result = minify(data.decode('utf-8')).encode('utf-8')
+    except UnicodeDecodeError:
+        return data
+    return result if len(result) < len(data) else data
+
+
+class MinifyingSource:
+    """Wraps a finder's source storage so the manifest storage hashes minified content."""
+
+    def __init__(self, storage):
+        self.storage = storage
+
+    def open(self, path, mode='rb'):
+        with self.storage.open(path, mode) as f:
+            data = f.read()
+        return ContentFile(minified(path, data), name=path)
+
+    def __getattr__(self, name):
+        return getattr(self.storage, name)
+
+COMPRESSORS = [('.gz', lambda data: gzip.compress(data, compresslevel=9, mtime=0))]
+if brotli is not None:
+    COMPRESSORS.append(('.br', lambda data: brotli.compress(data, quality=11)))
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+
+    def post_process(self, paths, dry_run=False, **options):
+        paths = {name: (MinifyingSource(storage), path) for name, (storage, path) in paths.items()}
+        originals, hashed = set(), set()
+        for name, hashed_name, processed in super().post_process(paths, dry_run, **options):
+            if not isinstance(processed, Exception):
+                originals.add(name)
+                if hashed_name:
+                    hashed.add(hashed_name)
+            yield name, hashed_name, processed
+        if not dry_run:
+            for name in sorted(originals - hashed):
+                self.optimize(name, minify=True)
+            for name in sorted(hashed):
+                # Already minified before hashing; minifying again could
+                # change the bytes behind the hash
+                self.optimize(name, minify=False)
+
+    def optimize(self, name, minify=True):
+        """Minify a collected file in place (unless told not to) and (re)write its compressed variants."""
+        path = self.path(name)
+        extension = os.path.splitext(name)[1].lower()
+        with open(path, 'rb') as f:
+            data = f.read()
+
+        if minify:
+            smaller = minified(name, data)
+            if smaller is not data:
+                data = smaller
+                with open(path, 'wb') as f:
+                    f.write(data)
+
+        if extension not in COMPRESSIBLE_EXTENSIONS:
+            return
+        for suffix, compress in COMPRESSORS:
+            variant = path + suffix
+            compressed = compress(data) if len(data) >= MIN_COMPRESS_SIZE else None
+            if compressed is not None and len(compressed) < len(data) * MIN_COMPRESS_RATIO:
+                with open(variant, 'wb') as f:
+                    f.write(compressed)
+            elif os.path.exists(variant):
+                # Left over from an earlier collectstatic
+                os.remove(variant)
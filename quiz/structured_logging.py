@@ -0,0 +1,132 @@
+"""
+Non-blocking, structured logging
+
+QueuedHandler puts records on an in-memory queue and returns; a
+QueueListener thread hands them to the real handler (a RotatingFileHandler
+in settings.LOGGING), so formatting and disk writes never run on the
+request path. When the queue is full, records are dropped and counted
+rather than blocking the request.
+
+JsonFormatter writes one JSON object per line. RequestIdFilter stamps each
+record with the id RequestIdMiddleware assigned to the current request;
+it must sit on the QueuedHandler, which runs in the request's thread.
+"""
+
+import atexit
+import contextvars
+import copy
+import json
+import logging
+import os
+import queue
+import threading
+import weakref
+from logging.handlers import QueueHandler, QueueListener
+
+from django.utils.module_loading import import_string
+
+request_id_var = contextvars.ContextVar('request_id', default=None)
+
+# Attributes every LogRecord has; anything else came in through extra=
+RECORD_ATTRIBUTES = frozenset(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime', 'request_id'}
+
+
+class RequestIdFilter(logging.Filter):
+    def filter(self, record):
+        # django.request logs the response after the middleware has
+        # returned, but passes the request along
+        record.request_id = request_id_var.get() or getattr(getattr(record, 'request', None), 'request_id', None)
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record, with extra= fields at the top level."""
+
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record, '%Y-%m-%dT%H:%M:%S') + f'.{int(record.msecs):03d}',
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'module': record.module,
+            'line': record.lineno,
+            'process': record.process,
+            'request_id': getattr(record, 'request_id', None),
+        }
+        for key, value in vars(record).items():
+            if key not in RECORD_ATTRIBUTES and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        if record.stack_info:
+            entry['stack'] = record.stack_info
+        return json.dumps(entry, default=str)
+
+
+class QueuedHandler(QueueHandler):
+    """
+    Queue records for a background thread that emits them through
+    ``target``, a handler config dict with a dotted 'class' and its keyword
+    arguments. A formatter set on this handler is used by the target.
+    """
+    # For queue depth reporting (quiz/health.py)
+    instances = weakref.WeakSet()
+
+    def __init__(self, target, queue_size=10000):
+        target = dict(target)
+        self.target = import_string(target.pop('class'))(**target)
+        super().__init__(queue.Queue(maxsize=queue_size))
+        self.dropped = 0
+        self._listener = None
+        self._pid = None
+        self._lock = threading.Lock()
+        atexit.register(self.stop)
+        QueuedHandler.instances.add(self)
+
+    def setFormatter(self, fmt):
+        self.target.setFormatter(fmt)
+
+    def prepare(self, record):
+        # Only what cannot wait: the message and traceback are fixed now,
+        # while the arguments and exception are still live. Everything else
+        # is formatted in the listener thread.
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        self._ensure_listener()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def _ensure_listener(self):
+        # The listener thread does not survive a fork (gunicorn --preload),
+        # so each process starts its own
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._listener = QueueListener(self.queue, self.target, respect_handler_level=True)
+                self._listener.start()
+                self._pid = os.getpid()
+
+    def stop(self):
+        """Write out what is queued and stop the listener (at exit)."""
+        with self._lock:
+            if self._listener is not None and self._pid == os.getpid():
+                self._listener.stop()
+            self._listener = self._pid = None
+        self.target.flush()
+
+    def close(self):
+        self.stop()
+        self.target.close()
+        super().close()
@@ -0,0 +1,79 @@
+"""
+Shared fixtures for the quiz and accounts tests
+
+Every test runs against its own in-memory cache, so cached payloads and
+cache generations never leak between tests or into the development cache.
+"""
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from quiz.grading import ATTEMPT_STATUS_COMPLETED
+from quiz.models import Option, Question, Quiz, QuizAttempt, Student, StudentAnswer, Teacher
+
+PASSWORD = 'test-pass-123'
+TEST_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'quiz-tests',
+        'KEY_PREFIX': 'quizmaster',
+    },
+}
+
+
+def make_teacher(username='teacher'):
+    user = User.objects.create_user(username, password=PASSWORD)
+    return Teacher.objects.create(user=user)
+
+
+def make_student(username='student'):
+    user = User.objects.create_user(username, password=PASSWORD)
+    Student.objects.create(user=user)
+    return user
+
+
+def make_quiz(teacher, questions=3, options=4, **fields):
+    """A quiz of one-mark questions whose first option is the correct one."""
+    fields = {'title': 'Quiz', 'category': 'Testing', 'time_limit': 10, 'total_marks': questions, 'passing_marks': 1, **fields}
+    quiz = Quiz.objects.create(created_by=teacher, **fields)
+    for index in range(questions):
+        question = Question.objects.create(quiz=quiz, question_text=f'Question {index}', order=index, correct_answer=0)
+        Option.objects.bulk_create([
+            Option(question=question, option_text=f'Option {index}.{option}', is_correct=option == 0, order=option)
+            for option in range(options)
+        ])
+    return quiz
+
+
+def make_attempt(student, quiz, correct, start_time=None, status=ATTEMPT_STATUS_COMPLETED):
+    """
+    An attempt answering every question, the first ``correct`` of them
+    correctly, with the totals a submission would have stored.
+    """
+    questions = list(quiz.questions.order_by('order'))
+    start_time = start_time or timezone.now()
+    attempt = QuizAttempt.objects.create(student=student, quiz=quiz, start_time=start_time, status=status)
+    for index, question in enumerate(questions):
+        options = list(question.option_set.all())
+        is_correct = index < correct
+        StudentAnswer.objects.create(
+            attempt=attempt, question=question, selected_option=options[0 if is_correct else 1], is_correct=is_correct,
+        )
+    if status == ATTEMPT_STATUS_COMPLETED:
+        score, max_score = correct, len(questions)
+        QuizAttempt.objects.filter(id=attempt.id).update(
+            end_time=start_time, score=score, max_score=max_score, total_marks=max_score,
+            correct_answers=correct, incorrect_answers=max_score - correct,
+            percentage=score * 100 / max_score if max_score else 0, passed=score >= (quiz.passing_marks or 0),
+        )
+        attempt.refresh_from_db()
+    return attempt
+
+
+@override_settings(CACHES=TEST_CACHES, METRICS={'ENABLED': False})
+class QuizTestCase(TestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
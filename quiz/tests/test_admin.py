@@ -0,0 +1,53 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from quiz.admin import EstimatedCountPaginator, estimated_row_count
+from quiz.models import QuizAttempt
+
+from .base import PASSWORD, QuizTestCase, make_attempt, make_quiz, make_student, make_teacher
+
+
+class EstimatedCountPaginatorTests(QuizTestCase):
+    def setUp(self):
+        super().setUp()
+        quiz = make_quiz(make_teacher(), questions=1)
+        for index in range(5):
+            make_attempt(make_student(f'student{index}'), quiz, correct=index % 2)
+
+    def count(self, queryset):
+        return EstimatedCountPaginator(queryset.order_by('id'), 2).count
+
+    def test_sqlite_has_no_estimate(self):
+        self.assertIsNone(estimated_row_count(QuizAttempt, 'default'))
+
+    def test_large_unfiltered_table_shows_the_estimate(self):
+        with mock.patch('quiz.admin.estimated_row_count', return_value=250_000), self.assertNumQueries(0):
+            self.assertEqual(self.count(QuizAttempt.objects.all()), 250_000)
+
+    def test_small_estimate_is_counted(self):
+        with mock.patch('quiz.admin.estimated_row_count', return_value=5):
+            self.assertEqual(self.count(QuizAttempt.objects.all()), 5)
+
+    def test_filtered_count_stops_at_the_cap(self):
+        with mock.patch('quiz.admin.estimated_row_count') as estimate:
+            with mock.patch('quiz.admin.COUNT_CAP', 3):
+                self.assertEqual(self.count(QuizAttempt.objects.filter(passed=False)), 3)
+            self.assertEqual(self.count(QuizAttempt.objects.filter(passed=True)), 2)
+        # Filtered querysets never ask for the table estimate
+        estimate.assert_not_called()
+
+    def test_changelist_runs_no_unbounded_count(self):
+        User.objects.create_superuser('admin', password=PASSWORD)
+        self.client.login(username='admin', password=PASSWORD)
+        url = reverse('admin:quiz_quizattempt_changelist')
+        for query in ('', '?passed__exact=1', '?q=student'):
+            with self.subTest(query=query), CaptureQueriesContext(connection) as queries:
+                self.assertEqual(self.client.get(url + query).status_code, 200)
+            counts = [entry['sql'] for entry in queries.captured_queries if 'COUNT(' in entry['sql'].upper()]
+            self.assertTrue(counts)
+            for sql in counts:
+                self.assertIn('LIMIT', sql.upper())
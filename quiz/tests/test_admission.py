@@ -0,0 +1,79 @@
+import json
+from unittest import mock
+
+from django.test import override_settings
+from django.urls import reverse
+
+from quiz.middleware import DEFAULT_ADMISSION_CONTROL, AdmissionController, retry_after_seconds
+
+from .base import QuizTestCase, make_quiz, make_student, make_teacher
+
+
+def admission(**overrides):
+    return override_settings(ADMISSION_CONTROL={**DEFAULT_ADMISSION_CONTROL, **overrides})
+
+
+class AdmissionControlTests(QuizTestCase):
+    def setUp(self):
+        super().setUp()
+        # A controller of our own, so counts never leak between tests
+        self.controller = AdmissionController()
+        patcher = mock.patch('quiz.middleware.admission_controller', self.controller)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.quiz = make_quiz(make_teacher())
+        self.client.force_login(make_student())
+
+    def take(self):
+        return self.client.get(reverse('quiz:take_quiz', args=[self.quiz.id]))
+
+    def submit(self):
+        return self.client.post(
+            reverse('quiz:submit_quiz', args=[self.quiz.id]),
+            data=json.dumps({'answers': {}, 'time_spent': 30}), content_type='application/json',
+        )
+
+    @admission(LIMITS={'delivery': 0})
+    def test_full_delivery_class_gets_the_waiting_room(self):
+        response = self.take()
+        self.assertEqual(response.status_code, 503)
+        self.assertContains(response, 'Almost there', status_code=503)
+        retry = int(response['Retry-After'])
+        self.assertTrue(1 <= retry <= DEFAULT_ADMISSION_CONTROL['MAX_RETRY_AFTER'])
+        self.assertEqual(response['Cache-Control'], 'no-store')
+        self.assertEqual(self.controller.snapshot()['delivery']['rejected'], 1)
+
+    @admission(LIMITS={'submission': 0})
+    def test_busy_submission_gets_json_with_the_retry_time(self):
+        response = self.submit()
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json()['retry_after'], int(response['Retry-After']))
+        self.assertFalse(response.json()['success'])
+
+    def test_admitted_requests_are_released(self):
+        self.assertEqual(self.take().status_code, 200)
+        counts = self.controller.snapshot()['delivery']
+        self.assertEqual((counts['admitted'], counts['in_flight']), (1, 0))
+
+    @admission(PRESSURE_THRESHOLD=4)
+    def test_dashboards_are_shed_under_pressure_before_exams(self):
+        self.controller._in_flight = {'delivery': 4}
+        self.assertEqual(self.client.get(reverse('quiz:student_dashboard')).status_code, 503)
+        self.assertEqual(self.take().status_code, 200)
+
+    @admission(ENABLED=False, LIMITS={'delivery': 0})
+    def test_disabled_admits_everything(self):
+        self.assertEqual(self.take().status_code, 200)
+        self.assertEqual(self.controller.snapshot()['delivery']['admitted'], 0)
+
+    def test_retry_after_grows_with_the_overflow_up_to_the_cap(self):
+        with mock.patch('quiz.middleware.random.uniform', return_value=0):
+            self.assertEqual(retry_after_seconds(1, DEFAULT_ADMISSION_CONTROL), 3)
+            self.assertEqual(retry_after_seconds(16, DEFAULT_ADMISSION_CONTROL), 9)
+        with mock.patch('quiz.middleware.random.uniform', side_effect=lambda low, high: high):
+            self.assertEqual(retry_after_seconds(1000, DEFAULT_ADMISSION_CONTROL), DEFAULT_ADMISSION_CONTROL['MAX_RETRY_AFTER'])
+
+    def test_quiz_page_bounds_submission_retries_by_the_grace_period(self):
+        with self.settings(QUIZ_SETTINGS={'SUBMISSION_GRACE_SECONDS': 45}):
+            response = self.take()
+        self.assertContains(response, 'submissionGrace: 45')
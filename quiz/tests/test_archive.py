@@ -0,0 +1,125 @@
+from collections import Counter
+from datetime import timedelta
+
+from django.urls import reverse
+from django.utils import timezone
+
+from quiz.archive import archive_attempt_ids, archive_attempts, rollup_totals
+from quiz.grading import ATTEMPT_STATUS_IN_PROGRESS, grade_band, regrade_quiz
+from quiz.models import ArchivedAnswer, ArchivedAttempt, AttemptRollup, Option, QuizAttempt, StudentAnswer
+from quiz.views import (
+    calculate_attempt_stats, calculate_grade_distribution, calculate_student_grade_distribution,
+    calculate_student_performance_stats,
+)
+
+from .base import QuizTestCase, make_attempt, make_quiz, make_student, make_teacher
+
+
+class ArchiveTests(QuizTestCase):
+    def setUp(self):
+        super().setUp()
+        self.teacher = make_teacher()
+        self.quiz = make_quiz(self.teacher, questions=4, passing_marks=2)
+        self.other_quiz = make_quiz(self.teacher, questions=4, title='Other', passing_marks=3)
+        self.students = [make_student(f'student{index}') for index in range(3)]
+        old = timezone.now() - timedelta(days=400)
+        self.old, self.recent = [], []
+        for index, student in enumerate(self.students):
+            for offset, correct in enumerate((index, (index + 2) % 5, 4)):
+                self.old.append(make_attempt(student, self.quiz, correct=correct, start_time=old + timedelta(days=offset)))
+            self.old.append(make_attempt(student, self.other_quiz, correct=index + 1, start_time=old))
+            self.recent.append(make_attempt(student, self.quiz, correct=(index + 1) % 5))
+        self.open = make_attempt(self.students[0], self.quiz, correct=1, start_time=old, status=ATTEMPT_STATUS_IN_PROGRESS)
+
+    def dashboard_stats(self):
+        stats = {'teacher': calculate_grade_distribution(self.teacher)}
+        for student in self.students:
+            stats[student.username] = (
+                calculate_student_performance_stats(student), calculate_student_grade_distribution(student),
+            )
+        for quiz in (self.quiz, self.other_quiz):
+            attempts = QuizAttempt.objects.filter(quiz=quiz, status='completed')
+            stats[quiz.title] = calculate_attempt_stats(attempts, rollup_totals(AttemptRollup.objects.filter(quiz=quiz)))
+        stats['api:teacher'] = self.api_dashboard(self.teacher.user, 'api:teacher_dashboard', 'recent_quizzes')
+        for student in self.students:
+            stats[f'api:{student.username}'] = self.api_dashboard(student, 'api:student_dashboard', 'recent_attempts')
+        return stats
+
+    def api_dashboard(self, user, url_name, listing):
+        self.client.force_login(user)
+        response = self.client.get(reverse(url_name))
+        self.assertEqual(response.status_code, 200)
+        # The recent listing only shows hot attempts; every number must count the archive
+        payload = response.json()
+        del payload[listing]
+        return payload
+
+    def assertRollupsMatchArchive(self):
+        for rollup in AttemptRollup.objects.all():
+            archived = list(ArchivedAttempt.objects.filter(student_id=rollup.student_id, quiz_id=rollup.quiz_id))
+            scores = [attempt.score for attempt in archived]
+            self.assertEqual(rollup.attempts, len(archived))
+            self.assertEqual(rollup.passed, sum(attempt.passed for attempt in archived))
+            self.assertEqual(rollup.failed, sum(not attempt.passed for attempt in archived))
+            self.assertEqual((rollup.score_total, rollup.best_score, rollup.worst_score), (sum(scores), max(scores), min(scores)))
+            self.assertEqual(rollup.grade_counts, dict(Counter(grade_band(attempt.percentage) for attempt in archived)))
+
+    def test_moves_old_completed_attempts_with_their_answers(self):
+        counts = archive_attempts(batch_size=4)
+
+        self.assertEqual(counts, {'attempts_archived': len(self.old), 'answers_archived': len(self.old) * 4})
+        self.assertEqual(set(ArchivedAttempt.objects.values_list('id', flat=True)), {attempt.id for attempt in self.old})
+        self.assertEqual(ArchivedAnswer.objects.count(), len(self.old) * 4)
+        hot = set(QuizAttempt.objects.values_list('id', flat=True))
+        self.assertEqual(hot, {attempt.id for attempt in self.recent} | {self.open.id})
+        self.assertFalse(StudentAnswer.objects.filter(attempt_id__in=[attempt.id for attempt in self.old]).exists())
+        self.assertEqual(AttemptRollup.objects.count(), 6)
+        self.assertRollupsMatchArchive()
+
+    def test_dashboards_are_unchanged_by_archiving(self):
+        before = self.dashboard_stats()
+        archive_attempts()
+        self.assertEqual(self.dashboard_stats(), before)
+
+    def test_api_dashboards_agree_with_performance_stats(self):
+        archive_attempts()
+        for student in self.students:
+            payload = self.api_dashboard(student, 'api:student_dashboard', 'recent_attempts')
+            stats = payload['performance_stats']
+            self.assertEqual(payload['completed_attempts'], stats['total_quizzes'])
+            self.assertEqual(payload['avg_score'], stats['avg_score'])
+        payload = self.api_dashboard(self.teacher.user, 'api:teacher_dashboard', 'recent_quizzes')
+        self.assertEqual(payload['total_attempts'], len(self.old) + len(self.recent) + 1)
+        self.assertEqual(payload['total_students'], len(self.students))
+
+    def test_archiving_again_counts_nothing_twice(self):
+        archive_attempts()
+        rollups = list(AttemptRollup.objects.order_by('id').values())
+        self.assertEqual(archive_attempt_ids([attempt.id for attempt in self.old]), {'attempts_archived': 0, 'answers_archived': 0})
+        self.assertEqual(archive_attempts(), {'attempts_archived': 0, 'answers_archived': 0})
+        self.assertEqual(list(AttemptRollup.objects.order_by('id').values()), rollups)
+
+    def test_regrade_reaches_archived_attempts_and_rollups(self):
+        archive_attempts()
+        question = self.quiz.questions.order_by('order').first()
+        options = list(question.option_set.all())
+        Option.objects.filter(id=options[0].id).update(is_correct=False)
+        Option.objects.filter(id=options[1].id).update(is_correct=True)
+
+        result = regrade_quiz(self.quiz.id)
+
+        # Every attempt answered the first question, so every score moves by one
+        quiz_attempts = [attempt for attempt in self.old if attempt.quiz_id == self.quiz.id]
+        self.assertEqual(result['archived_attempts_regraded'], len(quiz_attempts))
+        self.assertEqual(result['archived_answers_updated'], len(quiz_attempts))
+        for attempt in quiz_attempts:
+            archived = ArchivedAttempt.objects.get(id=attempt.id)
+            expected = attempt.score - 1 if attempt.correct_answers else attempt.score + 1
+            self.assertEqual(archived.score, expected)
+            self.assertEqual(archived.percentage, expected * 25)
+            self.assertEqual(archived.passed, expected >= 2)
+        self.assertRollupsMatchArchive()
+        # The other quiz's archive is left alone
+        for attempt in self.old:
+            if attempt.quiz_id == self.other_quiz.id:
+                self.assertEqual(ArchivedAttempt.objects.get(id=attempt.id).score, attempt.score)
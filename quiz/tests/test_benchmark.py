@@ -0,0 +1,78 @@
+import json
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.test import TransactionTestCase, override_settings
+
+from quiz.management.commands.run_benchmark import Command as BenchmarkCommand, percentile
+from quiz.models import Option, Question, Quiz, QuizAttempt, Student, StudentAnswer, Teacher
+
+from .base import TEST_CACHES, QuizTestCase
+
+SEED = {
+    'teachers': 2, 'students': 5, 'quizzes_per_teacher': 2, 'questions': 3, 'options': 4,
+    'attempts_per_student': 3, 'completion_rate': 0.6, 'prefix': 'seeded', 'seed': 3,
+}
+
+
+def seed(**overrides):
+    call_command('seed_dataset', **{**SEED, **overrides}, stdout=StringIO())
+
+
+class SeedDatasetTests(QuizTestCase):
+    def test_seeds_every_table_consistently(self):
+        seed()
+        self.assertEqual(Teacher.objects.count(), 2)
+        self.assertEqual(Student.objects.count(), 5)
+        self.assertEqual(Quiz.objects.count(), 4)
+        self.assertEqual(Question.objects.count(), 12)
+        self.assertEqual(Option.objects.count(), 48)
+        self.assertEqual(Option.objects.filter(is_correct=True).count(), 12)
+        self.assertEqual(QuizAttempt.objects.count(), 15)
+        completed = QuizAttempt.objects.filter(status='completed')
+        self.assertEqual(StudentAnswer.objects.count(), completed.count() * 3)
+        for attempt in completed:
+            self.assertEqual(attempt.correct_answers, attempt.answers.filter(is_correct=True).count())
+        self.assertTrue(self.client.login(username='seeded_s1', password='benchmark-pass'))
+
+    def test_same_seed_seeds_the_same_dataset(self):
+        seed()
+        first = list(QuizAttempt.objects.order_by('id').values_list('status', 'score'))
+        seed(prefix='again')
+        second = list(QuizAttempt.objects.order_by('id').values_list('status', 'score'))[len(first):]
+        self.assertEqual(second, first)
+
+    def test_existing_prefix_is_refused(self):
+        seed(students=1, teachers=1)
+        with self.assertRaises(CommandError):
+            seed(students=1, teachers=1)
+
+
+@override_settings(CACHES=TEST_CACHES, METRICS={'ENABLED': False}, ADMISSION_CONTROL={'ENABLED': False})
+class RunBenchmarkTests(TransactionTestCase):
+    def test_reports_and_compares_every_scenario(self):
+        seed()
+        out = StringIO()
+        # One client thread: concurrent writers lock the shared in-memory test database
+        call_command('run_benchmark', requests=4, concurrency=1, prefix='seeded', stdout=out, stderr=StringIO())
+        report = json.loads(out.getvalue())
+        self.assertEqual(set(report['scenarios']), {
+            'teacher_dashboard', 'manage_quizzes', 'view_quiz_results', 'student_dashboard', 'take_quiz', 'submit_quiz',
+        })
+        for name, result in report['scenarios'].items():
+            with self.subTest(name):
+                self.assertEqual((result['requests'], result['errors']), (4, 0))
+                self.assertGreater(result['queries_mean'], 0)
+        self.assertEqual(
+            BenchmarkCommand().compare(report, report)['student_dashboard'],
+            {'throughput_rps': 1.0, 'p50_ms': 1.0, 'p95_ms': 1.0, 'p99_ms': 1.0, 'queries_mean': 1.0},
+        )
+
+    def test_refuses_to_run_without_a_seeded_dataset(self):
+        with self.assertRaises(CommandError):
+            call_command('run_benchmark', requests=1, prefix='missing', stdout=StringIO(), stderr=StringIO())
+
+    def test_nearest_rank_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual((percentile(values, 50), percentile(values, 95), percentile(values, 100)), (50, 95, 100))
+        self.assertIsNone(percentile([], 50))
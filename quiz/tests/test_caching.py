@@ -0,0 +1,35 @@
+from unittest import mock
+
+from django.core.cache import cache
+
+from quiz.caching import SCOPE_QUIZ, SCOPE_TEACHER, bump, bump_many, generation, get_or_build
+
+from .base import QuizTestCase
+
+
+class GenerationTests(QuizTestCase):
+    def test_bump_replaces_the_generation_without_a_timeout(self):
+        before = generation(SCOPE_QUIZ, 1)
+        with mock.patch.object(cache, 'set_many', wraps=cache.set_many) as set_many, \
+                mock.patch.object(cache, 'incr', wraps=cache.incr) as incr:
+            bump(SCOPE_QUIZ, 1)
+        incr.assert_not_called()
+        set_many.assert_called_once_with({f'gen:{SCOPE_QUIZ}:1': generation(SCOPE_QUIZ, 1)}, None)
+        self.assertNotEqual(generation(SCOPE_QUIZ, 1), before)
+
+    def test_bumps_never_repeat_a_generation(self):
+        seen = {generation(SCOPE_QUIZ, 1)}
+        # Every bump lands in the same millisecond and draws the same random bits
+        with mock.patch('quiz.caching.time.time', return_value=1729312345.001), \
+                mock.patch('quiz.caching.random.getrandbits', return_value=0):
+            for _ in range(50):
+                bump(SCOPE_QUIZ, 1)
+                seen.add(generation(SCOPE_QUIZ, 1))
+        self.assertEqual(len(seen), 51)
+
+    def test_bump_orphans_cached_values(self):
+        build = mock.Mock(side_effect=['first', 'second'])
+        self.assertEqual(get_or_build(SCOPE_TEACHER, 4, 'dashboard', build, 60), 'first')
+        self.assertEqual(get_or_build(SCOPE_TEACHER, 4, 'dashboard', build, 60), 'first')
+        bump_many((SCOPE_TEACHER, 4), (SCOPE_TEACHER, None))
+        self.assertEqual(get_or_build(SCOPE_TEACHER, 4, 'dashboard', build, 60), 'second')
@@ -0,0 +1,83 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from quiz.grading import regrade_quiz
+from quiz.models import Option, QuizAttempt
+
+from .base import QuizTestCase, make_attempt, make_quiz, make_student, make_teacher
+
+
+class DashboardFragmentTests(QuizTestCase):
+    def setUp(self):
+        super().setUp()
+        self.teacher = make_teacher()
+        self.quiz = make_quiz(self.teacher, questions=4, title='Algebra')
+        self.student = make_student()
+        self.other = make_student('other')
+
+    def dashboard(self, user, url_name):
+        self.client.force_login(user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse(url_name))
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode(), [query['sql'] for query in queries]
+
+    def teacher_dashboard(self):
+        return self.dashboard(self.teacher.user, 'quiz:teacher_dashboard')
+
+    def student_dashboard(self, student=None):
+        return self.dashboard(student or self.student, 'quiz:student_dashboard')
+
+    def attempt_queries(self, queries):
+        return [sql for sql in queries if 'quiz_quizattempt' in sql]
+
+    def test_warm_teacher_dashboard_runs_none_of_its_fragment_queries(self):
+        cold, cold_queries = self.teacher_dashboard()
+        warm, warm_queries = self.teacher_dashboard()
+        self.assertTrue(self.attempt_queries(cold_queries))
+        self.assertEqual(self.attempt_queries(warm_queries), [])
+        self.assertEqual(warm, cold)
+
+    def test_warm_student_dashboard_runs_none_of_its_fragment_queries(self):
+        make_attempt(self.student, self.quiz, correct=3)
+        self.student_dashboard()
+        _, warm_queries = self.student_dashboard()
+        self.assertEqual(self.attempt_queries(warm_queries), [])
+
+    def test_new_quiz_refreshes_the_teacher_and_the_catalogue(self):
+        self.teacher_dashboard()
+        self.student_dashboard()
+        make_quiz(self.teacher, title='Geometry')
+        self.assertIn('Geometry', self.teacher_dashboard()[0])
+        self.assertIn('Geometry', self.student_dashboard()[0])
+
+    def test_attempt_refreshes_its_student_and_teacher_only(self):
+        self.teacher_dashboard()
+        self.student_dashboard()
+        self.student_dashboard(self.other)
+        make_attempt(self.student, self.quiz, correct=2)
+
+        _, student_queries = self.student_dashboard()
+        _, teacher_queries = self.teacher_dashboard()
+        _, other_queries = self.student_dashboard(self.other)
+        self.assertTrue(self.attempt_queries(student_queries))
+        self.assertTrue(self.attempt_queries(teacher_queries))
+        self.assertEqual(self.attempt_queries(other_queries), [])
+
+    def test_regrade_refreshes_the_dashboards(self):
+        make_attempt(self.student, self.quiz, correct=0)
+        self.student_dashboard()
+        self.teacher_dashboard()
+        question = self.quiz.questions.order_by('order').first()
+        Option.objects.filter(question=question).update(is_correct=True)
+        regrade_quiz(self.quiz.id)
+        self.assertEqual(QuizAttempt.objects.get(student=self.student).score, 1)
+        self.assertTrue(self.attempt_queries(self.student_dashboard()[1]))
+        self.assertTrue(self.attempt_queries(self.teacher_dashboard()[1]))
+
+    def test_quiz_leaving_active_drops_it_from_the_catalogue(self):
+        self.assertIn('Algebra', self.student_dashboard()[0])
+        self.quiz.status = 'draft'
+        self.quiz.save()
+        self.assertNotIn('Algebra', self.student_dashboard()[0])
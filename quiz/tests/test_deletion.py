@@ -0,0 +1,88 @@
+from quiz.archive import archive_attempt_ids
+from quiz.deletion import purge_quiz, soft_delete_quiz
+from quiz.jobs import enqueue, run_pending_jobs
+from quiz.models import (
+    ArchivedAnswer, ArchivedAttempt, AttemptRollup, Option, Question, Quiz, QuizAttempt, StudentAnswer, Tombstone,
+)
+
+from .base import QuizTestCase, make_attempt, make_quiz, make_student, make_teacher
+
+
+class QuizDeletionTests(QuizTestCase):
+    def setUp(self):
+        super().setUp()
+        self.teacher = make_teacher()
+        self.quiz = make_quiz(self.teacher, questions=3)
+        self.kept = make_quiz(self.teacher, questions=2, title='Kept')
+        students = [make_student(f'student{index}') for index in range(4)]
+        self.attempts = [make_attempt(student, self.quiz, correct=index % 4) for index, student in enumerate(students)]
+        self.archived = self.attempts.pop()
+        archive_attempt_ids([self.archived.id])
+        self.kept_attempt = make_attempt(students[0], self.kept, correct=1)
+
+    def assertQuizRowsGone(self, quiz_id):
+        self.assertFalse(Quiz.all_objects.filter(id=quiz_id).exists())
+        self.assertFalse(Question.objects.filter(quiz_id=quiz_id).exists())
+        self.assertFalse(Option.objects.filter(question__quiz_id=quiz_id).exists())
+        self.assertFalse(QuizAttempt.objects.filter(quiz_id=quiz_id).exists())
+        self.assertFalse(StudentAnswer.objects.filter(attempt__quiz_id=quiz_id).exists())
+        self.assertFalse(ArchivedAttempt.objects.filter(quiz_id=quiz_id).exists())
+        self.assertFalse(ArchivedAnswer.objects.filter(attempt__quiz_id=quiz_id).exists())
+        self.assertFalse(AttemptRollup.objects.filter(quiz_id=quiz_id).exists())
+
+    def assertKeptQuizIntact(self):
+        self.assertEqual(Question.objects.filter(quiz=self.kept).count(), 2)
+        self.assertEqual(StudentAnswer.objects.filter(attempt=self.kept_attempt).count(), 2)
+
+    def test_soft_delete_hides_the_quiz_and_queues_the_purge(self):
+        job = soft_delete_quiz(self.quiz)
+
+        self.assertFalse(Quiz.objects.filter(id=self.quiz.id).exists())
+        self.assertTrue(Quiz.all_objects.filter(id=self.quiz.id).exists())
+        self.assertEqual((job.operation, job.status, job.total), ('delete_quizzes', 'queued', 1))
+        self.assertTrue(Tombstone.objects.filter(model_name='quiz', object_id=self.quiz.id).exists())
+        # Nothing under the quiz is touched until the job runs
+        self.assertEqual(QuizAttempt.objects.filter(quiz=self.quiz).count(), 3)
+
+    def test_job_purges_everything_under_the_quiz(self):
+        quiz_id = self.quiz.id
+        question_ids = set(Question.objects.filter(quiz_id=quiz_id).values_list('id', flat=True))
+        job = soft_delete_quiz(self.quiz)
+
+        run_pending_jobs()
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'completed')
+        self.assertEqual(job.result['quizzes_deleted'], 1)
+        self.assertEqual(job.result['attempts_deleted'], 3)
+        self.assertEqual(job.result['archived_attempts_deleted'], 1)
+        self.assertEqual(job.result['questions_deleted'], 3)
+        self.assertQuizRowsGone(quiz_id)
+        self.assertKeptQuizIntact()
+        tombstones = Tombstone.objects.filter(quiz_id=quiz_id)
+        self.assertEqual(set(tombstones.filter(model_name='question').values_list('object_id', flat=True)), question_ids)
+        self.assertEqual(
+            set(tombstones.filter(model_name='attempt').values_list('object_id', flat=True)),
+            {attempt.id for attempt in self.attempts} | {self.archived.id},
+        )
+
+    def test_purge_in_small_batches(self):
+        quiz_id = self.quiz.id
+        Quiz.all_objects.filter(id=quiz_id).update(deleted_at=self.quiz.created_at)
+        counts = purge_quiz(quiz_id, batch_size=2)
+        self.assertEqual((counts['answers_deleted'], counts['options_deleted']), (9, 12))
+        self.assertQuizRowsGone(quiz_id)
+        self.assertKeptQuizIntact()
+
+    def test_live_quiz_is_not_purged(self):
+        with self.assertRaises(ValueError):
+            purge_quiz(self.quiz.id)
+        self.assertTrue(Question.objects.filter(quiz=self.quiz).exists())
+
+    def test_admin_action_job_soft_deletes_first(self):
+        quiz_id = self.quiz.id
+        enqueue('delete_quizzes', Quiz.objects.filter(id=quiz_id))
+        run_pending_jobs()
+        self.assertQuizRowsGone(quiz_id)
+        self.assertTrue(Tombstone.objects.filter(model_name='quiz', object_id=quiz_id).exists())
+        self.assertKeptQuizIntact()
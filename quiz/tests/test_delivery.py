@@ -0,0 +1,116 @@
+import json
+
+from django.urls import reverse
+
+from quiz.delivery import apply_attempt_order, get_answer_key, get_quiz_payload, invalidate_quiz_payload
+from quiz.grading import ATTEMPT_STATUS_IN_PROGRESS
+from quiz.models import Option, Question, QuizAttempt
+
+from .base import QuizTestCase, make_attempt, make_quiz, make_student, make_teacher
+
+
+def question_ids(payload):
+    return [question['id'] for question in payload]
+
+
+class AttemptOrderTests(QuizTestCase):
+    def setUp(self):
+        super().setUp()
+        self.quiz = make_quiz(make_teacher(), questions=12, shuffle_questions=True, shuffle_options=True)
+        self.student = make_student()
+        self.attempt = make_attempt(self.student, self.quiz, correct=0, status=ATTEMPT_STATUS_IN_PROGRESS)
+
+    def ordered(self, attempt=None):
+        return apply_attempt_order(get_quiz_payload(self.quiz.id), attempt or self.attempt, self.quiz)
+
+    def test_same_attempt_sees_the_same_order(self):
+        first = self.ordered()
+        invalidate_quiz_payload(self.quiz.id)
+        self.assertEqual(self.ordered(), first)
+
+    def test_attempts_see_different_orders(self):
+        other = make_attempt(self.student, self.quiz, correct=0, status=ATTEMPT_STATUS_IN_PROGRESS)
+        self.assertNotEqual(question_ids(self.ordered()), question_ids(self.ordered(other)))
+        self.assertCountEqual(question_ids(self.ordered()), question_ids(self.ordered(other)))
+
+    def test_options_are_shuffled_within_their_question(self):
+        shared = {question['id']: question['options'] for question in get_quiz_payload(self.quiz.id)}
+        for question in self.ordered():
+            self.assertCountEqual(question['options'], shared[question['id']])
+
+    def test_shared_payload_is_not_mutated(self):
+        payload = get_quiz_payload(self.quiz.id)
+        before = [dict(question, options=list(question['options'])) for question in payload]
+        apply_attempt_order(payload, self.attempt, self.quiz)
+        self.assertEqual(payload, before)
+
+    def test_removing_a_question_keeps_the_others_in_order(self):
+        before = question_ids(self.ordered())
+        removed = before[len(before) // 2]
+        Question.objects.filter(id=removed).delete()
+        self.assertEqual(question_ids(self.ordered()), [question_id for question_id in before if question_id != removed])
+
+    def test_adding_a_question_keeps_the_others_in_order(self):
+        before = question_ids(self.ordered())
+        added = Question.objects.create(quiz=self.quiz, question_text='Added', order=99, correct_answer=0)
+        after = question_ids(self.ordered())
+        self.assertIn(added.id, after)
+        self.assertEqual([question_id for question_id in after if question_id != added.id], before)
+
+    def test_unshuffled_quiz_keeps_the_authored_order(self):
+        self.quiz.shuffle_questions = self.quiz.shuffle_options = False
+        payload = get_quiz_payload(self.quiz.id)
+        self.assertIs(apply_attempt_order(payload, self.attempt, self.quiz), payload)
+
+
+class PayloadInvalidationTests(QuizTestCase):
+    def setUp(self):
+        super().setUp()
+        self.quiz = make_quiz(make_teacher(), questions=2)
+        self.question = self.quiz.questions.order_by('order').first()
+        self.options = list(self.question.option_set.order_by('order'))
+        # Both are cached before anything is edited
+        get_quiz_payload(self.quiz.id)
+        get_answer_key(self.quiz.id)
+
+    def test_saving_an_option_refreshes_the_answer_key(self):
+        self.options[0].is_correct = False
+        self.options[0].save()
+        self.options[2].is_correct = True
+        self.options[2].save()
+        self.assertEqual(get_answer_key(self.quiz.id)[self.question.id][1][self.options[2].id], True)
+
+    def test_submission_is_graded_against_the_edited_key(self):
+        student = make_student()
+        self.client.force_login(student)
+        self.assertEqual(self.client.get(reverse('quiz:take_quiz', args=[self.quiz.id])).status_code, 200)
+        Option.objects.filter(question=self.question).exclude(id=self.options[2].id).update(is_correct=False)
+        self.options[2].is_correct = True
+        self.options[2].save()
+
+        response = self.client.post(
+            reverse('quiz:submit_quiz', args=[self.quiz.id]),
+            data=json.dumps({'answers': {str(self.question.id): self.options[2].id}, 'time_spent': 30}),
+            content_type='application/json',
+        )
+
+        self.assertEqual(response.status_code, 200)
+        attempt = QuizAttempt.objects.get(student=student, quiz=self.quiz)
+        self.assertEqual((attempt.score, attempt.correct_answers), (1, 1))
+
+    def test_question_and_option_edits_refresh_the_payload(self):
+        self.question.question_text = 'Reworded'
+        self.question.save()
+        removed_id = self.options[1].id
+        self.options[1].delete()
+        Option.objects.create(question=self.question, option_text='Added', order=9)
+        question = next(question for question in get_quiz_payload(self.quiz.id) if question['id'] == self.question.id)
+        self.assertEqual(question['text'], 'Reworded')
+        self.assertNotIn(removed_id, [option['id'] for option in question['options']])
+        self.assertIn('Added', [option['text'] for option in question['options']])
+
+    def test_bulk_writes_need_an_explicit_invalidation(self):
+        Option.objects.filter(question=self.question).update(option_text='Bulk')
+        self.assertNotEqual(get_quiz_payload(self.quiz.id)[0]['options'][0]['text'], 'Bulk')
+        invalidate_quiz_payload(self.quiz.id)
+        self.assertEqual(get_quiz_payload(self.quiz.id)[0]['options'][0]['text'], 'Bulk')
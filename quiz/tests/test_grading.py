@@ -0,0 +1,138 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from quiz.caching import SCOPE_STUDENT, SCOPE_TEACHER, generations
+from quiz.grading import (
+    ATTEMPT_STATUS_ABANDONED, ATTEMPT_STATUS_COMPLETED, ATTEMPT_STATUS_IN_PROGRESS, attempt_deadline, regrade_quiz,
+    sweep_expired_attempts,
+)
+from quiz.models import Option, Question, Quiz, QuizAttempt, StudentAnswer
+
+from .base import QuizTestCase, make_attempt, make_quiz, make_student, make_teacher
+
+
+class SweepExpiredAttemptsTests(QuizTestCase):
+    def setUp(self):
+        super().setUp()
+        self.quiz = make_quiz(make_teacher(), questions=4, time_limit=10)
+        self.student = make_student()
+        self.expired_start = timezone.now() - timedelta(hours=1)
+
+    def expired_attempt(self, answered=True):
+        if answered:
+            return make_attempt(self.student, self.quiz, correct=3, start_time=self.expired_start, status=ATTEMPT_STATUS_IN_PROGRESS)
+        return QuizAttempt.objects.create(student=self.student, quiz=self.quiz, start_time=self.expired_start)
+
+    def test_grades_answered_attempts_and_abandons_empty_ones(self):
+        answered = self.expired_attempt()
+        empty = self.expired_attempt(answered=False)
+        running = make_attempt(self.student, self.quiz, correct=1, status=ATTEMPT_STATUS_IN_PROGRESS)
+
+        stats = sweep_expired_attempts()
+
+        self.assertEqual((stats['completed'], stats['abandoned']), (1, 1))
+        answered.refresh_from_db()
+        self.assertEqual(answered.status, ATTEMPT_STATUS_COMPLETED)
+        self.assertEqual((answered.score, answered.max_score, answered.correct_answers), (3, 4, 3))
+        self.assertEqual(answered.percentage, 75)
+        self.assertTrue(answered.passed)
+        self.assertEqual(answered.end_time, attempt_deadline(answered.start_time, self.quiz.time_limit))
+        self.assertEqual(QuizAttempt.objects.get(id=empty.id).status, ATTEMPT_STATUS_ABANDONED)
+        self.assertEqual(QuizAttempt.objects.get(id=running.id).status, ATTEMPT_STATUS_IN_PROGRESS)
+
+    def test_attempts_inside_the_grace_period_stay_open(self):
+        within_grace = timezone.now() - timedelta(minutes=self.quiz.time_limit, seconds=10)
+        attempt = make_attempt(self.student, self.quiz, correct=2, start_time=within_grace, status=ATTEMPT_STATUS_IN_PROGRESS)
+        with self.settings(QUIZ_SETTINGS={'SUBMISSION_GRACE_SECONDS': 60}):
+            stats = sweep_expired_attempts()
+        self.assertEqual((stats['completed'], stats['abandoned']), (0, 0))
+        self.assertEqual(QuizAttempt.objects.get(id=attempt.id).status, ATTEMPT_STATUS_IN_PROGRESS)
+
+    def test_stops_at_the_limit(self):
+        for index in range(6):
+            self.expired_attempt(answered=index % 2 == 0)
+        for batch_size in (1, 2, 500):
+            with self.subTest(batch_size=batch_size):
+                stats = sweep_expired_attempts(batch_size=batch_size, limit=2)
+                self.assertEqual(stats['completed'] + stats['abandoned'], 2)
+        self.assertFalse(QuizAttempt.objects.filter(status=ATTEMPT_STATUS_IN_PROGRESS).exists())
+
+    def test_sweeping_twice_closes_nothing_new(self):
+        self.expired_attempt()
+        sweep_expired_attempts()
+        stats = sweep_expired_attempts()
+        self.assertEqual((stats['completed'], stats['abandoned']), (0, 0))
+
+
+class RegradeQuizTests(QuizTestCase):
+    def setUp(self):
+        super().setUp()
+        self.teacher = make_teacher()
+        self.quiz = make_quiz(self.teacher, questions=4, passing_marks=3)
+        self.student = make_student()
+        # Every attempt answers the first `correct` questions with option 0 and the rest with option 1
+        self.strong = make_attempt(self.student, self.quiz, correct=4)
+        self.weak = make_attempt(make_student('weak'), self.quiz, correct=0)
+        self.open = make_attempt(make_student('open'), self.quiz, correct=4, status=ATTEMPT_STATUS_IN_PROGRESS)
+        self.first_question = self.quiz.questions.order_by('order').first()
+
+    def test_changed_answer_key(self):
+        options = list(self.first_question.option_set.all())
+        Option.objects.filter(id=options[0].id).update(is_correct=False)
+        Option.objects.filter(id=options[1].id).update(is_correct=True)
+
+        result = regrade_quiz(self.quiz.id)
+
+        self.assertEqual(result['attempts_regraded'], 2)
+        self.strong.refresh_from_db()
+        self.assertEqual((self.strong.score, self.strong.correct_answers, self.strong.incorrect_answers), (3, 3, 1))
+        self.assertEqual(self.strong.percentage, 75)
+        self.assertTrue(self.strong.passed)
+        self.weak.refresh_from_db()
+        self.assertEqual((self.weak.score, self.weak.correct_answers, self.weak.percentage, self.weak.passed), (1, 1, 25, False))
+        self.assertFalse(StudentAnswer.objects.get(attempt=self.strong, question=self.first_question).is_correct)
+
+    def test_changed_marks(self):
+        Question.objects.filter(id=self.first_question.id).update(marks=4)
+
+        regrade_quiz(self.quiz.id)
+
+        self.strong.refresh_from_db()
+        self.assertEqual((self.strong.score, self.strong.max_score, self.strong.total_marks), (7, 7, 7))
+        self.assertEqual(self.strong.percentage, 100)
+        self.weak.refresh_from_db()
+        self.assertEqual((self.weak.score, self.weak.max_score, self.weak.percentage), (0, 7, 0))
+
+    def test_changed_passing_marks(self):
+        Quiz.objects.filter(id=self.quiz.id).update(passing_marks=5)
+        regrade_quiz(self.quiz.id)
+        self.strong.refresh_from_db()
+        self.assertEqual(self.strong.score, 4)
+        self.assertFalse(self.strong.passed)
+
+    def test_in_progress_attempts_are_left_alone(self):
+        Question.objects.filter(id=self.first_question.id).update(marks=4)
+        regrade_quiz(self.quiz.id)
+        self.open.refresh_from_db()
+        self.assertIsNone(self.open.score)
+        self.assertEqual(self.open.status, ATTEMPT_STATUS_IN_PROGRESS)
+
+    def test_dashboards_are_invalidated(self):
+        scopes = [(SCOPE_TEACHER, self.teacher.id), (SCOPE_STUDENT, self.student.id)]
+        before = generations(*scopes)
+        regrade_quiz(self.quiz.id)
+        for scope, old, new in zip(scopes, before, generations(*scopes)):
+            self.assertNotEqual(old, new, scope)
+
+    def test_dashboards_are_invalidated_in_one_cache_write(self):
+        with mock.patch.object(cache, 'set_many', wraps=cache.set_many) as set_many, \
+                mock.patch.object(cache, 'incr', wraps=cache.incr) as incr:
+            regrade_quiz(self.quiz.id)
+        incr.assert_not_called()
+        set_many.assert_called_once()
+        self.assertEqual(set(set_many.call_args.args[0]), {
+            f'gen:{SCOPE_TEACHER}:{self.teacher.id}', f'gen:{SCOPE_STUDENT}:{self.student.id}', f'gen:{SCOPE_STUDENT}:{self.weak.student_id}',
+        })
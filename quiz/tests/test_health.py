@@ -0,0 +1,101 @@
+from unittest import mock
+
+from django.test import override_settings
+from django.urls import reverse
+
+from quiz.health import DEFAULT_HEALTH, PROBES, ReadinessCache, health_config, run_checks
+
+from .base import QuizTestCase
+
+# Generous enough that a slow test machine never trips them
+RELAXED = {'db_read': 10_000, 'db_write': 10_000, 'cache': 10_000, 'queues': 10_000}
+
+
+def health(**overrides):
+    return override_settings(HEALTH={**DEFAULT_HEALTH, 'THRESHOLDS_MS': RELAXED, **overrides})
+
+
+class ReadinessTests(QuizTestCase):
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch('quizmaster.urls.readiness', ReadinessCache())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def ready(self):
+        return self.client.get(reverse('health_ready'))
+
+    @health()
+    def test_ready_when_every_probe_passes(self):
+        response = self.ready()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Cache-Control'], 'no-store')
+        checks = response.json()['checks']
+        self.assertEqual(set(checks), {'db_read', 'db_write', 'cache', 'queues'})
+        self.assertTrue(all(check['ok'] for check in checks.values()))
+
+    @health(THRESHOLDS_MS={'db_write': -1})
+    def test_probe_slower_than_its_threshold_is_unready(self):
+        response = self.ready()
+        self.assertEqual(response.status_code, 503)
+        checks = response.json()['checks']
+        self.assertFalse(checks['db_write']['ok'])
+        self.assertEqual(checks['db_write']['threshold_ms'], -1)
+        # Unset thresholds keep their defaults
+        self.assertEqual(checks['db_read']['threshold_ms'], DEFAULT_HEALTH['THRESHOLDS_MS']['db_read'])
+
+    @health()
+    def test_failing_probe_reports_its_error(self):
+        def broken_cache():
+            raise ConnectionError('cache unreachable')
+
+        probes = [(name, broken_cache if name == 'cache' else probe) for name, probe in PROBES]
+        with mock.patch('quiz.health.PROBES', probes):
+            response = self.ready()
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json()['checks']['cache'], {'ok': False, 'error': 'ConnectionError: cache unreachable'})
+
+    @health(MAX_QUEUE_DEPTH=5)
+    def test_deep_queue_is_unready(self):
+        with mock.patch('quiz.health.queue_depths', return_value={'logging': 0, 'jobs': 6}):
+            response = self.ready()
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json()['checks']['queues']['depths'], {'logging': 0, 'jobs': 6})
+
+    def test_liveness_checks_nothing(self):
+        with mock.patch('quiz.health.run_checks') as checks:
+            response = self.client.get(reverse('health_live'))
+        self.assertEqual((response.status_code, response.json()), (200, {'status': 'alive'}))
+        checks.assert_not_called()
+
+
+class ReadinessCacheTests(QuizTestCase):
+    @health(CACHE_SECONDS=60)
+    def test_result_is_reused_until_it_expires(self):
+        readiness = ReadinessCache()
+        with mock.patch('quiz.health.run_checks', wraps=run_checks) as checks:
+            first = readiness.get()
+            self.assertIs(readiness.get(), first)
+            self.assertEqual(checks.call_count, 1)
+            readiness._expires = 0
+            readiness.get()
+        self.assertEqual(checks.call_count, 2)
+
+    @health()
+    def test_other_threads_answer_with_the_last_result_while_one_probes(self):
+        readiness = ReadinessCache()
+        first = readiness.get()
+        readiness._expires = 0
+        readiness._lock.acquire()
+        try:
+            with mock.patch('quiz.health.run_checks') as checks:
+                self.assertIs(readiness.get(), first)
+            checks.assert_not_called()
+        finally:
+            readiness._lock.release()
+
+    @health(THRESHOLDS_MS={'cache': 5})
+    def test_config_merges_thresholds_with_the_defaults(self):
+        thresholds = health_config()['THRESHOLDS_MS']
+        self.assertEqual(thresholds['cache'], 5)
+        self.assertEqual(thresholds['db_write'], DEFAULT_HEALTH['THRESHOLDS_MS']['db_write'])
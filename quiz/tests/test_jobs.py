@@ -0,0 +1,188 @@
+import csv
+import shutil
+import tempfile
+from datetime import timedelta
+from unittest import mock
+
+from django.db.models import Q
+from django.utils import timezone
+
+from quiz.jobs import (
+    OPERATIONS, cancel_jobs, delete_quizzes, enqueue, export_attempts, export_path, operation, regrade_quizzes,
+    requeue_stale_jobs, run_pending_jobs,
+)
+from quiz.models import BackgroundJob, Quiz, QuizAttempt
+
+from .base import QuizTestCase, make_attempt, make_quiz, make_student, make_teacher
+
+
+class JobRunnerTests(QuizTestCase):
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.dict(OPERATIONS)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.seen = []
+        operation('touch_quizzes', Quiz, 'Record quizzes', chunk_size=2)(self.touch)
+
+        self.teacher = make_teacher()
+        self.quizzes = [make_quiz(self.teacher, questions=1, title=f'Quiz {index}') for index in range(5)]
+
+    def touch(self, quizzes, job):
+        ids = list(quizzes.order_by('id').values_list('id', flat=True))
+        self.seen.extend(ids)
+        return {'touched': len(ids), 'last_chunk': ids}
+
+    def test_runs_every_row_in_chunks(self):
+        job = enqueue('touch_quizzes', Quiz.objects.all())
+        self.assertEqual((job.total, job.max_pk), (5, self.quizzes[-1].id))
+
+        self.assertEqual(run_pending_jobs(), 1)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'completed')
+        self.assertEqual(self.seen, [quiz.id for quiz in self.quizzes])
+        self.assertEqual((job.processed, job.progress), (5, 100))
+        # Counts add up across chunks; anything else keeps the last chunk's value
+        self.assertEqual(job.result, {'touched': 5, 'last_chunk': [self.quizzes[-1].id]})
+
+    def test_rows_added_or_unmatched_after_queueing_are_skipped(self):
+        job = enqueue('touch_quizzes', Quiz.objects.filter(title__startswith='Quiz'))
+        Quiz.objects.filter(id=self.quizzes[0].id).update(title='Renamed')
+        late = make_quiz(self.teacher, questions=1, title='Quiz late')
+        run_pending_jobs()
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'completed')
+        self.assertEqual(self.seen, [quiz.id for quiz in self.quizzes[1:]])
+        self.assertNotIn(late.id, self.seen)
+
+    def test_selection_is_stored_as_json_filters(self):
+        job = enqueue('touch_quizzes', Quiz.objects.filter(title__startswith='Quiz', id__in={quiz.id for quiz in self.quizzes[1:]}))
+        job.refresh_from_db()
+        self.assertEqual(job.model, 'quiz.Quiz')
+        self.assertEqual(job.filters, {
+            'deleted_at__isnull': True, 'title__startswith': 'Quiz', 'id__in': [quiz.id for quiz in self.quizzes[1:]],
+        })
+        self.assertEqual((job.min_pk, job.max_pk), (self.quizzes[1].id, self.quizzes[-1].id))
+
+    def test_other_queries_are_stored_as_the_rows_they_match(self):
+        # A changelist search ORs its lookups, which kwargs cannot express
+        job = enqueue('touch_quizzes', Quiz.objects.filter(Q(title='Quiz 1') | Q(title='Quiz 3')))
+        job.refresh_from_db()
+        self.assertEqual(job.filters, {'pk__in': [self.quizzes[1].id, self.quizzes[3].id]})
+        run_pending_jobs()
+        self.assertEqual(self.seen, [self.quizzes[1].id, self.quizzes[3].id])
+
+    def test_wrong_model_is_refused(self):
+        with self.assertRaises(ValueError):
+            enqueue('touch_quizzes', QuizAttempt.objects.all())
+
+    def test_stale_job_resumes_after_its_last_chunk(self):
+        job = enqueue('touch_quizzes', Quiz.objects.all())
+        # A runner died after saving the first chunk
+        BackgroundJob.objects.filter(id=job.id).update(
+            status='running', worker='gone:1', processed=2, last_pk=self.quizzes[1].id, result={'touched': 2},
+            heartbeat_at=timezone.now() - timedelta(hours=1),
+        )
+        run_pending_jobs()
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'completed')
+        self.assertEqual(self.seen, [quiz.id for quiz in self.quizzes[2:]])
+        self.assertEqual((job.processed, job.result['touched']), (5, 5))
+
+    def test_long_chunks_keep_the_heartbeat_fresh(self):
+        for name, handler in (('regrade_quizzes', regrade_quizzes), ('delete_quizzes', delete_quizzes)):
+            with self.subTest(operation=name):
+                quiz = make_quiz(self.teacher, questions=2)
+                make_attempt(make_student(f'student-{name}'), quiz, correct=1)
+                job = enqueue(name, Quiz.objects.filter(id=quiz.id))
+                stale = timezone.now() - timedelta(hours=1)
+                BackgroundJob.objects.filter(id=job.id).update(status='running', worker='busy:1', heartbeat_at=stale)
+                job.refresh_from_db()
+
+                handler(Quiz.all_objects.filter(id=quiz.id), job)
+
+                # The runner is still busy with this chunk, so it is not requeued
+                self.assertEqual(requeue_stale_jobs(), 0)
+                self.assertGreater(BackgroundJob.objects.get(id=job.id).heartbeat_at, stale)
+
+    def test_cancelled_before_it_runs(self):
+        job = enqueue('touch_quizzes', Quiz.objects.all())
+        self.assertEqual(cancel_jobs(BackgroundJob.objects.filter(id=job.id)), (1, 0))
+        self.assertEqual(run_pending_jobs(), 0)
+        self.assertEqual(self.seen, [])
+
+    def test_cancelled_while_running_stops_after_the_chunk(self):
+        def touch_then_cancel(quizzes, job):
+            cancel_jobs(BackgroundJob.objects.filter(id=job.id))
+            return self.touch(quizzes, job)
+        operation('touch_then_cancel', Quiz, 'Record quizzes, then cancel', chunk_size=2)(touch_then_cancel)
+
+        job = enqueue('touch_then_cancel', Quiz.objects.all())
+        run_pending_jobs()
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'cancelled')
+        self.assertEqual((job.processed, job.last_pk), (2, self.quizzes[1].id))
+
+    def test_failing_handler_fails_the_job(self):
+        def explode(quizzes, job):
+            raise RuntimeError('boom')
+        operation('explode', Quiz, 'Fail')(explode)
+
+        job = enqueue('explode', Quiz.objects.all())
+        run_pending_jobs()
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+        self.assertIn('RuntimeError: boom', job.error)
+        self.assertEqual(job.processed, 0)
+
+
+class BuiltInOperationTests(QuizTestCase):
+    def setUp(self):
+        super().setUp()
+        self.export_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.export_dir, ignore_errors=True)
+        self.teacher = make_teacher()
+        self.quiz = make_quiz(self.teacher)
+
+    def test_archive_quizzes(self):
+        other = make_quiz(self.teacher, status='draft')
+        job = enqueue('archive_quizzes', Quiz.objects.all())
+        run_pending_jobs()
+        job.refresh_from_db()
+        self.assertEqual(job.result, {'archived': 2})
+        self.assertEqual(set(Quiz.objects.values_list('status', flat=True)), {'archived'})
+        self.assertEqual(Quiz.objects.get(id=other.id).status, 'archived')
+
+    def test_export_attempts_across_chunks(self):
+        attempts = [make_attempt(make_student(f'student{index}'), self.quiz, correct=index % 4) for index in range(5)]
+        with self.settings(JOBS={'CHUNK_SIZE': 2, 'EXPORT_DIR': self.export_dir}):
+            job = enqueue('export_attempts', QuizAttempt.objects.all())
+            run_pending_jobs()
+            job.refresh_from_db()
+            with open(export_path(job), newline='', encoding='utf-8') as f:
+                rows = list(csv.reader(f))
+        self.assertEqual(job.status, 'completed')
+        self.assertEqual(job.result['exported'], 5)
+        self.assertEqual(rows[0][:2], ['id', 'quiz_id'])
+        self.assertEqual([int(row[0]) for row in rows[1:]], [attempt.id for attempt in attempts])
+
+    def test_resumed_export_drops_rows_written_after_the_last_chunk(self):
+        attempts = [make_attempt(make_student(f'student{index}'), self.quiz, correct=index % 4) for index in range(5)]
+        with self.settings(JOBS={'CHUNK_SIZE': 2, 'EXPORT_DIR': self.export_dir}):
+            job = enqueue('export_attempts', QuizAttempt.objects.all())
+            # A runner saved its first chunk, then died after writing the second
+            job.result = export_attempts(QuizAttempt.objects.filter(id__in=[attempt.id for attempt in attempts[:2]]), job)
+            job.processed = 2
+            BackgroundJob.objects.filter(id=job.id).update(
+                status='running', worker='gone:1', processed=2, last_pk=attempts[1].id, result=job.result,
+                heartbeat_at=timezone.now() - timedelta(hours=1),
+            )
+            export_attempts(QuizAttempt.objects.filter(id__in=[attempt.id for attempt in attempts[2:4]]), job)
+
+            run_pending_jobs()
+            job.refresh_from_db()
+            with open(export_path(job), newline='', encoding='utf-8') as f:
+                rows = list(csv.reader(f))
+        self.assertEqual(job.status, 'completed')
+        self.assertEqual([int(row[0]) for row in rows[1:]], [attempt.id for attempt in attempts])
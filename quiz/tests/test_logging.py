@@ -0,0 +1,72 @@
+import io
+import json
+import logging
+from unittest import mock
+
+from django.test import SimpleTestCase
+from django.urls import reverse
+
+from quiz.structured_logging import JsonFormatter, QueuedHandler, RequestIdFilter, request_id_var
+
+from .base import QuizTestCase
+
+
+class QueuedHandlerTests(SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        self.stream = io.StringIO()
+        self.handler = QueuedHandler({'class': 'logging.StreamHandler', 'stream': self.stream})
+        self.handler.setFormatter(JsonFormatter())
+        self.handler.addFilter(RequestIdFilter())
+        self.addCleanup(self.handler.close)
+        self.logger = logging.Logger('quiz.tests.logging')
+        self.logger.addHandler(self.handler)
+
+    def records(self):
+        self.handler.stop()
+        return [json.loads(line) for line in self.stream.getvalue().splitlines()]
+
+    def test_records_are_written_as_json_lines(self):
+        token = request_id_var.set('req-1')
+        try:
+            self.logger.warning('Graded %s answers', 12, extra={'quiz_id': 7})
+        finally:
+            request_id_var.reset(token)
+        [record] = self.records()
+        self.assertEqual(record['message'], 'Graded 12 answers')
+        self.assertEqual((record['level'], record['logger']), ('WARNING', 'quiz.tests.logging'))
+        self.assertEqual((record['request_id'], record['quiz_id']), ('req-1', 7))
+
+    def test_message_is_fixed_when_logged(self):
+        answers = ['a']
+        self.logger.warning('Answers %s', answers)
+        answers.append('b')
+        self.assertEqual(self.records()[0]['message'], "Answers ['a']")
+
+    def test_exceptions_carry_their_traceback(self):
+        try:
+            raise ValueError('bad option')
+        except ValueError:
+            self.logger.exception('Grading failed')
+        record = self.records()[0]
+        self.assertIn('ValueError: bad option', record['exception'])
+        self.assertIsNone(record['request_id'])
+
+    def test_full_queue_drops_instead_of_blocking(self):
+        handler = QueuedHandler({'class': 'logging.StreamHandler', 'stream': io.StringIO()}, queue_size=1)
+        self.addCleanup(handler.close)
+        with mock.patch.object(handler, '_ensure_listener'):
+            for _ in range(3):
+                handler.handle(logging.makeLogRecord({'msg': 'busy'}))
+        self.assertEqual((handler.queue.qsize(), handler.dropped), (1, 2))
+
+
+class RequestIdTests(QuizTestCase):
+    def test_every_response_carries_a_request_id(self):
+        first, second = self.client.get(reverse('home')), self.client.get(reverse('home'))
+        self.assertRegex(first['X-Request-ID'], r'^[0-9a-f]{32}$')
+        self.assertNotEqual(first['X-Request-ID'], second['X-Request-ID'])
+
+    def test_proxy_request_id_is_kept_when_well_formed(self):
+        self.assertEqual(self.client.get(reverse('home'), HTTP_X_REQUEST_ID='lb-42.a')['X-Request-ID'], 'lb-42.a')
+        self.assertRegex(self.client.get(reverse('home'), HTTP_X_REQUEST_ID='bad id')['X-Request-ID'], r'^[0-9a-f]{32}$')
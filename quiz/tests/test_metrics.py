@@ -0,0 +1,102 @@
+import json
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from quiz import metrics
+from quiz.metrics import AGGREGATE_FILE, MetricsRegistry, render
+
+REQUESTS = 'quizmaster_http_requests_total'
+LATENCY = 'quizmaster_http_request_duration_seconds'
+IN_FLIGHT = 'quizmaster_admission_in_flight'
+
+
+class MetricsAggregationTests(SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        settings_patcher = override_settings(METRICS={'ENABLED': True, 'DIRECTORY': self.directory})
+        settings_patcher.enable()
+        self.addCleanup(settings_patcher.disable)
+        # A registry of our own, with no flusher thread left running after the test
+        self.registry = MetricsRegistry()
+        patchers = [
+            mock.patch.object(metrics, 'registry', self.registry),
+            mock.patch.object(metrics, 'GAUGE_SOURCES', []),
+            mock.patch('quiz.metrics.threading.Thread'),
+        ]
+        for patcher in patchers:
+            self.addCleanup(patcher.stop)
+        _, _, self.thread = [patcher.start() for patcher in patchers]
+
+    def write_worker(self, name, counters=(), histograms=(), gauges=()):
+        with open(os.path.join(self.directory, name), 'w') as f:
+            json.dump({'counters': list(counters), 'histograms': list(histograms), 'gauges': list(gauges)}, f)
+
+    def requests(self, counters, status='200'):
+        return counters.get((REQUESTS, (('method', 'GET'), ('status', status), ('view', 'home'))))
+
+    def test_recording_stays_in_memory(self):
+        with mock.patch('quiz.metrics._write_json') as write:
+            for _ in range(3):
+                metrics.inc(REQUESTS, {'view': 'home', 'method': 'GET', 'status': '200'})
+                metrics.observe(LATENCY, 0.02, {'view': 'home'})
+        write.assert_not_called()
+        # One flusher thread per worker, however many values are recorded
+        self.thread.assert_called_once()
+        self.assertEqual(self.thread.call_args.kwargs['target'], self.registry._flush_loop)
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_flush_writes_this_workers_file(self):
+        metrics.inc(REQUESTS, {'view': 'home', 'method': 'GET', 'status': '200'}, amount=2)
+        self.registry.flush()
+        with open(os.path.join(self.directory, self.registry.file_name)) as f:
+            state = json.load(f)
+        self.assertEqual(state['counters'], [[REQUESTS, [['method', 'GET'], ['status', '200'], ['view', 'home']], 2]])
+
+    def test_collect_sums_every_worker_and_the_aggregate(self):
+        labels = [['method', 'GET'], ['status', '200'], ['view', 'home']]
+        metrics.inc(REQUESTS, {'view': 'home', 'method': 'GET', 'status': '200'})
+        metrics.observe(LATENCY, 0.02, {'view': 'home'})
+        # The parent process stands in for another live worker
+        self.write_worker(
+            f'worker-{os.getppid()}-1.json', counters=[[REQUESTS, labels, 3]],
+            histograms=[[LATENCY, [['view', 'home']], {'buckets': [0, 0, 0, 0, 0, 1, 0, 0, 0, 0, 0], 'sum': 0.2, 'count': 1}]],
+            gauges=[[IN_FLIGHT, [['route_class', 'read']], 4]],
+        )
+        self.write_worker(AGGREGATE_FILE, counters=[[REQUESTS, labels, 5]])
+
+        counters, histograms, gauges = self.registry.collect()
+
+        self.assertEqual(self.requests(counters), 9)
+        histogram = histograms[(LATENCY, (('view', 'home'),))]
+        self.assertEqual((histogram['count'], histogram['buckets'][2], histogram['buckets'][5]), (2, 1, 1))
+        self.assertAlmostEqual(histogram['sum'], 0.22)
+        self.assertEqual(gauges, {(IN_FLIGHT, (('route_class', 'read'),)): 4})
+
+    def test_exited_worker_is_folded_into_the_aggregate_once(self):
+        labels = [['method', 'GET'], ['status', '500'], ['view', 'home']]
+        # An earlier worker under this same pid has exited
+        dead = f'worker-{os.getpid()}-1.json'
+        self.write_worker(dead, counters=[[REQUESTS, labels, 7]], gauges=[[IN_FLIGHT, [['route_class', 'read']], 2]])
+
+        counters, _, gauges = self.registry.collect()
+        self.assertEqual(self.requests(counters, '500'), 7)
+        self.assertEqual(gauges, {})
+        self.assertNotIn(dead, os.listdir(self.directory))
+        self.assertEqual(self.requests(self.registry.collect()[0], '500'), 7)
+
+    def test_render_exposes_cumulative_buckets(self):
+        for value in (0.003, 0.02, 20):
+            metrics.observe(LATENCY, value, {'view': 'home'})
+        text = render({'payload': {'hits': 3, 'misses': 1}})
+        self.assertIn(f'{LATENCY}_bucket{{view="home",le="0.005"}} 1', text)
+        self.assertIn(f'{LATENCY}_bucket{{view="home",le="0.025"}} 2', text)
+        self.assertIn(f'{LATENCY}_bucket{{view="home",le="10.0"}} 2', text)
+        self.assertIn(f'{LATENCY}_bucket{{view="home",le="+Inf"}} 3', text)
+        self.assertIn(f'{LATENCY}_count{{view="home"}} 3', text)
+        self.assertIn('quizmaster_cache_requests_total{kind="payload",result="hit"} 3', text)
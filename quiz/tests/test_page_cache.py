@@ -0,0 +1,58 @@
+from unittest import mock
+
+from django.test import override_settings
+from django.urls import reverse
+
+from .base import QuizTestCase, make_student
+
+
+class AnonymousPageCacheTests(QuizTestCase):
+    def setUp(self):
+        super().setUp()
+        self.url = reverse('home')
+        patcher = mock.patch('quiz.page_cache.record')
+        self.record = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def lookups(self):
+        """Hit (True) or miss (False) of every page cache lookup so far."""
+        return [call.args[1] for call in self.record.call_args_list]
+
+    def test_repeat_visits_are_served_from_the_cache(self):
+        first = self.client.get(self.url)
+        second = self.client.get(self.url)
+        self.assertEqual(self.lookups(), [False, True])
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second['ETag'], first['ETag'])
+        self.assertIn('Cookie', second['Vary'])
+        self.assertIn('public', second['Cache-Control'])
+
+    def test_matching_etag_gets_a_304(self):
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH='"stale"').status_code, 200)
+
+    def test_last_modified_gets_a_304(self):
+        last_modified = self.client.get(self.url)['Last-Modified']
+        self.assertEqual(self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+
+    def test_signed_in_users_bypass_the_cache(self):
+        self.client.get(self.url)
+        self.client.force_login(make_student())
+        response = self.client.get(self.url)
+        self.assertEqual(self.lookups(), [False])
+        self.assertFalse(response.has_header('ETag'))
+
+    def test_a_new_build_misses_the_old_pages(self):
+        self.client.get(self.url)
+        with override_settings(BUILD_VERSION='next'):
+            self.client.get(self.url)
+        self.assertEqual(self.lookups(), [False, False])
+
+    def test_disabled_cache_is_skipped(self):
+        with override_settings(PAGE_CACHE={'ENABLED': False}):
+            response = self.client.get(self.url)
+        self.assertEqual(self.lookups(), [])
+        self.assertFalse(response.has_header('ETag'))
@@ -0,0 +1,85 @@
+import json
+import os
+import shutil
+import tempfile
+
+from django.contrib.auth.models import User
+from django.test import override_settings
+from django.urls import reverse
+
+from quiz.models import Teacher
+from quiz.profiling import DEFAULT_PROFILING, profile_path, prune_profiles
+
+from .base import PASSWORD, QuizTestCase, make_student
+
+
+class ProfilingTests(QuizTestCase):
+    def setUp(self):
+        super().setUp()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.staff = User.objects.create_user('staff', password=PASSWORD, is_staff=True)
+        self.url = reverse('quiz:student_dashboard')
+
+    def profiling(self, **overrides):
+        return override_settings(PROFILING={**DEFAULT_PROFILING, 'ENABLED': True, 'DIRECTORY': self.directory, **overrides})
+
+    def saved(self):
+        return sorted(name[:-5] for name in os.listdir(self.directory) if name.endswith('.json'))
+
+    def test_staff_request_is_profiled_on_demand(self):
+        self.client.force_login(self.staff)
+        Teacher.objects.create(user=self.staff)
+        with self.profiling():
+            profile_id = self.client.get(reverse('quiz:teacher_dashboard'), HTTP_X_PROFILE='1')['X-Profile-Id']
+            for suffix in ('.prof', '.collapsed'):
+                self.assertIsNotNone(profile_path(profile_id, suffix))
+        self.assertEqual(self.saved(), [profile_id])
+        with open(os.path.join(self.directory, f'{profile_id}.json')) as f:
+            details = json.load(f)
+        self.assertEqual((details['view'], details['trigger'], details['user']), ('quiz:teacher_dashboard', 'staff', 'staff'))
+        self.assertEqual(details['queries'], len(details['sql']))
+        self.assertGreater(details['queries'], 0)
+
+    def test_saved_profiles_are_listed_for_staff(self):
+        self.client.force_login(self.staff)
+        with self.profiling():
+            profile_id = self.client.get(f'{self.url}?_profile')['X-Profile-Id']
+            listing = self.client.get(reverse('profile_list'))
+            detail = self.client.get(reverse('profile_detail', args=[profile_id]))
+            download = self.client.get(reverse('profile_download', args=[profile_id, 'collapsed']))
+        self.assertContains(listing, profile_id)
+        self.assertContains(detail, 'cumulative')
+        self.assertEqual(download.status_code, 200)
+
+    def test_other_users_cannot_ask_for_a_profile(self):
+        self.client.force_login(make_student())
+        with self.profiling():
+            response = self.client.get(self.url, HTTP_X_PROFILE='1')
+            self.assertEqual(self.client.get(reverse('profile_list')).status_code, 302)
+        self.assertFalse(response.has_header('X-Profile-Id'))
+        self.assertEqual(self.saved(), [])
+
+    def test_every_nth_request_is_sampled_quietly(self):
+        self.client.force_login(make_student())
+        with self.profiling(SAMPLE_EVERY=2):
+            responses = [self.client.get(self.url) for _ in range(4)]
+        self.assertEqual(len(self.saved()), 2)
+        self.assertFalse(any(response.has_header('X-Profile-Id') for response in responses))
+
+    def test_disabled_profiling_saves_nothing(self):
+        self.client.force_login(self.staff)
+        self.client.get(self.url, HTTP_X_PROFILE='1')
+        self.assertEqual(self.saved(), [])
+
+    def test_only_the_newest_profiles_are_kept(self):
+        for profile_id in ('a', 'b', 'c'):
+            for suffix in ('.json', '.prof', '.collapsed'):
+                open(os.path.join(self.directory, profile_id + suffix), 'w').close()
+        prune_profiles(self.directory, keep=2)
+        self.assertEqual(self.saved(), ['b', 'c'])
+        self.assertFalse(os.path.exists(os.path.join(self.directory, 'a.prof')))
+
+    def test_malformed_ids_are_refused(self):
+        with self.profiling():
+            self.assertIsNone(profile_path('../secrets', '.json'))
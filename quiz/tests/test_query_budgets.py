@@ -0,0 +1,78 @@
+"""
+Every @query_budget view, loaded against a seeded dataset
+
+The budgets are declared next to the views; these tests make them fail the
+build instead of only logging a warning. Each view is loaded twice, first
+with the caches empty after sign-in and then with them warm.
+"""
+
+import json
+from io import StringIO
+
+from django.core.management import call_command
+from django.urls import reverse
+
+from quiz.models import Quiz, QuizAttempt, Teacher
+from quiz.query_budget import assert_within_query_budget, enforce_query_budgets
+
+from .base import PASSWORD, QuizTestCase, make_attempt, make_quiz, make_student
+
+SEED_PASSWORD = 'benchmark-pass'
+
+
+@enforce_query_budgets()
+class QueryBudgetTests(QuizTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        call_command(
+            'seed_dataset', teachers=2, students=8, quizzes_per_teacher=3, questions=5, options=4,
+            attempts_per_student=4, completion_rate=0.75, prefix='budget', password=SEED_PASSWORD, seed=7,
+            stdout=StringIO(),
+        )
+        cls.teacher = Teacher.objects.select_related('user').get(user__username='budget_t1')
+        cls.quiz = Quiz.objects.filter(created_by=cls.teacher).order_by('id').first()
+        cls.student = make_student()
+        cls.completed = make_attempt(cls.student, cls.quiz, correct=3)
+        cls.fresh_quiz = make_quiz(cls.teacher, questions=5, title='Unattempted')
+
+    def login(self, role, username, password):
+        # The login views store the role in the session, as a real sign-in would
+        response = self.client.post(reverse(f'quiz:{role}_login'), {'username': username, 'password': password})
+        self.assertEqual(response.status_code, 302)
+
+    def assertWithinBudget(self, method, url, **kwargs):
+        for state in ('cold', 'warm'):
+            with self.subTest(url=url, cache=state):
+                response = getattr(self.client, method)(url, **kwargs)
+                self.assertEqual(response.status_code, 200)
+                assert_within_query_budget(response)
+        return response
+
+    def test_teacher_views(self):
+        self.login('teacher', self.teacher.user.username, SEED_PASSWORD)
+        self.assertWithinBudget('get', reverse('quiz:teacher_dashboard'))
+        self.assertWithinBudget('get', reverse('quiz:manage_quizzes'))
+        self.assertWithinBudget('get', reverse('quiz:manage_questions', args=[self.quiz.id]))
+        self.assertWithinBudget('get', reverse('quiz:view_quiz_results', args=[self.quiz.id]))
+
+    def test_student_views(self):
+        self.login('student', self.student.username, PASSWORD)
+        self.assertWithinBudget('get', reverse('quiz:student_dashboard'))
+        self.assertWithinBudget('get', reverse('quiz:quiz_result', args=[self.completed.id]))
+
+    def test_take_and_submit(self):
+        self.login('student', self.student.username, PASSWORD)
+        self.assertWithinBudget('get', reverse('quiz:take_quiz', args=[self.fresh_quiz.id]))
+
+        answers = {
+            str(question.id): question.option_set.order_by('order').first().id
+            for question in self.fresh_quiz.questions.all()
+        }
+        response = self.client.post(
+            reverse('quiz:submit_quiz', args=[self.fresh_quiz.id]),
+            data=json.dumps({'answers': answers, 'time_spent': 60}), content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+        assert_within_query_budget(response)
+        attempt = QuizAttempt.objects.filter(student=self.student, quiz=self.fresh_quiz).latest('id')
+        self.assertEqual(attempt.correct_answers, 5)
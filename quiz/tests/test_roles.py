@@ -0,0 +1,77 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.urls import reverse
+
+from quiz.models import Student, Teacher, UserProfile
+from quiz.roles import ROLE_SESSION_KEY, resolve_role
+
+from .base import PASSWORD, QuizTestCase, make_student, make_teacher
+
+
+class ResolveRoleTests(QuizTestCase):
+    def test_one_query_finds_the_role_and_profile_ids(self):
+        teacher = make_teacher()
+        with self.assertNumQueries(1):
+            info = resolve_role(teacher.user)
+        self.assertEqual(info, {'user_id': teacher.user.id, 'role': 'teacher', 'teacher_id': teacher.id, 'student_id': None})
+
+    def test_teacher_profile_wins_over_student_profile(self):
+        teacher = make_teacher()
+        student = Student.objects.create(user=teacher.user)
+        info = resolve_role(teacher.user)
+        self.assertEqual((info['role'], info['teacher_id'], info['student_id']), ('teacher', teacher.id, student.id))
+
+    def test_users_without_a_profile_fall_back_to_user_profile(self):
+        user = User.objects.create_user('legacy', password=PASSWORD)
+        UserProfile.objects.create(user=user, role='student')
+        self.assertEqual(resolve_role(user)['role'], 'student')
+        self.assertIsNone(resolve_role(User.objects.create_user('nobody'))['role'])
+
+
+class SessionRoleTests(QuizTestCase):
+    def setUp(self):
+        super().setUp()
+        self.student = make_student()
+
+    def login(self):
+        response = self.client.post(reverse('quiz:student_login'), {'username': 'student', 'password': PASSWORD})
+        self.assertRedirects(response, reverse('quiz:student_dashboard'), fetch_redirect_response=False)
+
+    def test_login_stores_the_role_in_the_session(self):
+        self.login()
+        info = self.client.session[ROLE_SESSION_KEY]
+        self.assertEqual((info['role'], info['student_id']), ('student', self.student.student.id))
+
+    def test_requests_reuse_the_session_role(self):
+        self.login()
+        with mock.patch('quiz.roles.resolve_role', wraps=resolve_role) as resolve:
+            self.client.get(reverse('quiz:student_dashboard'))
+            response = self.client.get(reverse('quiz:student_profile'))
+        resolve.assert_not_called()
+        self.assertEqual(response.wsgi_request.role, 'student')
+        self.assertEqual(response.wsgi_request.student_id, self.student.student.id)
+
+    def test_new_profile_refreshes_every_session(self):
+        self.login()
+        Teacher.objects.create(user=self.student)
+        response = self.client.get(reverse('quiz:student_profile'))
+        self.assertEqual(response.wsgi_request.role, 'teacher')
+        self.assertEqual(self.client.session[ROLE_SESSION_KEY]['role'], 'teacher')
+
+    def test_wrong_role_is_redirected(self):
+        self.login()
+        response = self.client.get(reverse('quiz:teacher_dashboard'))
+        self.assertRedirects(response, reverse('home'), fetch_redirect_response=False)
+
+    def test_anonymous_users_are_sent_to_sign_in(self):
+        response = self.client.get(reverse('quiz:student_dashboard'))
+        self.assertEqual(response.status_code, 302)
+        self.assertIn('login', response['Location'])
+
+    def test_teacher_profile_loads_lazily(self):
+        teacher = make_teacher()
+        self.client.post(reverse('quiz:teacher_login'), {'username': 'teacher', 'password': PASSWORD})
+        response = self.client.get(reverse('quiz:teacher_profile'))
+        self.assertEqual(response.wsgi_request.teacher.id, teacher.id)
+        self.assertIs(response.wsgi_request.teacher.user, response.wsgi_request.user)
@@ -0,0 +1,88 @@
+import gzip
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.http import Http404
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from django.utils.http import http_date
+
+from quiz.static_views import IMMUTABLE_MAX_AGE, UNHASHED_MAX_AGE, accepted_encodings, serve_static
+from quiz.storage import minify_css
+
+SCRIPT = b'function hello() {\n    return "hello";\n}\n' * 20
+
+
+class ServeStaticTests(SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+        settings_patcher = override_settings(STATIC_ROOT=self.root)
+        settings_patcher.enable()
+        self.addCleanup(settings_patcher.disable)
+        os.makedirs(os.path.join(self.root, 'js'))
+        self.write('js/app.abc123def456.js', SCRIPT)
+        self.write('js/app.abc123def456.js.gz', gzip.compress(SCRIPT))
+        self.write('js/app.abc123def456.js.br', b'brotli bytes')
+        self.write('js/plain.js', SCRIPT)
+        hashed = mock.patch('quiz.static_views.hashed_names', return_value=frozenset({'js/app.abc123def456.js'}))
+        hashed.start()
+        self.addCleanup(hashed.stop)
+        self.factory = RequestFactory()
+
+    def write(self, name, data):
+        with open(os.path.join(self.root, name), 'wb') as f:
+            f.write(data)
+
+    def get(self, path, **headers):
+        return serve_static(self.factory.get(f'/static/{path}', **headers), path)
+
+    def body(self, response):
+        return b''.join(response.streaming_content)
+
+    def test_hashed_names_are_immutable(self):
+        response = self.get('js/app.abc123def456.js')
+        self.assertIn(f'max-age={IMMUTABLE_MAX_AGE}', response['Cache-Control'])
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertEqual(response['Content-Type'], 'text/javascript; charset=utf-8')
+
+    def test_unhashed_names_get_a_short_max_age(self):
+        response = self.get('js/plain.js')
+        self.assertIn(f'max-age={UNHASHED_MAX_AGE}', response['Cache-Control'])
+        self.assertNotIn('immutable', response['Cache-Control'])
+        self.assertFalse(response.has_header('Vary'))
+
+    def test_best_accepted_variant_is_served(self):
+        response = self.get('js/app.abc123def456.js', HTTP_ACCEPT_ENCODING='gzip, deflate, br')
+        self.assertEqual((response['Content-Encoding'], self.body(response)), ('br', b'brotli bytes'))
+        response = self.get('js/app.abc123def456.js', HTTP_ACCEPT_ENCODING='gzip, br;q=0')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(self.body(response)), SCRIPT)
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+
+    def test_identity_when_no_variant_is_accepted(self):
+        response = self.get('js/app.abc123def456.js')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(self.body(response), SCRIPT)
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+
+    def test_unchanged_file_gets_a_304(self):
+        mtime = os.stat(os.path.join(self.root, 'js/plain.js')).st_mtime
+        response = self.get('js/plain.js', HTTP_IF_MODIFIED_SINCE=http_date(mtime + 1))
+        self.assertEqual(response.status_code, 304)
+
+    def test_missing_and_escaping_paths_are_404(self):
+        for path in ('js/missing.js', '../outside.txt', 'js'):
+            with self.subTest(path=path), self.assertRaises(Http404):
+                self.get(path)
+
+    def test_accepted_encodings(self):
+        self.assertEqual(accepted_encodings('gzip;q=1.0, BR, identity;q=0'), {'gzip', 'br'})
+        self.assertEqual(accepted_encodings(''), set())
+
+    def test_css_fallback_minifier_keeps_license_comments(self):
+        with mock.patch('quiz.storage.rcssmin', None):
+            css = minify_css('/*! license */\n/* note */\nbody {\n    color: red;\n}\n')
+        self.assertEqual(css, '/*! license */\nbody {\ncolor: red;\n}\n')
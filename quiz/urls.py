@@ -22,6 +22,7 @@ urlpatterns = [
     path('teacher/quiz/<int:quiz_id>/questions/', views.manage_questions, name='manage_questions'),
     path('teacher/quiz/<int:quiz_id>/questions/add/', views.add_questions, name='add_questions'),
     path('teacher/quiz/<int:quiz_id>/results/', views.view_quiz_results, name='view_quiz_results'),
+    path('teacher/quiz/<int:quiz_id>/regrade/', views.regrade_quiz_view, name='regrade_quiz'),
     path('teacher/attempt/<int:attempt_id>/details/', views.view_attempt_details, name='view_attempt_details'),
     path('teacher/question/<int:question_id>/delete/', views.delete_question, name='delete_question'),
     
@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.0/ref/settings/
 
 from pathlib import Path
 import os
+import tempfile
 from decouple import config, Csv
 from django.contrib.messages import constants as messages
 
@@ -77,11 +78,17 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'quiz.middleware.RequestIdMiddleware',
+    'quiz.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'quiz.middleware.QueryInstrumentationMiddleware',
+    'quiz.middleware.AdmissionControlMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'quiz.middleware.RoleMiddleware',
+    'quiz.middleware.ProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -91,7 +98,7 @@ ROOT_URLCONF = 'quizmaster.urls'
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
-        'DIRS': [BASE_DIR / 'templates'],
+        'DIRS': [BASE_DIR / 'Templates'],
         'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
@@ -122,6 +129,21 @@ DATABASES = {
     }
 }
 
+# Archived attempts (quiz/archive.py) stay in the default database unless
+# ARCHIVE_DB_NAME names a separate SQLite file; create its tables with
+# `python manage.py migrate --database archive`
+ARCHIVE_DB_NAME = config('ARCHIVE_DB_NAME', default='')
+if ARCHIVE_DB_NAME:
+    DATABASES['archive'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': ARCHIVE_DB_NAME,
+        'OPTIONS': {
+            'timeout': 20,
+        }
+    }
+
+DATABASE_ROUTERS = ['quiz.routers.ArchiveRouter']
+
 # ==============================================================================
 # PASSWORD VALIDATION
 # ==============================================================================
@@ -174,6 +196,23 @@ STATICFILES_FINDERS = [
     'django.contrib.staticfiles.finders.AppDirectoriesFinder',
 ]
 
+# Minify, content-hash and precompress at collectstatic time (quiz/storage.py)
+# and serve the results from the app with far-future headers
+# (quiz/static_views.py). Needs collectstatic to have run.
+STATIC_PIPELINE = config('STATIC_PIPELINE', default=not DEBUG, cast=bool)
+
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': (
+            'quiz.storage.CompressedManifestStaticFilesStorage' if STATIC_PIPELINE
+            else 'django.contrib.staticfiles.storage.StaticFilesStorage'
+        ),
+    },
+}
+
 # ==============================================================================
 # MEDIA FILES (User Uploads)
 # ==============================================================================
@@ -228,6 +267,7 @@ MESSAGE_TAGS = {
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.SessionAuthentication',
+        'accounts.authentication.SignedTokenAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
@@ -244,6 +284,8 @@ REST_FRAMEWORK = {
 # LOGGING CONFIGURATION
 # ==============================================================================
 
+# Records are queued and written by a background thread (quiz/structured_logging.py),
+# as JSON lines with the request id, to a size-rotated file
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
@@ -256,11 +298,17 @@ LOGGING = {
             'format': '{levelname} {message}',
             'style': '{',
         },
+        'json': {
+            '()': 'quiz.structured_logging.JsonFormatter',
+        },
     },
     'filters': {
         'require_debug_true': {
             '()': 'django.utils.log.RequireDebugTrue',
         },
+        'request_id': {
+            '()': 'quiz.structured_logging.RequestIdFilter',
+        },
     },
     'handlers': {
         'console': {
@@ -270,10 +318,18 @@ LOGGING = {
             'formatter': 'simple'
         },
         'file': {
-            'level': 'ERROR',
-            'class': 'logging.FileHandler',
-            'filename': BASE_DIR / 'logs' / 'django_errors.log',
-            'formatter': 'verbose',
+            'level': config('LOG_FILE_LEVEL', default='INFO'),
+            'class': 'quiz.structured_logging.QueuedHandler',
+            'filters': ['request_id'],
+            'formatter': 'json',
+            'target': {
+                'class': 'logging.handlers.RotatingFileHandler',
+                'filename': BASE_DIR / 'logs' / 'quizmaster.log',
+                'maxBytes': config('LOG_MAX_BYTES', default=10 * 1024 * 1024, cast=int),
+                'backupCount': config('LOG_BACKUP_COUNT', default=5, cast=int),
+                'encoding': 'utf-8',
+                'delay': True,
+            },
         },
     },
     'loggers': {
@@ -310,14 +366,46 @@ DEFAULT_FROM_EMAIL = config('DEFAULT_FROM_EMAIL', default='noreply@quizmaster.co
 # CACHE CONFIGURATION
 # ==============================================================================
 
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-        'LOCATION': 'unique-quizmaster-cache',
-        'OPTIONS': {
-            'MAX_ENTRIES': 1000
+# Shared by every worker on the host. Point CACHE_URL at redis://host:6379/0
+# to share it across hosts, or use db:// for the database cache table
+# (python manage.py createcachetable). See quiz/caching.py for key layout.
+CACHE_URL = config('CACHE_URL', default='')
+
+if CACHE_URL.startswith(('redis://', 'rediss://', 'unix://')):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_URL,
+        }
+    }
+elif CACHE_URL.startswith('db://'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': CACHE_URL[len('db://'):] or 'quizmaster_cache',
+            'OPTIONS': {'MAX_ENTRIES': 50000},
         }
     }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': config('CACHE_DIR', default=os.path.join(tempfile.gettempdir(), 'quizmaster-cache')),
+            'OPTIONS': {'MAX_ENTRIES': 20000},
+        }
+    }
+
+for _cache in CACHES.values():
+    _cache.update({'KEY_PREFIX': 'quizmaster', 'TIMEOUT': 60 * 60})
+
+# Identifies the deployed build; cached pages are keyed by it (quiz/page_cache.py)
+BUILD_VERSION = config('BUILD_VERSION', default=config('VERCEL_GIT_COMMIT_SHA', default='dev'))
+
+# Full-page cache for anonymous visitors
+PAGE_CACHE = {
+    'ENABLED': config('PAGE_CACHE_ENABLED', default=True, cast=bool),
+    'TIMEOUT': 60 * 60,
+    'MAX_AGE': 0,
 }
 
 # ==============================================================================
@@ -342,12 +430,90 @@ QUIZ_SETTINGS = {
     'PASSING_PERCENTAGE': 60,
     'ALLOW_RETAKES': True,
     'MAX_RETAKES': 3,
+    'SUBMISSION_GRACE_SECONDS': 60,  # accepted past the time limit before a submission is rejected
+    'SWEEP_BATCH_SIZE': 500,
+    'PREWARM_LEAD_MINUTES': 15,  # how far ahead of opens_at quizzes are pre-warmed
+    'PREWARM_MAX_ENTRY_BYTES': 1024 * 1024,  # largest cache value the shared cache accepts
 }
 
 # ==============================================================================
 # PERFORMANCE SETTINGS
 # ==============================================================================
 
+# Per-worker admission control for exam-start surges (see quiz/middleware.py)
+ADMISSION_CONTROL = {
+    'ENABLED': config('ADMISSION_CONTROL_ENABLED', default=True, cast=bool),
+    'LIMITS': {'delivery': 24, 'submission': 32, 'dashboard': 8, 'ai': 2},
+    'PRESSURE_THRESHOLD': 32,
+    'SHED_UNDER_PRESSURE': ['dashboard', 'ai'],
+    'RETRY_AFTER': 3,
+    'MAX_RETRY_AFTER': 30,
+}
+
+# Signed bearer tokens for API clients (accounts.authentication)
+API_TOKEN_SETTINGS = {
+    'TTL_SECONDS': config('API_TOKEN_TTL_SECONDS', default=3600, cast=int),
+    'REVOCATION_REFRESH_SECONDS': 30,
+}
+
+# Per-request query counts and @query_budget checks (quiz/query_budget.py).
+# Every request is instrumented in development, a sample in production.
+QUERY_INSTRUMENTATION = {
+    'ENABLED': config('QUERY_INSTRUMENTATION_ENABLED', default=True, cast=bool),
+    'SAMPLE_RATE': config('QUERY_SAMPLE_RATE', default=1.0 if DEBUG else 0.01, cast=float),
+    'RAISE_ON_BUDGET': config('QUERY_BUDGET_RAISE', default=False, cast=bool),
+}
+
+# Per-worker metrics merged through files in DIRECTORY and served on
+# /metrics in the Prometheus text format (quiz/metrics.py). Without a
+# METRICS_TOKEN, /metrics and /health/details are only served with DEBUG on.
+METRICS = {
+    'ENABLED': config('METRICS_ENABLED', default=True, cast=bool),
+    'DIRECTORY': config('METRICS_DIR', default=os.path.join(tempfile.gettempdir(), 'quizmaster-metrics')),
+    'FLUSH_SECONDS': 5,
+    'TOKEN': config('METRICS_TOKEN', default=''),
+}
+
+# On-demand cProfile runs saved to logs/profiles and browsed on
+# /admin/profiles/ (quiz/profiling.py). Off unless PROFILING_ENABLED is set.
+PROFILING = {
+    'ENABLED': config('PROFILING_ENABLED', default=False, cast=bool),
+    'DIRECTORY': config('PROFILE_DIR', default=str(BASE_DIR / 'logs' / 'profiles')),
+    'HEADER': 'X-Profile',
+    'QUERY_PARAM': '_profile',
+    'SAMPLE_EVERY': config('PROFILE_SAMPLE_EVERY', default=0, cast=int),
+    'SAMPLE_INTERVAL': 0.001,
+    'KEEP': 200,
+}
+
+# Background jobs run by `python manage.py run_jobs` (quiz/jobs.py)
+JOBS = {
+    'CHUNK_SIZE': 500,
+    'STALE_SECONDS': 900,
+    'POLL_SECONDS': 2.0,
+    'EXPORT_DIR': config('JOB_EXPORT_DIR', default=os.path.join(tempfile.gettempdir(), 'quizmaster-exports')),
+}
+
+# Completed attempts older than HORIZON_DAYS are moved to the archive
+# tables by `python manage.py archive_attempts` (quiz/archive.py)
+ARCHIVE = {
+    'DATABASE': 'archive' if ARCHIVE_DB_NAME else 'default',
+    'HORIZON_DAYS': config('ARCHIVE_HORIZON_DAYS', default=365, cast=int),
+    'BATCH_SIZE': 500,
+}
+
+# /health/ready probe thresholds (quiz/health.py)
+HEALTH = {
+    'CACHE_SECONDS': 1.0,
+    'THRESHOLDS_MS': {
+        'db_read': config('HEALTH_DB_READ_MS', default=100, cast=int),
+        'db_write': config('HEALTH_DB_WRITE_MS', default=250, cast=int),
+        'cache': config('HEALTH_CACHE_MS', default=50, cast=int),
+        'queues': config('HEALTH_QUEUES_MS', default=100, cast=int),
+    },
+    'MAX_QUEUE_DEPTH': 5000,
+}
+
 # Connection pooling and database optimization
 if not DEBUG:
     CONN_MAX_AGE = 600  # 10 minutes
@@ -15,7 +15,16 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 from django.views.generic import TemplateView
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse
+from django.utils.crypto import constant_time_compare
+from quiz import metrics
+from quiz.caching import cache_stats
+from quiz.health import readiness
+from quiz.middleware import admission_controller
+from quiz.page_cache import anonymous_page_cache
+from quiz.profile_views import profile_detail, profile_download, profile_list
+from quiz.query_budget import view_query_stats
+from quiz.static_views import serve_static
 
 
 # ==========================================
@@ -38,35 +47,99 @@ def health_check(request):
     })
 
 
+def metrics_authorized(request):
+    """Whether the request carries the metrics token; without one configured, only in DEBUG"""
+    token = metrics.metrics_settings()['TOKEN']
+    if not token:
+        return settings.DEBUG
+    return constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}')
+
+
+def health_details(request):
+    """Admission, cache and query-budget diagnostics; guarded like /metrics"""
+    if not metrics_authorized(request):
+        return HttpResponse('Unauthorized', status=401, content_type='text/plain')
+    response = JsonResponse({
+        'admission': admission_controller.snapshot(),
+        'cache': cache_stats(),
+        'queries': view_query_stats.snapshot(),
+    })
+    response['Cache-Control'] = 'no-store'
+    return response
+
+
+def liveness(request):
+    """The process is up and answering; checks no dependencies"""
+    return JsonResponse({'status': 'alive'})
+
+
+def readiness_check(request):
+    """Dependency probes for the load balancer (quiz/health.py); 503 when not ready"""
+    result = readiness.get()
+    response = JsonResponse(result, status=200 if result['status'] == 'ready' else 503)
+    response['Cache-Control'] = 'no-store'
+    return response
+
+
+def metrics_view(request):
+    """Prometheus scrape endpoint, summed over every worker on this host"""
+    if not metrics_authorized(request):
+        return HttpResponse('Unauthorized', status=401, content_type='text/plain')
+    return HttpResponse(metrics.render(cache_stats()), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
 # ==========================================
 # MAIN URL PATTERNS
 # ==========================================
 urlpatterns = [
+    # Request profiles (quiz/profiling.py), ahead of the admin's catch-all
+    path('admin/profiles/', profile_list, name='profile_list'),
+    path('admin/profiles/<str:profile_id>/', profile_detail, name='profile_detail'),
+    path('admin/profiles/<str:profile_id>/<str:kind>/', profile_download, name='profile_download'),
+
     # Admin interface
     path('admin/', admin.site.urls),
     
     # Health check (for deployment monitoring)
     path('health/', health_check, name='health_check'),
+    path('health/live', liveness, name='health_live'),
+    path('health/ready', readiness_check, name='health_ready'),
+    path('health/details', health_details, name='health_details'),
+    path('metrics', metrics_view, name='metrics'),
     
     # Home page
-    path('', TemplateView.as_view(template_name='home.html'), name='home'),
+    path('', anonymous_page_cache(TemplateView.as_view(template_name='home.html')), name='home'),
     
     # Django authentication URLs (login, logout, password change, password reset)
     path('accounts/', include('django.contrib.auth.urls')),
     
     # Quiz application - ✅ CRITICAL FIX
     path('quiz/', include('quiz.urls')),
+    
+    # REST API (auth, dashboards, quizzes, questions, attempts, results)
+    path('api/', include('accounts.api_urls')),
 ]
 
 
+# ==========================================
+# STATIC FILES
+# ==========================================
+if settings.STATIC_PIPELINE:
+    # Hashed, precompressed files from collectstatic (quiz/static_views.py)
+    urlpatterns += [
+        path(f"{settings.STATIC_URL.strip('/')}/<path:path>", serve_static, name='static'),
+    ]
+
+
 # ==========================================
 # DEVELOPMENT-ONLY CONFIGURATIONS
 # ==========================================
 if settings.DEBUG:
-    urlpatterns += static(
-        settings.STATIC_URL, 
-        document_root=settings.STATIC_ROOT
-    )
+    if not settings.STATIC_PIPELINE:
+        urlpatterns += static(
+            settings.STATIC_URL,
+            document_root=settings.STATIC_ROOT
+        )
     
     urlpatterns += static(
         settings.MEDIA_URL, 
@@ -7,6 +7,9 @@ let timeRemaining = 0;
 let timerInterval = null;
 let isSubmitting = false;
 
+// Time kept back from the grace period for the last retry to reach the server
+const SUBMISSION_RETRY_MARGIN_SECONDS = 10;
+
 
 /**
  * Get CSRF token from cookies or meta tag
@@ -391,6 +394,42 @@ function closeSubmitModal() {
 }
 
 
+/**
+ * Seconds the submission may spend retrying: the server's grace period less a
+ * margin for the final request's own round trip
+ */
+function submissionRetryWindow() {
+    const grace = quizData?.submissionGrace ?? 60;
+    return Math.max(grace - SUBMISSION_RETRY_MARGIN_SECONDS, 0);
+}
+
+/**
+ * POST the submission, waiting and retrying while the server is busy (503 + Retry-After).
+ * Retries stop once retryWindow seconds have passed since the first try, so a
+ * submission made as the timer runs out is not still retrying after the
+ * server's grace period has closed the attempt.
+ */
+async function submitWithRetry(url, options, submitBtn, retryWindow, maxAttempts = 10) {
+    const retryDeadline = Date.now() + retryWindow * 1000;
+    for (let attempt = 1; ; attempt++) {
+        const response = await fetch(url, options);
+        if (response.status !== 503 || attempt >= maxAttempts) {
+            return response;
+        }
+        const retryAfter = Number.parseInt(response.headers.get('Retry-After'), 10) || 3;
+        const waitMs = Math.min(retryAfter * 1000, retryDeadline - Date.now());
+        if (waitMs <= 0) {
+            return response;
+        }
+        const waitSeconds = Math.ceil(waitMs / 1000);
+        console.warn(`⏳ Server busy, retrying submission in ${waitSeconds}s (attempt ${attempt})`);
+        if (submitBtn) {
+            submitBtn.textContent = `⏳ Server busy, retrying in ${waitSeconds}s...`;
+        }
+        await new Promise(resolve => setTimeout(resolve, waitMs));
+    }
+}
+
 /**
  * Confirm and submit quiz
  */
@@ -446,7 +485,7 @@ async function confirmSubmit() {
         console.log('🌐 Fetch URL:', submitUrl);
         console.log('📦 Request Body:', JSON.stringify(submissionData));
 
-        const response = await fetch(submitUrl, {
+        const response = await submitWithRetry(submitUrl, {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
@@ -455,7 +494,7 @@ async function confirmSubmit() {
             body: JSON.stringify(submissionData),
             credentials: 'same-origin',
             keepalive: true
-        });
+        }, submitBtn, submissionRetryWindow());
 
         console.log('📬 Response Status:', response.status);
         console.log('📬 Response Headers:', {